@@ -1,3 +1,11 @@
-from .main import app, setup_frontend
-
 __all__ = ["app", "setup_frontend"]
+
+
+def __getattr__(name):
+    # Loaded on first use, so a notebook kernel can import ``api.core`` helpers
+    # without building the app when the server runs in its own process
+    if name in __all__:
+        from . import main
+
+        return getattr(main, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
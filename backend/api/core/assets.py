@@ -0,0 +1,179 @@
+"""
+In-memory index of the pre-built frontend.
+
+The build directory is read once at startup. Every file is kept in memory
+together with gzip (and, when the ``brotli`` package is installed, brotli)
+variants, so serving a request is a dict lookup plus a byte copy.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip covers every browser
+    brotli = None
+
+# Content-hashed bundles under /assets never change for a given URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html and friends must be revalidated so new builds are picked up
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+ENCODING_ETAG_SUFFIX = {"br": "-br", "gzip": "-gz", "identity": ""}
+
+
+class StaticAsset:
+    """A single frontend file with its pre-encoded variants."""
+
+    __slots__ = ("path", "media_type", "digest", "variants", "etags")
+
+    def __init__(self, path: str, data: bytes):
+        self.path = path
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(data).hexdigest()[:20]
+        self.variants: Dict[str, bytes] = {"identity": data}
+
+        if len(data) >= MIN_COMPRESS_SIZE and self.media_type.startswith(
+            COMPRESSIBLE_TYPES
+        ):
+            gz = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+            if len(gz) < len(data):
+                self.variants["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(data, quality=BROTLI_QUALITY)
+                if len(br) < len(data):
+                    self.variants["br"] = br
+
+        # Strong ETags must differ between encodings of the same file
+        self.etags = {
+            encoding: f'"{self.digest}{ENCODING_ETAG_SUFFIX[encoding]}"'
+            for encoding in self.variants
+        }
+
+    def matches(self, if_none_match: str, encoding: str) -> bool:
+        """
+        Return True if any tag in an If-None-Match header names the ``encoding`` variant.
+
+        Only that variant's tag counts: a cache holding the gzip body must not
+        get a 304 for a request that negotiated brotli or identity.
+        """
+        if if_none_match.strip() == "*":
+            return True
+        etag = self.etags[encoding]
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into ``{coding: q}``."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(asset: StaticAsset, header: Optional[str]) -> str:
+    """Pick the best available variant of ``asset`` for an Accept-Encoding header."""
+    if not header or len(asset.variants) == 1:
+        return "identity"
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in asset.variants:
+            continue
+        if encoding == "identity":
+            q = accepted.get("identity", accepted.get("*", 1.0))
+        else:
+            q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class AssetIndex:
+    """Frontend build directory loaded into memory."""
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = build_dir
+        self.assets: Dict[str, StaticAsset] = {}
+
+        if build_dir.is_dir():
+            for file_path in sorted(build_dir.rglob("*")):
+                if file_path.is_file():
+                    rel = file_path.relative_to(build_dir).as_posix()
+                    self.assets[rel] = StaticAsset(rel, file_path.read_bytes())
+
+        self.index = self.assets.get("index.html")
+
+    def __bool__(self) -> bool:
+        return self.index is not None
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path)
+
+    def respond(
+        self, asset: Optional[StaticAsset], request: Request, immutable: bool = False
+    ) -> Response:
+        """Build a response for ``asset``, honouring If-None-Match and Accept-Encoding."""
+        if asset is None:
+            return Response(status_code=404)
+
+        encoding = choose_encoding(asset, request.headers.get("accept-encoding"))
+        headers = {
+            "ETag": asset.etags[encoding],
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL
+            if immutable
+            else REVALIDATE_CACHE_CONTROL,
+        }
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and asset.matches(if_none_match, encoding):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=asset.variants[encoding],
+            media_type=asset.media_type,
+            headers=headers,
+        )
@@ -0,0 +1,199 @@
+"""
+``/api/batch``: several API calls in one round trip.
+
+A dashboard load needs health, system info, models and training status.
+Over a high-latency link (the Colab proxy, an SSH tunnel) four requests cost
+four round trips, or more once the browser's connection limit kicks in. The
+batch endpoint takes a list of sub-requests, runs them concurrently through
+the app's own ASGI stack (so routing, validation, caching and metrics behave
+exactly as for a direct call) and returns every status and body at once.
+
+Sub-response bodies are already encoded JSON, so they are spliced into the
+combined response as bytes rather than decoded and re-encoded.
+"""
+
+import asyncio
+import json
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+# Sub-requests accepted in one batch
+MAX_BATCH_SIZE = 20
+ALLOWED_METHODS = ("GET", "POST")
+BATCH_PATH = "/api/batch"
+# Streaming routes besides event streams; their output arrives over time
+STREAMING_PATHS = ("/api/generate",)
+
+# Request headers passed on to every sub-request
+FORWARDED_HEADERS = (b"authorization", b"cookie", b"user-agent")
+# Scope keys a sub-request inherits from the batch request
+INHERITED_SCOPE = (
+    "type",
+    "asgi",
+    "http_version",
+    "scheme",
+    "client",
+    "server",
+    "root_path",
+)
+
+JSON_MEDIA_TYPE = b"application/json"
+JSON_HEADERS = {b"content-type": JSON_MEDIA_TYPE}
+
+
+def _validate(item: Any) -> Optional[str]:
+    """Why a sub-request cannot be run, or None if it can."""
+    if not isinstance(item, dict):
+        return "Each sub-request must be an object"
+    method = str(item.get("method", "GET")).upper()
+    path = item.get("path")
+    if method not in ALLOWED_METHODS:
+        return f"method must be one of {', '.join(ALLOWED_METHODS)}"
+    if not isinstance(path, str) or not path.startswith("/api/"):
+        return "path must be an /api/ route"
+    route = urlsplit(path).path
+    if route == BATCH_PATH:
+        return "Batches cannot be nested"
+    if route.endswith("/events") or route in STREAMING_PATHS:
+        # Event streams never finish, so they cannot be part of one response
+        return "Streams cannot be batched"
+    if not isinstance(item.get("headers", {}), dict):
+        return "headers must be an object"
+    return None
+
+
+def _error(detail: str) -> bytes:
+    return json.dumps({"detail": detail}).encode()
+
+
+async def _call(
+    app, outer: Request, item: Dict[str, Any]
+) -> Tuple[int, Dict[bytes, bytes], bytes]:
+    """Run one sub-request through ``app``; returns (status, headers, body)."""
+    method = str(item.get("method", "GET")).upper()
+    parts = urlsplit(item["path"])
+    body = b""
+    if item.get("body") is not None:
+        body = json.dumps(item["body"]).encode()
+
+    headers = [
+        (name, value)
+        for name, value in outer.scope["headers"]
+        if name in FORWARDED_HEADERS
+    ]
+    headers.append((b"host", outer.headers.get("host", "localhost").encode()))
+    if body:
+        headers.append((b"content-type", JSON_MEDIA_TYPE))
+        headers.append((b"content-length", str(len(body)).encode()))
+    for name, value in item.get("headers", {}).items():
+        headers.append(
+            (str(name).lower().encode("latin-1"), str(value).encode("latin-1"))
+        )
+
+    scope = {
+        **{key: outer.scope[key] for key in INHERITED_SCOPE if key in outer.scope},
+        "method": method,
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "headers": headers,
+    }
+
+    status = 500
+    response_headers: Dict[bytes, bytes] = {}
+    chunks: List[bytes] = []
+    sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Nothing else will arrive; wait as a connected client would
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(message.get("headers", ()))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        # Server errors propagate past the app's own 500 response; the server
+        # would log them for a direct call, so log them here
+        traceback.print_exc()
+        if not finished.is_set():
+            return 500, JSON_HEADERS, _error(str(e) or type(e).__name__)
+    finally:
+        finished.set()
+    return status, response_headers, b"".join(chunks)
+
+
+def _encode_entry(
+    item_id: Any, status: int, headers: Dict[bytes, bytes], body: bytes
+) -> bytes:
+    """One ``{"id", "status", "etag", "body"}`` object, splicing JSON bodies as-is."""
+    entry = b'{"id":%s,"status":%d' % (json.dumps(item_id).encode(), status)
+    etag = headers.get(b"etag")
+    if etag:
+        entry += b',"etag":' + json.dumps(etag.decode("latin-1")).encode()
+    content_type = headers.get(b"content-type", b"")
+    if not body:
+        encoded = b"null"
+    elif content_type.startswith(JSON_MEDIA_TYPE):
+        encoded = body
+    else:
+        encoded = json.dumps(body.decode("utf-8", "replace")).encode()
+    return entry + b',"body":' + encoded + b"}"
+
+
+async def handle_batch(request: Request) -> Response:
+    """
+    Run a batch of sub-requests concurrently.
+
+    The body is ``{"requests": [{"method", "path", "body", "headers", "id"}]}``
+    (only ``path`` is required). The response is ``{"responses": [{"id",
+    "status", "etag", "body"}]}`` in the same order; a failing sub-request
+    does not affect the others.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"detail": "Body must be JSON"}, status_code=400)
+    items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return JSONResponse(
+            {"detail": 'Expected {"requests": [...]}'}, status_code=400
+        )
+    if len(items) > MAX_BATCH_SIZE:
+        return JSONResponse(
+            {"detail": f"At most {MAX_BATCH_SIZE} requests per batch"}, status_code=400
+        )
+
+    app = request.scope["app"]
+
+    async def run(index: int, item: Any) -> bytes:
+        item_id = item.get("id", index) if isinstance(item, dict) else index
+        error = _validate(item)
+        if error is not None:
+            return _encode_entry(item_id, 400, JSON_HEADERS, _error(error))
+        return _encode_entry(item_id, *await _call(app, request, item))
+
+    entries = await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    return Response(
+        b'{"responses":[' + b",".join(entries) + b"]}",
+        media_type=JSON_MEDIA_TYPE.decode(),
+        headers={"Cache-Control": "no-store"},
+    )
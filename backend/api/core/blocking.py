@@ -0,0 +1,188 @@
+"""
+Keeping blocking work off the event loop.
+
+``LoopMonitor`` measures event-loop lag with a heartbeat task and watches it
+from a separate thread: when the loop stops ticking for longer than
+``BLOCK_THRESHOLD`` the watchdog captures the loop thread's stack while the
+offending call is still running, and once the loop recovers the stall is
+logged together with that stack. Lag percentiles and stall counts are
+exported with the request metrics.
+
+``run_blocking`` runs known-blocking calls (fsync'd job records, process
+spawns, memory-mapped metric scans, directory walks, coordinator round trips)
+on a bounded thread pool, so one slow call delays only itself.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, List, Optional
+
+# Seconds between heartbeats; also the resolution of the lag measurement
+TICK_INTERVAL = 0.05
+# A heartbeat later than this (seconds) counts as the loop being blocked
+BLOCK_THRESHOLD = 0.1
+# Lag samples kept for percentiles (two minutes at the default interval)
+LAG_SAMPLES = 2400
+# Innermost frames included in a stall report
+STACK_DEPTH = 12
+
+# Threads available to run_blocking
+BLOCKING_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+LAG_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class LoopMonitor:
+    """Heartbeat-based lag measurement plus a stack-capturing stall watchdog."""
+
+    def __init__(
+        self, interval: float = TICK_INTERVAL, threshold: float = BLOCK_THRESHOLD
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.lag_sum = 0.0
+        self.lag_count = 0
+        self.blocked = 0
+        self.max_block = 0.0
+
+        self._last_tick = time.monotonic()
+        self._captured: Optional[List[str]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start monitoring the running loop. Safe to call more than once."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_tick = now
+            self.lags.append(lag)
+            self.lag_sum += lag
+            self.lag_count += 1
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag: float):
+        self.blocked += 1
+        self.max_block = max(self.max_block, lag)
+        stack, self._captured = self._captured, None
+        message = f"Event loop blocked for {lag * 1000:.0f} ms"
+        if stack:
+            message += " in:\n" + "".join(stack).rstrip()
+        else:
+            # Never caught mid-call: CPU-bound threads holding the GIL, most likely
+            message += " (no single blocking call; threads competing for the GIL?)"
+        print(message, file=sys.stderr)
+
+    def _watch(self):
+        """Capture the loop thread's stack while it is stalled."""
+        while not self._stop.wait(self.threshold / 2):
+            stalled = time.monotonic() - self._last_tick - self.interval
+            if stalled < self.threshold or self._captured is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._captured = traceback.format_stack(frame)[-STACK_DEPTH:]
+
+    def quantiles(self) -> List[float]:
+        samples = sorted(self.lags)
+        if not samples:
+            return [0.0 for _ in LAG_QUANTILES]
+        last = len(samples) - 1
+        return [samples[min(last, int(q * len(samples)))] for q in LAG_QUANTILES]
+
+    def metric_lines(self, namespace: str) -> List[str]:
+        """Prometheus lines for ``MetricsRegistry.add_collector``."""
+        ns = namespace
+        lines = [
+            f"# HELP {ns}_event_loop_lag_seconds Heartbeat delay over recent samples.",
+            f"# TYPE {ns}_event_loop_lag_seconds summary",
+        ]
+        for q, value in zip(LAG_QUANTILES, self.quantiles()):
+            lines.append(f'{ns}_event_loop_lag_seconds{{quantile="{q}"}} {value:.6f}')
+        lines += [
+            f"{ns}_event_loop_lag_seconds_sum {self.lag_sum:.6f}",
+            f"{ns}_event_loop_lag_seconds_count {self.lag_count}",
+            f"# HELP {ns}_event_loop_blocked_total Stalls longer than {self.threshold}s.",
+            f"# TYPE {ns}_event_loop_blocked_total counter",
+            f"{ns}_event_loop_blocked_total {self.blocked}",
+            f"# HELP {ns}_event_loop_max_block_seconds Longest stall seen.",
+            f"# TYPE {ns}_event_loop_max_block_seconds gauge",
+            f"{ns}_event_loop_max_block_seconds {self.max_block:.6f}",
+        ]
+        return lines
+
+
+class BlockingPool:
+    """Bounded thread pool for blocking calls made from async handlers."""
+
+    def __init__(self, max_workers: int = BLOCKING_THREADS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="blocking")
+        # Only touched on the event loop thread
+        self.active = 0
+        self.completed = 0
+
+    async def run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self.active -= 1
+            self.completed += 1
+
+    def metric_lines(self, namespace: str) -> List[str]:
+        ns = namespace
+        return [
+            f"# HELP {ns}_blocking_pool_threads Threads available for blocking calls.",
+            f"# TYPE {ns}_blocking_pool_threads gauge",
+            f"{ns}_blocking_pool_threads {self.max_workers}",
+            f"# HELP {ns}_blocking_pool_active Blocking calls running or queued.",
+            f"# TYPE {ns}_blocking_pool_active gauge",
+            f"{ns}_blocking_pool_active {self.active}",
+            f"# HELP {ns}_blocking_pool_completed_total Blocking calls finished.",
+            f"# TYPE {ns}_blocking_pool_completed_total counter",
+            f"{ns}_blocking_pool_completed_total {self.completed}",
+        ]
+
+
+# Shared monitor and pool for the app
+loop_monitor = LoopMonitor()
+blocking_pool = BlockingPool()
+run_blocking = blocking_pool.run
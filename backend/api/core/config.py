@@ -9,8 +9,19 @@ class Settings:
     # For Colab, we'll use /content as workspace
     WORKSPACE_DIR: Path = Path.home() / ".unsloth_demo"
 
+    # Jobs of this server, apart from the studio's <WORKSPACE_DIR>/jobs: each
+    # directory may only be run by one scheduler at a time
+    @property
+    def JOBS_DIR(self) -> Path:
+        return self.WORKSPACE_DIR / "notebook" / "jobs"
+
+    @property
+    def JOB_HISTORY_DB(self) -> Path:
+        return self.WORKSPACE_DIR / "notebook" / "jobs.db"
+
     def setup_directories(self):
         self.WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
+        self.JOBS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 settings = Settings()
@@ -0,0 +1,27 @@
+"""
+Training jobs for the notebook server.
+
+Jobs run on the studio's ``JobScheduler`` (the ``roland_ui_demo`` package,
+which setup.sh installs): one durable ``job.json`` per job under
+``settings.JOBS_DIR``, collision-free job ids, a worker process per job up to
+``UNSLOTH_MAX_CONCURRENT_JOBS`` at once, and re-queueing of jobs a crash or
+restart interrupted. The jobs directory is this server's own, so it can run
+next to a studio without either one recovering the other's jobs.
+"""
+
+from roland_ui_demo.studio.backend.core.config import settings as studio_settings
+from roland_ui_demo.studio.backend.core.events import EventBroker
+from roland_ui_demo.studio.backend.core.job_history import JobHistory
+from roland_ui_demo.studio.backend.core.jobs import JobScheduler, status_payload
+
+from .config import settings
+
+# Shared broker and scheduler for the app
+broker = EventBroker()
+scheduler = JobScheduler(
+    settings.JOBS_DIR,
+    broker,
+    max_concurrent=studio_settings.MAX_CONCURRENT_JOBS,
+    max_attempts=studio_settings.MAX_JOB_ATTEMPTS,
+    history=JobHistory(settings.JOB_HISTORY_DB),
+)
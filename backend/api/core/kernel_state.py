@@ -0,0 +1,115 @@
+"""
+State shared from a notebook kernel with an out-of-process server.
+
+When the server runs as a child process (``run_server(mode="process")``),
+the kernel still owns what the UI should show about it, such as progress of
+training running in a notebook cell. The kernel writes a JSON snapshot into a
+small memory-mapped file; the server maps the same file and reads it per
+request. Neither side ever waits for the other: no socket round trip, no
+thread in the kernel competing with training for the GIL, and the snapshot
+survives server restarts because the kernel owns it.
+
+Writes are guarded by a sequence counter (a seqlock). The single writer
+makes it odd while copying and even once done, and a reader retries if the
+counter was odd or changed while it copied.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Environment variable through which the server finds the kernel's state file
+STATE_ENV = "UNSLOTH_UI_STATE"
+# Size of the mapped file; snapshots must fit in it after the header
+STATE_BYTES = 1024 * 1024
+# Header: sequence counter and payload length
+HEADER = struct.Struct("<QI")
+# Attempts at a consistent read before falling back to the last good snapshot
+READ_ATTEMPTS = 100
+
+
+def _state_dir() -> str:
+    # tmpfs where available, so the file never touches a disk
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class KernelState:
+    """A JSON snapshot in a memory-mapped file: one writer, any number of readers."""
+
+    def __init__(self, path: Path, mm: mmap.mmap, writable: bool):
+        self.path = path
+        self._mm = mm
+        self._writable = writable
+        self._values: Dict[str, Any] = {}
+        self._last: Dict[str, Any] = {}
+
+    @classmethod
+    def create(cls, size: int = STATE_BYTES) -> "KernelState":
+        """A new, empty state file owned by this process (the writer)."""
+        fd, path = tempfile.mkstemp(prefix="unsloth-ui-", suffix=".state", dir=_state_dir())
+        try:
+            os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        state = cls(Path(path), mm, writable=True)
+        state._write({})
+        return state
+
+    @classmethod
+    def attach(cls, path) -> "KernelState":
+        """Map an existing state file for reading."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(Path(path), mm, writable=False)
+
+    def update(self, **values: Any):
+        """Merge ``values`` into the snapshot and publish it. Writer only."""
+        self._values.update(values)
+        self._write(self._values)
+
+    def _write(self, values: Dict[str, Any]):
+        if not self._writable:
+            raise PermissionError("KernelState is read-only in this process")
+        payload = json.dumps(values, separators=(",", ":"), default=str).encode()
+        if HEADER.size + len(payload) > len(self._mm):
+            raise ValueError(
+                f"State snapshot is {len(payload)} bytes; at most "
+                f"{len(self._mm) - HEADER.size} fit"
+            )
+        seq, _ = HEADER.unpack_from(self._mm, 0)
+        HEADER.pack_into(self._mm, 0, seq + 1, 0)
+        self._mm[HEADER.size : HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self._mm, 0, seq + 2, len(payload))
+
+    def read(self) -> Dict[str, Any]:
+        """The latest complete snapshot."""
+        for _ in range(READ_ATTEMPTS):
+            seq, length = HEADER.unpack_from(self._mm, 0)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            payload = self._mm[HEADER.size : HEADER.size + length]
+            if HEADER.unpack_from(self._mm, 0)[0] == seq:
+                self._last = json.loads(payload) if payload else {}
+                break
+        return self._last
+
+    def close(self, unlink: Optional[bool] = None):
+        """Unmap the file; the writer also removes it unless ``unlink`` is False."""
+        self._mm.close()
+        if unlink if unlink is not None else self._writable:
+            self.path.unlink(missing_ok=True)
+
+
+def attach_from_env() -> Optional[KernelState]:
+    """The kernel's state when this server was launched by one, else None."""
+    path = os.environ.get(STATE_ENV)
+    if not path or not os.path.exists(path):
+        return None
+    return KernelState.attach(path)
@@ -0,0 +1,356 @@
+"""
+Index of models present on this machine.
+
+Scans the Hugging Face hub cache and ``<WORKSPACE_DIR>/models`` for model
+directories and records their on-disk size, parameter count (from
+safetensors headers, or estimated from ``config.json``), architecture and
+quantization. The index is kept in ``<WORKSPACE_DIR>/cache/models.json``
+together with each entry's directory mtimes, so a refresh only re-reads
+models whose directories changed, and refreshes are throttled so most
+requests touch no files at all.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from .config import settings
+from .response_cache import response_cache
+
+# Seconds between filesystem checks; requests in between are served from memory
+REFRESH_INTERVAL = 10.0
+
+INDEX_VERSION = 1
+SORT_KEYS = ("name", "size", "parameters", "modified")
+MAX_PAGE_SIZE = 500
+
+
+def hub_cache_dir() -> Path:
+    """Resolve the Hugging Face hub cache the same way huggingface_hub does."""
+    if os.environ.get("HF_HUB_CACHE"):
+        return Path(os.environ["HF_HUB_CACHE"])
+    hf_home = os.environ.get("HF_HOME", Path.home() / ".cache" / "huggingface")
+    return Path(hf_home) / "hub"
+
+
+def format_size(num_bytes: int) -> str:
+    """Human-readable size in the "4.5 GB" style the UI already shows."""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1000:
+            return f"{size:.0f} B" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+
+def format_params(count: Optional[int]) -> Optional[str]:
+    if not count:
+        return None
+    for unit, scale in (("T", 1e12), ("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if count >= scale:
+            return f"{count / scale:.1f}{unit}"
+    return str(count)
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _safetensors_params(path: Path) -> int:
+    """Parameter count from a safetensors header, without reading the tensors."""
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    count = 0
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        n = 1
+        for dim in info["shape"]:
+            n *= dim
+        count += n
+    return count
+
+
+def _estimate_params(config: Dict[str, Any]) -> Optional[int]:
+    """Rough decoder-only transformer parameter count from config.json."""
+    cfg = config.get("text_config", config)
+    try:
+        hidden = cfg["hidden_size"]
+        layers = cfg["num_hidden_layers"]
+        vocab = cfg["vocab_size"]
+    except KeyError:
+        return None
+    heads = cfg.get("num_attention_heads", 1)
+    kv_heads = cfg.get("num_key_value_heads", heads)
+    head_dim = cfg.get("head_dim", hidden // max(1, heads))
+    intermediate = cfg.get("intermediate_size", 4 * hidden)
+    experts = cfg.get("num_local_experts", cfg.get("num_experts", 1)) or 1
+
+    attention = hidden * head_dim * (heads * 2 + kv_heads * 2)
+    mlp = 3 * hidden * intermediate * experts
+    embeddings = vocab * hidden * (1 if cfg.get("tie_word_embeddings") else 2)
+    return layers * (attention + mlp) + embeddings
+
+
+def _quantization(config: Dict[str, Any], name: str) -> Optional[str]:
+    quant = config.get("quantization_config")
+    if quant:
+        method = quant.get("quant_method", "quantized")
+        if quant.get("load_in_4bit"):
+            return f"{method}-4bit"
+        if quant.get("load_in_8bit"):
+            return f"{method}-8bit"
+        bits = quant.get("bits")
+        return f"{method}-{bits}bit" if bits else method
+    lowered = name.lower()
+    for marker in ("bnb-4bit", "4bit", "8bit", "awq", "gptq", "gguf"):
+        if marker in lowered:
+            return marker
+    return None
+
+
+def _describe(model_id: str, files_dir: Path, size: int, source: str, path: Path):
+    """Build an index entry for a model whose files live in ``files_dir``."""
+    config: Dict[str, Any] = {}
+    config_path = files_dir / "config.json"
+    if config_path.exists():
+        try:
+            config = json.loads(config_path.read_text())
+        except (OSError, ValueError):
+            pass
+    if not config and not any(files_dir.glob("*.safetensors")) and not any(
+        files_dir.glob("*.gguf")
+    ):
+        return None  # datasets, tokenizers-only repos, ...
+
+    params = 0
+    for shard in files_dir.glob("*.safetensors"):
+        try:
+            params += _safetensors_params(shard)
+        except (OSError, ValueError, struct.error):
+            params = 0
+            break
+    params = params or _estimate_params(config)
+
+    architectures = config.get("architectures") or []
+    return {
+        "id": model_id,
+        "name": model_id.split("/")[-1],
+        "source": source,
+        "path": str(path),
+        "size_bytes": size,
+        "size": format_size(size),
+        "parameters": params,
+        "parameters_label": format_params(params),
+        "architecture": architectures[0] if architectures else config.get("model_type"),
+        "quantization": _quantization(config, model_id)
+        or (str(config["torch_dtype"]) if config.get("torch_dtype") else None),
+        "description": config.get("model_type"),
+    }
+
+
+def _scan_hub_model(model_dir: Path) -> Optional[Dict[str, Any]]:
+    """``models--org--name`` directory in the hub cache."""
+    model_id = model_dir.name[len("models--"):].replace("--", "/")
+    snapshots = sorted(
+        (p for p in (model_dir / "snapshots").glob("*") if p.is_dir()),
+        key=_mtime,
+    )
+    if not snapshots:
+        return None
+    size = sum(
+        f.stat().st_size
+        for f in (model_dir / "blobs").glob("*")
+        if f.is_file() and not f.name.endswith(".incomplete")
+    )
+    return _describe(model_id, snapshots[-1], size, "hub", model_dir)
+
+
+def _scan_local_model(model_dir: Path, root: Path) -> Optional[Dict[str, Any]]:
+    """Plain directory (merged export, downloaded checkout, ...)."""
+    size = sum(f.stat().st_size for f in model_dir.rglob("*") if f.is_file())
+    model_id = model_dir.relative_to(root).as_posix()
+    return _describe(model_id, model_dir, size, "workspace", model_dir)
+
+
+class ModelCatalog:
+    """Incrementally refreshed index of local models."""
+
+    def __init__(self, roots: Iterable[Tuple[str, Path]], index_path: Path):
+        self.roots = list(roots)
+        self.index_path = index_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.etag = '"empty"'
+        self._last_check = float("-inf")
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.index_path.read_text())
+            if data.get("version") == INDEX_VERSION:
+                self.entries = data["entries"]
+                self._update_etag()
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+
+    def _save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "entries": self.entries}))
+        os.replace(tmp, self.index_path)
+
+    def _update_etag(self):
+        entries = self.entries
+        digest = hashlib.sha256()
+        for key in sorted(entries):
+            digest.update(f"{key}:{entries[key]['stamp']}".encode())
+        self.etag = f'"{digest.hexdigest()[:20]}"'
+
+    def _candidates(self):
+        """Yield ``(key, kind, model_dir, root, stamp)`` for every model directory."""
+        for kind, root in self.roots:
+            if not root.is_dir():
+                continue
+            for entry in os.scandir(root):
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                model_dir = Path(entry.path)
+                if kind == "hub":
+                    if not entry.name.startswith("models--"):
+                        continue
+                    # Downloads touch blobs/ and snapshots/, not the top directory
+                    stamp = max(
+                        entry.stat().st_mtime,
+                        _mtime(model_dir / "blobs"),
+                        _mtime(model_dir / "snapshots"),
+                    )
+                else:
+                    stamp = entry.stat().st_mtime
+                yield f"{kind}:{model_dir}", kind, model_dir, root, stamp
+
+    def stale(self) -> bool:
+        """True once REFRESH_INTERVAL has passed since the last filesystem check."""
+        return time.monotonic() - self._last_check >= REFRESH_INTERVAL
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-read changed model directories. Returns True if the index changed.
+
+        This stats every model directory, so call it off the event loop.
+        """
+        if not force and not self.stale():
+            return False
+        with self._lock:
+            if not force and not self.stale():
+                return False  # another thread refreshed while we waited
+            # Readers iterate ``entries`` without the lock, so build the new
+            # index on the side and swap it in whole
+            previous = self.entries
+            entries: Dict[str, Dict[str, Any]] = {}
+            changed = False
+            for key, kind, model_dir, root, stamp in self._candidates():
+                cached = previous.get(key)
+                if cached is not None and cached["stamp"] == stamp:
+                    entries[key] = cached
+                    continue
+                try:
+                    model = (
+                        _scan_hub_model(model_dir)
+                        if kind == "hub"
+                        else _scan_local_model(model_dir, root)
+                    )
+                except OSError:
+                    model = None
+                if model is not None:
+                    model["modified"] = stamp
+                entries[key] = {"stamp": stamp, "model": model}
+                changed = True
+            changed = changed or previous.keys() != entries.keys()
+            self._last_check = time.monotonic()
+
+            if changed:
+                # Entries before the ETag: a page built from the old index is
+                # then only ever cached under the old ETag
+                self.entries = entries
+                self._update_etag()
+                self._save()
+                response_cache.invalidate("models")
+            return changed
+
+    def query(
+        self,
+        q: Optional[str] = None,
+        source: Optional[str] = None,
+        quantization: Optional[str] = None,
+        architecture: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        entries = self.entries  # refresh() swaps the dict rather than mutating it
+        models = [e["model"] for e in entries.values() if e["model"] is not None]
+
+        if q:
+            needle = q.lower()
+            models = [m for m in models if needle in m["id"].lower()]
+        if source:
+            models = [m for m in models if m["source"] == source]
+        if quantization:
+            models = [m for m in models if (m["quantization"] or "") == quantization]
+        if architecture:
+            models = [m for m in models if m["architecture"] == architecture]
+
+        if sort == "name":
+            models.sort(key=lambda m: m["id"].lower(), reverse=order == "desc")
+        else:
+            field = "size_bytes" if sort == "size" else sort
+            models.sort(key=lambda m: m[field] or 0, reverse=order == "desc")
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        return {
+            "models": models[offset : offset + limit],
+            "total": len(models),
+            "offset": offset,
+            "limit": limit,
+        }
+
+    def respond(self, request: Request, **filters) -> Response:
+        """Query the catalog, answering If-None-Match with 304 when nothing changed."""
+        # Same index + same query string => same body. The index fingerprint is
+        # read before querying, so a page built while a refresh lands is not
+        # served once the refresh is done.
+        key = ("models", str(request.url.query))
+        version = self.etag
+        entry = response_cache.get(key, version)
+        if entry is None:
+            try:
+                body = self.query(**filters)
+            except ValueError as e:
+                return JSONResponse({"detail": str(e)}, status_code=400)
+            entry = response_cache.put(key, body, version)
+        return response_cache.respond(request, entry)
+
+
+def default_roots() -> List[Tuple[str, Path]]:
+    return [("hub", hub_cache_dir()), ("workspace", settings.WORKSPACE_DIR / "models")]
+
+
+# Shared catalog for the app
+catalog = ModelCatalog(default_roots(), settings.WORKSPACE_DIR / "cache" / "models.json")
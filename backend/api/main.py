@@ -1,15 +1,45 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-import torch
-import platform
-import psutil
+from typing import Optional
+
+from .core.assets import AssetIndex
+from .core.batch import handle_batch
+from .core.blocking import blocking_pool, loop_monitor, run_blocking
+from .core.instrumentation import CONTENT_TYPE, InstrumentationMiddleware, http_metrics
+from .core.jobs import broker, scheduler, status_payload
+from .core.kernel_state import attach_from_env
+from .core.model_catalog import catalog
+from .core.response_cache import FastJSONResponse, response_cache
+from .core.telemetry import sampler
+
+# What the notebook kernel that launched this server shares with it, if any
+kernel_state = attach_from_env()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Telemetry is sampled in the background; /api/system only reads it
+    sampler.start()
+    loop_monitor.start()
+    # Re-queues jobs a previous run left queued or interrupted
+    scheduler.start()
+    yield
+    scheduler.stop()
+    loop_monitor.stop()
+    sampler.stop()
+
 
 # Create FastAPI app
-app = FastAPI(title="Unsloth UI Demo", version="1.0.0")
+app = FastAPI(
+    title="Unsloth UI Demo",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS
 app.add_middleware(
@@ -19,6 +49,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so it times everything including CORS
+app.add_middleware(InstrumentationMiddleware, registry=http_metrics)
+# Loop lag and blocking-pool usage are exported alongside the request metrics
+http_metrics.add_collector(loop_monitor.metric_lines)
+http_metrics.add_collector(blocking_pool.metric_lines)
+http_metrics.add_collector(response_cache.metric_lines)
 
 # ============ API Routes ============
 
@@ -29,33 +65,22 @@ async def health_check():
 
 
 @app.get("/api/system")
-async def get_system_info():
-    gpu_info = {"available": False, "devices": []}
-    if torch.cuda.is_available():
-        gpu_info["available"] = True
-        for i in range(torch.cuda.device_count()):
-            props = torch.cuda.get_device_properties(i)
-            gpu_info["devices"].append(
-                {
-                    "index": i,
-                    "name": props.name,
-                    "memory_total_gb": round(props.total_memory / 1e9, 2),
-                }
-            )
+async def get_system_info(request: Request):
+    snapshot = sampler.latest()
+    # Encoded once per telemetry sample, however often the dashboard polls
+    return response_cache.cached(
+        request, ("system",), lambda: snapshot, version=snapshot["timestamp"]
+    )
 
-    memory = psutil.virtual_memory()
 
-    return {
-        "platform": platform.platform(),
-        "python_version": platform.python_version(),
-        "cpu_count": psutil.cpu_count(),
-        "memory": {
-            "total_gb": round(memory.total / 1e9, 2),
-            "available_gb": round(memory.available / 1e9, 2),
-            "percent_used": memory.percent,
-        },
-        "gpu": gpu_info,
-    }
+@app.get("/api/system/history")
+async def get_system_history(window: float = 300.0, resolution: float = 5.0):
+    return sampler.history(window=window, resolution=resolution)
+
+
+@app.get("/api/metrics")
+async def prometheus_metrics():
+    return Response(http_metrics.render(), media_type=CONTENT_TYPE)
 
 
 @app.post("/api/echo")
@@ -67,44 +92,88 @@ async def echo_message(data: dict):
     }
 
 
+@app.post("/api/batch")
+async def batch_requests(request: Request):
+    """Several API calls in one round trip, with a status and body for each."""
+    return await handle_batch(request)
+
+
 @app.get("/api/models")
-async def list_models():
-    return {
-        "models": [
-            {
-                "id": "unsloth/llama-3-8b-bnb-4bit",
-                "name": "Llama 3 8B (4-bit)",
-                "size": "4.5 GB",
-                "description": "Fast 4-bit quantized Llama 3",
-            },
-            {
-                "id": "unsloth/mistral-7b-bnb-4bit",
-                "name": "Mistral 7B (4-bit)",
-                "size": "3.8 GB",
-                "description": "Efficient Mistral model",
-            },
-            {
-                "id": "unsloth/gemma-7b-bnb-4bit",
-                "name": "Gemma 7B (4-bit)",
-                "size": "4.2 GB",
-                "description": "Google's Gemma model",
-            },
-        ]
-    }
+async def list_models(
+    request: Request,
+    q: Optional[str] = None,
+    source: Optional[str] = None,
+    quantization: Optional[str] = None,
+    architecture: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    offset: int = 0,
+    limit: int = 50,
+):
+    if catalog.stale():
+        await run_blocking(catalog.refresh)
+    return catalog.respond(
+        request,
+        q=q,
+        source=source,
+        quantization=quantization,
+        architecture=architecture,
+        sort=sort,
+        order=order,
+        offset=offset,
+        limit=limit,
+    )
 
 
 @app.post("/api/train/start")
 async def start_training(config: dict):
+    # Writes and fsyncs the job record, and may spawn its worker process
+    job_id = (await run_blocking(scheduler.submit, config))["job_id"]
+    record = scheduler.snapshot(job_id)
     return {
-        "status": "started",
-        "job_id": f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-        "message": "Training simulation started (this is a demo)",
+        "status": record["state"],
+        "job_id": job_id,
+        "events_url": f"/api/train/{job_id}/events",
+        "queue_position": scheduler.queue_position(job_id),
+        "message": record["message"],
     }
 
 
 @app.get("/api/train/status")
-async def get_training_status():
-    return {"status": "idle", "message": "No training in progress"}
+async def get_training_status(job_id: Optional[str] = None):
+    # Training running in the notebook that launched this server
+    if job_id is None and kernel_state:
+        training = kernel_state.read().get("training")
+        if training:
+            return training
+    record = scheduler.snapshot(job_id)
+    if record is None and job_id is not None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return status_payload(record)
+
+
+@app.post("/api/train/{job_id}/cancel")
+async def cancel_training(job_id: str):
+    record = await run_blocking(scheduler.cancel, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return status_payload(record)
+
+
+@app.get("/api/train/{job_id}/events")
+async def stream_training_events(job_id: str, request: Request, last_event_id: int = 0):
+    """Server-Sent Events stream of step, loss, throughput and state changes."""
+    if scheduler.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    scheduler.channel_for(job_id)
+    # EventSource sends Last-Event-ID itself when it reconnects
+    header = request.headers.get("last-event-id")
+    resume_from = int(header) if header and header.isdigit() else last_event_id
+    return StreamingResponse(
+        broker.stream(job_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============ Serve Frontend ============
@@ -113,25 +182,25 @@ async def get_training_status():
 def setup_frontend(app: FastAPI, build_path: Path):
     """Mount frontend static files"""
     if build_path.exists():
-        # Mount assets
-        assets_dir = build_path / "assets"
-        if assets_dir.exists():
-            app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
+        # Load the whole build into memory once, with gzip/brotli variants
+        assets = AssetIndex(build_path)
+
+        @app.get("/assets/{asset_path:path}")
+        async def serve_asset(asset_path: str, request: Request):
+            return assets.respond(
+                assets.get(f"assets/{asset_path}"), request, immutable=True
+            )
 
         @app.get("/")
-        async def serve_root():
-            return FileResponse(build_path / "index.html")
+        async def serve_root(request: Request):
+            return assets.respond(assets.index, request)
 
         @app.get("/{full_path:path}")
-        async def serve_frontend(full_path: str):
+        async def serve_frontend(full_path: str, request: Request):
             if full_path.startswith("api"):
                 return {"error": "API endpoint not found"}
 
-            file_path = build_path / full_path
-            if file_path.is_file():
-                return FileResponse(file_path)
-
-            return FileResponse(build_path / "index.html")
+            return assets.respond(assets.get(full_path) or assets.index, request)
 
         return True
     return False
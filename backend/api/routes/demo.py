@@ -1,8 +1,10 @@
-from fastapi import APIRouter
-import torch
-import platform
-import psutil
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from typing import Optional
+
+from ..core.model_catalog import catalog
+from ..core.telemetry import sampler
 
 router = APIRouter()
 
@@ -15,36 +17,17 @@ async def health_check():
 
 @router.get("/system")
 async def get_system_info():
-    """Get system information"""
-
-    # GPU Info
-    gpu_info = {"available": False, "devices": []}
-    if torch.cuda.is_available():
-        gpu_info["available"] = True
-        for i in range(torch.cuda.device_count()):
-            props = torch.cuda.get_device_properties(i)
-            gpu_info["devices"].append(
-                {
-                    "index": i,
-                    "name": props.name,
-                    "memory_total_gb": round(props.total_memory / 1e9, 2),
-                }
-            )
-
-    # CPU & Memory
-    memory = psutil.virtual_memory()
+    """Get system information (latest background telemetry snapshot)"""
+    snapshot = sampler.latest()
+    if snapshot is None:  # the app mounting this router never started the sampler
+        raise HTTPException(status_code=503, detail="System telemetry is not running")
+    return snapshot
 
-    return {
-        "platform": platform.platform(),
-        "python_version": platform.python_version(),
-        "cpu_count": psutil.cpu_count(),
-        "memory": {
-            "total_gb": round(memory.total / 1e9, 2),
-            "available_gb": round(memory.available / 1e9, 2),
-            "percent_used": memory.percent,
-        },
-        "gpu": gpu_info,
-    }
+
+@router.get("/system/history")
+async def get_system_history(window: float = 300.0, resolution: float = 5.0):
+    """Get downsampled telemetry for the last `window` seconds"""
+    return sampler.history(window=window, resolution=resolution)
 
 
 @router.post("/echo")
@@ -58,30 +41,31 @@ async def echo_message(data: dict):
 
 
 @router.get("/models")
-async def list_models():
-    """List available models (demo)"""
-    return {
-        "models": [
-            {
-                "id": "unsloth/llama-3-8b-bnb-4bit",
-                "name": "Llama 3 8B (4-bit)",
-                "size": "4.5 GB",
-                "description": "Fast 4-bit quantized Llama 3",
-            },
-            {
-                "id": "unsloth/mistral-7b-bnb-4bit",
-                "name": "Mistral 7B (4-bit)",
-                "size": "3.8 GB",
-                "description": "Efficient Mistral model",
-            },
-            {
-                "id": "unsloth/gemma-7b-bnb-4bit",
-                "name": "Gemma 7B (4-bit)",
-                "size": "4.2 GB",
-                "description": "Google's Gemma model",
-            },
-        ]
-    }
+async def list_models(
+    request: Request,
+    q: Optional[str] = None,
+    source: Optional[str] = None,
+    quantization: Optional[str] = None,
+    architecture: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    offset: int = 0,
+    limit: int = 50,
+):
+    """List models present in the local Hugging Face cache and workspace"""
+    if catalog.stale():
+        await run_in_threadpool(catalog.refresh)
+    return catalog.respond(
+        request,
+        q=q,
+        source=source,
+        quantization=quantization,
+        architecture=architecture,
+        sort=sort,
+        order=order,
+        offset=offset,
+        limit=limit,
+    )
 
 
 @router.post("/train/start")
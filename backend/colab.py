@@ -89,31 +89,70 @@ def show_link(port: int = 8000):
     display(HTML(html))
 
 
-def start(port: int = 8000):
-    """
-    Start Unsloth UI server in Colab and display the URL.
-    """
+def _prepare():
+    """Put the backend on sys.path and locate the frontend build."""
     import sys
 
-    print("🦥 Starting Unsloth UI...")
-
     # Add backend to path
     backend_path = str(Path(__file__).parent)
     if backend_path not in sys.path:
         sys.path.insert(0, backend_path)
 
-    print("   Loading backend...")
-    from run import run_server
-
     # Auto-detect frontend path
     repo_root = Path(__file__).parent.parent
-    frontend_path = repo_root / "frontend" / "build"
+    return repo_root / "frontend" / "build"
+
+
+def _startup_time(server, mode: str) -> float:
+    timings = server.startup_timings if mode == "process" else server.state.startup_timings
+    return timings["total"]
+
+
+def start(port: int = 8000, mode: str = "thread"):
+    """
+    Start Unsloth UI server in Colab and display the URL.
+
+    Returns as soon as the server accepts connections; raises OSError right
+    away if the port is already in use.
+
+    By default the server runs in the kernel itself and the app is returned,
+    as before. Pass ``mode="process"`` to run it in a supervised child
+    process instead, so the UI stays responsive while a cell trains; the
+    ``ServerProcess`` is then returned, and notebook progress is published to
+    the UI with ``server.state.update(training={...})``. The app itself is
+    not reachable from the kernel in that mode.
+    """
+    print("🦥 Starting Unsloth UI...")
+    frontend_path = _prepare()
+
+    print("   Loading backend...")
+    from run import run_server
 
     print("   Starting server...")
     # Start server silently
-    run_server(host="0.0.0.0", port=port, frontend_path=frontend_path, silent=True)
+    server = run_server(
+        host="0.0.0.0", port=port, frontend_path=frontend_path, silent=True, mode=mode
+    )
 
-    print("   Server started!")
+    print(f"   Server started in {_startup_time(server, mode):.2f}s")
 
     # Show the clickable link with real URL
     show_link(port)
+    return server
+
+
+async def start_async(port: int = 8000, mode: str = "thread"):
+    """
+    ``await``-able ``start`` that keeps the notebook's event loop responsive.
+    """
+    print("🦥 Starting Unsloth UI...")
+    frontend_path = _prepare()
+
+    from run import run_server_async
+
+    server = await run_server_async(
+        host="0.0.0.0", port=port, frontend_path=frontend_path, silent=True, mode=mode
+    )
+    print(f"   Server started in {_startup_time(server, mode):.2f}s")
+    show_link(port)
+    return server
@@ -77,37 +77,89 @@
 """
 Run script for Unsloth UI backend.
 Works in both local and Colab environments.
+
+``run_server`` binds the port itself, so a port that is already in use fails
+immediately, then returns as soon as uvicorn has finished startup and is
+accepting connections. ``run_server_async`` does the same without blocking a
+running event loop (e.g. a notebook's). Both record how long each startup
+phase took in ``app.state.startup_timings``.
+
+By default the server runs on a thread inside the calling process. In a
+notebook that means sharing the kernel's GIL (and a ``nest_asyncio``-patched
+loop) with whatever cell is running, so the UI stalls while a cell trains.
+``mode="process"`` runs it as a supervised child process instead: see
+``ServerProcess``.
 """
+import json
+import os
+import select
+import socket
+import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
 
+# Seconds to wait for the server to come up before giving up
+READY_TIMEOUT = 30.0
+# How often readiness is checked while waiting
+READY_POLL_INTERVAL = 0.005
 
-def run_server(
-    host: str = "0.0.0.0",
-    port: int = 8000,
-    frontend_path: Path = None,
-    silent: bool = False,
-):
-    """
-    Start the FastAPI server.
+# Seconds before restarting a crashed server process, doubling per crash
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+# A server process that ran this long is healthy; its next crash restarts quickly
+STABLE_UPTIME = 60.0
+# Seconds a stopping server process gets to shut down before it is killed
+STOP_TIMEOUT = 5.0
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    """Bind and listen on host:port, raising OSError (e.g. EADDRINUSE) right away."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # asyncio only sets TCP_NODELAY on connections accepted from a socket whose
+    # proto is IPPROTO_TCP; without it small responses stall ~40ms on delayed ACKs
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    try:
+        if sys.platform != "win32":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+    except OSError:
+        sock.close()
+        raise
+    sock.set_inheritable(True)
+    return sock
+
+
+def _launch(host: str, port: int, frontend_path: Path, silent: bool):
+    """Import, build and bind the app, then start serving it on a daemon thread."""
+    from threading import Thread
+
+    timings = {}
+    started = time.perf_counter()
+    mark = started
+
+    def phase(name: str):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round(now - mark, 4)
+        mark = now
 
-    Args:
-        host: Host to bind to
-        port: Port to bind to
-        frontend_path: Path to frontend build directory
-        silent: Suppress startup messages
-    """
     import nest_asyncio
 
     nest_asyncio.apply()
 
     import asyncio
-    from threading import Thread
-    import time
+    import fastapi  # noqa: F401
     import uvicorn
 
+    phase("imports")
+
     from api.main import app, setup_frontend
 
+    phase("app")
+
     # Setup frontend if path provided
     if frontend_path:
         if setup_frontend(app, frontend_path):
@@ -116,24 +168,376 @@ def run_server(
         else:
             if not silent:
                 print(f"⚠️ Frontend not found at {frontend_path}")
+    phase("frontend")
+
+    sock = _bind_socket(host, port)
+    phase("bind")
+
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    errors = []
 
     # Run server
     def _run():
-        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
-        server = uvicorn.Server(config)
-        asyncio.run(server.serve())
+        try:
+            asyncio.run(server.serve(sockets=[sock]))
+        except BaseException as e:  # SystemExit from a failed lifespan, ...
+            errors.append(e)
+        finally:
+            sock.close()
 
-    thread = Thread(target=_run, daemon=True)
+    thread = Thread(target=_run, name="uvicorn", daemon=True)
     thread.start()
-    time.sleep(3)
 
-    if not silent:
-        print("")
-        print("=" * 50)
-        print(f"🦥 Server is running on port {port}")
-        print("=" * 50)
+    def finish():
+        phase("startup")
+        timings["total"] = round(mark - started, 4)
+        app.state.server = server
+        app.state.startup_timings = timings
+        if not silent:
+            print("")
+            print("=" * 50)
+            print(f"🦥 Server is running on port {port}")
+            print(
+                "   Started in {total:.2f}s (imports {imports:.2f}s, app {app:.2f}s, "
+                "frontend {frontend:.2f}s, bind {bind:.3f}s, startup {startup:.2f}s)".format(
+                    **timings
+                )
+            )
+            print("=" * 50)
+        return app
+
+    def check():
+        """True once ready; raises if the server thread died first."""
+        if server.started:
+            return True
+        if not thread.is_alive():
+            cause = errors[0] if errors else None
+            raise RuntimeError(f"Server on port {port} failed to start") from cause
+        if time.perf_counter() - started > READY_TIMEOUT:
+            server.should_exit = True
+            raise TimeoutError(f"Server on port {port} not ready after {READY_TIMEOUT}s")
+        return False
+
+    return check, finish
+
+
+class ServerProcess:
+    """
+    The server running as a supervised child process.
+
+    This process binds the port and hands the listening socket to each child,
+    so connections arriving while a crashed child restarts wait in the
+    backlog instead of being refused. A supervisor thread, blocked in
+    ``wait()`` without holding the GIL, restarts a child that exits with
+    growing delays. Each child also holds the read end of a pipe from this
+    process and exits when it closes, so the server never outlives the
+    kernel that started it.
+
+    ``state`` is a ``KernelState`` shared with the server; for example
+    ``server.state.update(training={"status": "training", "step": 10})`` is
+    what ``/api/train/status`` then reports.
+    """
+
+    def __init__(self, host: str, port: int, frontend_path: Path = None):
+        from api.core.config import settings
+        from api.core.kernel_state import KernelState
+
+        self.host = host
+        self.port = port
+        self.frontend_path = frontend_path
+        self.restarts = 0
+        self.startup_timings = {}
+        settings.setup_directories()
+        self.log_path = settings.WORKSPACE_DIR / "server.log"
+        self._sock = _bind_socket(host, port)
+        self.state = KernelState.create()
+        self._proc = None
+        self._ready_fd = None
+        self._ready_buffer = b""
+        self._lifeline_fd = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self._proc.pid if self._proc else None
+
+    def spawn(self):
+        """Start a child serving the socket; ``check_ready`` reports when it is up."""
+        from api.core.kernel_state import STATE_ENV
+
+        ready_read, ready_write = os.pipe()
+        lifeline_read, lifeline_write = os.pipe()
+        command = [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "--child",
+            "--fd",
+            str(self._sock.fileno()),
+            "--ready-fd",
+            str(ready_write),
+            "--lifeline-fd",
+            str(lifeline_read),
+        ]
+        if self.frontend_path:
+            command += ["--frontend", str(self.frontend_path)]
+        with open(self.log_path, "ab") as log:
+            log.write(f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} starting server\n".encode())
+            log.flush()
+            proc = subprocess.Popen(
+                command,
+                cwd=str(Path(__file__).parent),
+                env={**os.environ, STATE_ENV: str(self.state.path)},
+                pass_fds=(self._sock.fileno(), ready_write, lifeline_read),
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                # Keyboard interrupts aimed at a notebook cell must not reach it
+                start_new_session=True,
+            )
+        os.close(ready_write)
+        os.close(lifeline_read)
+        with self._lock:
+            self._close_pipes()
+            self._proc = proc
+            self._ready_fd = ready_read
+            self._ready_buffer = b""
+            self._lifeline_fd = lifeline_write
+
+    def check_ready(self) -> bool:
+        """
+        True once the current child accepts connections.
+
+        Raises:
+            RuntimeError: The child exited during startup
+        """
+        while select.select([self._ready_fd], [], [], 0)[0]:
+            chunk = os.read(self._ready_fd, 65536)
+            if not chunk:
+                code = self._proc.wait()
+                raise RuntimeError(
+                    f"Server process on port {self.port} exited with code {code} "
+                    f"during startup; see {self.log_path}"
+                )
+            self._ready_buffer += chunk
+            if self._ready_buffer.endswith(b"\n"):
+                self.startup_timings = json.loads(self._ready_buffer)
+                return True
+        return False
+
+    def _wait_ready(self):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not self.check_ready():
+            if time.monotonic() > deadline:
+                self._proc.kill()
+                raise TimeoutError(
+                    f"Server process on port {self.port} not ready after {READY_TIMEOUT}s"
+                )
+            time.sleep(READY_POLL_INTERVAL)
+
+    def supervise(self):
+        """Restart the child whenever it exits, until ``stop``."""
+        threading.Thread(target=self._supervise, name="server-supervisor", daemon=True).start()
+
+    def _supervise(self):
+        delay = RESTART_DELAY
+        while True:
+            started = time.monotonic()
+            code = self._proc.wait()
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - started > STABLE_UPTIME:
+                delay = RESTART_DELAY
+            print(
+                f"🦥 Server process exited with code {code}; restarting in "
+                f"{delay:g}s (log: {self.log_path})"
+            )
+            if self._stopping.wait(delay):
+                return
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+            try:
+                self.spawn()
+                self._wait_ready()
+            except Exception as e:
+                if self._stopping.is_set():
+                    self._terminate()
+                    return
+                print(f"⚠️ Server restart failed: {e}")
+                continue
+            self.restarts += 1
+            if self._stopping.is_set():
+                self._terminate()
+                return
+
+    def _terminate(self):
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def _close_pipes(self):
+        for fd in (self._ready_fd, self._lifeline_fd):
+            if fd is not None:
+                os.close(fd)
+        self._ready_fd = self._lifeline_fd = None
+
+    def stop(self):
+        """Stop the server and its supervisor, and release the port."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._terminate()
+        with self._lock:
+            self._close_pipes()
+        self._sock.close()
+        self.state.close()
+
+
+def _launch_process(host: str, port: int, frontend_path: Path, silent: bool):
+    """Bind the port and start the server as a child process; see ``ServerProcess``."""
+    import atexit
+
+    if sys.platform == "win32":
+        raise NotImplementedError("mode='process' needs a POSIX system; use mode='thread'")
+    started = time.perf_counter()
+    server = ServerProcess(host, port, frontend_path)
+    server.spawn()
+    atexit.register(server.stop)
 
-    return app
+    def check():
+        try:
+            if server.check_ready():
+                return True
+            if time.perf_counter() - started > READY_TIMEOUT:
+                raise TimeoutError(f"Server on port {port} not ready after {READY_TIMEOUT}s")
+        except Exception:
+            server.stop()
+            raise
+        return False
+
+    def finish():
+        server.startup_timings["total"] = round(time.perf_counter() - started, 4)
+        server.supervise()
+        if not silent:
+            print("")
+            print("=" * 50)
+            print(f"🦥 Server is running on port {port} (process {server.pid})")
+            print(f"   Started in {server.startup_timings['total']:.2f}s")
+            print("=" * 50)
+        return server
+
+    return check, finish
+
+
+def _serve_child(fd: int, ready_fd: int, lifeline_fd: int, frontend_path: Path):
+    """Child side of ``ServerProcess``: serve the inherited socket until told to stop."""
+    timings = {}
+    started = time.perf_counter()
+    mark = started
+
+    def phase(name: str):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round(now - mark, 4)
+        mark = now
+
+    import asyncio
+    import uvicorn
+
+    phase("imports")
+
+    from api.main import app, setup_frontend
+
+    phase("app")
+    if frontend_path:
+        setup_frontend(app, frontend_path)
+    phase("frontend")
+
+    sock = socket.socket(fileno=fd)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+
+    def watch_parent():
+        # Returns when the parent closes its end, or dies
+        os.read(lifeline_fd, 1)
+        server.should_exit = True
+
+    threading.Thread(target=watch_parent, name="lifeline", daemon=True).start()
+
+    async def serve():
+        task = asyncio.ensure_future(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(READY_POLL_INTERVAL)
+        if server.started:
+            phase("startup")
+            os.write(ready_fd, (json.dumps(timings) + "\n").encode())
+        os.close(ready_fd)
+        await task
+
+    asyncio.run(serve())
+
+
+def _launcher(mode: str):
+    if mode == "thread":
+        return _launch
+    if mode == "process":
+        return _launch_process
+    raise ValueError(f"mode must be 'thread' or 'process', not {mode!r}")
+
+
+def run_server(
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    frontend_path: Path = None,
+    silent: bool = False,
+    mode: str = "thread",
+):
+    """
+    Start the FastAPI server and wait until it accepts connections.
+
+    Args:
+        host: Host to bind to
+        port: Port to bind to
+        frontend_path: Path to frontend build directory
+        silent: Suppress startup messages
+        mode: "thread" to serve from this process, "process" to serve from a
+            supervised child process (see ``ServerProcess``)
+
+    Returns:
+        In thread mode, the app: ``app.state.server`` is the running uvicorn
+        server and ``app.state.startup_timings`` the per-phase startup times
+        in seconds. In process mode, the ``ServerProcess``, with the child's
+        times in ``startup_timings``.
+
+    Raises:
+        OSError: The port could not be bound (already in use, ...)
+        RuntimeError: The server exited during startup
+    """
+    check, finish = _launcher(mode)(host, port, frontend_path, silent)
+    while not check():
+        time.sleep(READY_POLL_INTERVAL)
+    return finish()
+
+
+async def run_server_async(
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    frontend_path: Path = None,
+    silent: bool = False,
+    mode: str = "thread",
+):
+    """Like ``run_server``, but awaits readiness instead of blocking the loop."""
+    import asyncio
+
+    check, finish = _launcher(mode)(host, port, frontend_path, silent)
+    while not check():
+        await asyncio.sleep(READY_POLL_INTERVAL)
+    return finish()
 
 
 # For direct execution
@@ -147,16 +551,29 @@ if __name__ == "__main__":
         "--frontend", type=str, default=None, help="Path to frontend build"
     )
     parser.add_argument("--silent", action="store_true", help="Suppress output")
+    parser.add_argument(
+        "--mode", choices=("thread", "process"), default="thread", help="Where to serve from"
+    )
+    # Used by ServerProcess to start its children
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fd", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--ready-fd", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--lifeline-fd", type=int, help=argparse.SUPPRESS)
 
     args = parser.parse_args()
 
     frontend_path = Path(args.frontend) if args.frontend else None
+    if args.child:
+        _serve_child(args.fd, args.ready_fd, args.lifeline_fd, frontend_path)
+        sys.exit(0)
     run_server(
-        host=args.host, port=args.port, frontend_path=frontend_path, silent=args.silent
+        host=args.host,
+        port=args.port,
+        frontend_path=frontend_path,
+        silent=args.silent,
+        mode=args.mode,
     )
 
     # Keep running
-    import time
-
     while True:
         time.sleep(1)
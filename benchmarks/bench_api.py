@@ -0,0 +1,302 @@
+"""
+Latency and throughput benchmark for the studio API.
+
+Drives every route the UI uses (health, telemetry, models, echo, training
+start/status/metrics, the frontend index, a hashed asset and the SPA
+fallback) at several concurrency levels, both in-process through httpx's
+ASGI transport (app cost only) and over a real local socket to uvicorn in a
+separate server process (adds HTTP parsing and the network stack, without the
+client competing for the server's GIL). Reports p50/p95/p99 latency,
+requests/sec and server RSS for every (transport, route, concurrency).
+
+The app runs against a throwaway workspace, so submitted jobs never touch a
+real one. Results can be saved as JSON and compared to a stored baseline; the
+comparison exits non-zero when any hot path regressed beyond the tolerance.
+
+Usage:
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --concurrency 1,16,64 --requests 2000 --output bench.json
+    python benchmarks/bench_api.py --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import psutil
+
+# Isolate the benchmark from the user's workspace before the app is imported
+os.environ["UNSLOTH_STUDIO_WORKSPACE"] = tempfile.mkdtemp(prefix="studio-bench-")
+os.environ.pop("UNSLOTH_STUDIO_COORDINATOR", None)
+
+from roland_ui_demo.studio.backend.main import app, frontend_assets  # noqa: E402
+
+# (name, method, path, JSON body). "{job_id}" and "{asset}" are filled in at runtime.
+ROUTES = (
+    ("health", "GET", "/api/health", None),
+    ("system", "GET", "/api/system", None),
+    ("system_history", "GET", "/api/system/history?window=300&resolution=5", None),
+    ("models", "GET", "/api/models", None),
+    ("echo", "POST", "/api/echo", {"text": "benchmark"}),
+    ("train_start", "POST", "/api/train/start", {"model_name": "bench", "num_epochs": 1}),
+    ("train_status", "GET", "/api/train/status?job_id={job_id}", None),
+    ("train_metrics", "GET", "/api/train/{job_id}/metrics?points=200", None),
+    ("frontend_index", "GET", "/", None),
+    ("frontend_asset", "GET", "/{asset}", None),
+    ("spa_fallback", "GET", "/training/some/client/route", None),
+)
+
+# Requests per route that submit jobs; each writes and fsyncs a job record
+WRITE_ROUTE_REQUESTS = 100
+# Unmeasured requests sent before each measurement
+WARMUP_REQUESTS = 20
+PERCENTILES = (50, 95, 99)
+
+# Browsers send this; it exercises the precompressed asset variants
+HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+
+# Seconds to wait for the socket-mode server to answer /api/health
+SERVER_START_TIMEOUT = 30.0
+
+SERVER_SCRIPT = (
+    "import sys, uvicorn\n"
+    "from roland_ui_demo.studio.backend.main import app\n"
+    "uvicorn.run(app, host='127.0.0.1', port=int(sys.argv[1]),"
+    " log_level='warning', access_log=False)\n"
+)
+
+
+def _rss_mb(process: psutil.Process) -> float:
+    return round(process.memory_info().rss / 1e6, 1)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load(client, method, path, body, requests, concurrency):
+    """Send ``requests`` requests with ``concurrency`` in flight; return stats."""
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=HEADERS)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.asarray(latencies) * 1000
+    stats = {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        stats[f"p{p}_ms"] = round(float(value), 3)
+    return stats
+
+
+async def bench_client(client, transport, routes, levels, requests, server):
+    submitted = await client.post("/api/train/start", json={"model_name": "bench"})
+    job_id = submitted.json()["job_id"]
+    asset = next(
+        (path for path in frontend_assets.assets if path.startswith("assets/")),
+        "index.html",
+    )
+
+    results = []
+    for name, method, path, body in routes:
+        path = path.format(job_id=job_id, asset=asset)
+        count = WRITE_ROUTE_REQUESTS if method == "POST" and "train" in name else requests
+        await run_load(client, method, path, body, WARMUP_REQUESTS, 1)
+        for concurrency in levels:
+            rss_before = _rss_mb(server)
+            stats = await run_load(client, method, path, body, count, concurrency)
+            rss_after = _rss_mb(server)
+            stats.update(
+                {
+                    "transport": transport,
+                    "route": name,
+                    "concurrency": concurrency,
+                    "rss_mb": rss_after,
+                    "rss_delta_mb": round(rss_after - rss_before, 1),
+                }
+            )
+            results.append(stats)
+            print(
+                f"{transport:<7}{name:<16}{concurrency:>5}{stats['throughput']:>11,.0f}"
+                f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                f"{stats['errors']:>7}{stats['rss_mb']:>9.1f}",
+                file=sys.stderr,
+            )
+    return results
+
+
+async def bench_asgi(routes, levels, requests):
+    # httpx's ASGI transport does not run the lifespan, so run it ourselves
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await bench_client(
+                client, "asgi", routes, levels, requests, psutil.Process()
+            )
+
+
+async def bench_socket(routes, levels, requests):
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT, str(port)])
+    try:
+        limits = httpx.Limits(
+            max_connections=max(levels), max_keepalive_connections=max(levels)
+        )
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30
+        ) as client:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                try:
+                    await client.get("/api/health")
+                    break
+                except httpx.TransportError:
+                    if proc.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("Benchmark server failed to start")
+                    await asyncio.sleep(0.05)
+            return await bench_client(
+                client, "socket", routes, levels, requests, psutil.Process(proc.pid)
+            )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of p95 latency or throughput beyond ``tolerance`` vs. baseline."""
+    key = lambda r: (r["transport"], r["route"], r["concurrency"])  # noqa: E731
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        p95_change = r["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        throughput_change = (
+            r["throughput"] / old["throughput"] - 1 if old["throughput"] else 0.0
+        )
+        if p95_change > tolerance or throughput_change < -tolerance:
+            regressions.append(
+                {
+                    "transport": r["transport"],
+                    "route": r["route"],
+                    "concurrency": r["concurrency"],
+                    "p95_ms": [old["p95_ms"], r["p95_ms"]],
+                    "throughput": [old["throughput"], r["throughput"]],
+                    "p95_change": round(p95_change, 3),
+                    "throughput_change": round(throughput_change, 3),
+                }
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the studio API")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per run")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated levels")
+    parser.add_argument(
+        "--transport",
+        default="asgi,socket",
+        help="Comma-separated subset of asgi,socket",
+    )
+    parser.add_argument(
+        "--routes", default=None, help="Comma-separated route names (default: all)"
+    )
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Compare against this JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative p95/throughput change before flagging a regression",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    routes = ROUTES
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        routes = tuple(r for r in ROUTES if r[0] in wanted)
+
+    print(
+        f"{'mode':<7}{'route':<16}{'conc':>5}{'req/s':>11}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>7}{'RSS MB':>9}",
+        file=sys.stderr,
+    )
+    results = []
+    try:
+        for transport in args.transport.split(","):
+            runner = bench_asgi if transport == "asgi" else bench_socket
+            results.extend(asyncio.run(runner(routes, levels, args.requests)))
+    finally:
+        shutil.rmtree(os.environ["UNSLOTH_STUDIO_WORKSPACE"], ignore_errors=True)
+
+    report = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "requests": args.requests,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs. {args.baseline}:", file=sys.stderr)
+            for r in regressions:
+                print(
+                    f"  {r['transport']:<7}{r['route']:<16}c={r['concurrency']:<4}"
+                    f"p95 {r['p95_ms'][0]:.2f} -> {r['p95_ms'][1]:.2f} ms, "
+                    f"req/s {r['throughput'][0]:,.0f} -> {r['throughput'][1]:,.0f}",
+                    file=sys.stderr,
+                )
+            sys.exit(1)
+        print(f"\nNo regressions vs. {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Benchmark: peak memory of the streaming LoRA merge against a naive one.
+
+Builds a small Llama-shaped base model on disk (random weights, sharded
+safetensors) and a training job whose checkpoint holds the simulated LoRA
+adapter, then merges them with ``run_export`` at a few ``max_memory_mb``
+ceilings and with a naive load-everything merge. Each merge runs in a fresh
+process; reported are its peak RSS above what it used before the merge
+(sampled every millisecond: ``ru_maxrss`` would include the parent's RSS,
+kept across exec), the merge throughput, and whether the merged weights match
+a float32 reference.
+
+Usage:
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --layers 16 --ceilings 32 128 --json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import psutil
+
+from roland_ui_demo.studio.backend.core.training import SIM_HIDDEN, SIM_LAYERS
+
+INTERMEDIATE = 2816
+VOCAB = 32000
+LORA_R = 16
+LORA_ALPHA = 32
+# Base tensor checked against a float32 reference merge, and one left untouched
+CHECKED = "model.layers.0.self_attn.q_proj.weight"
+UNTOUCHED = "model.layers.0.mlp.down_proj.weight"
+
+
+class _PeakRSS:
+    """Highest RSS of this process while the block runs, sampled in a thread."""
+
+    def __enter__(self):
+        self._process = psutil.Process()
+        self.start = self.peak = self._process.memory_info().rss
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(0.001):
+            self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+    @property
+    def growth_mb(self) -> float:
+        return (self.peak - self.start) / 1024 / 1024
+
+
+def build(root: Path, layers: int, dtype: str, shard_mb: int):
+    """A base model under ``root/base`` and a finished training job with a checkpoint."""
+    from safetensors.numpy import save_file
+
+    from roland_ui_demo.studio.backend.core.checkpoints import CheckpointWriter
+    from roland_ui_demo.studio.backend.core.training import _SimulatedAdapter
+
+    rng = np.random.default_rng(0)
+    base = root / "base"
+    base.mkdir()
+    shapes = {"model.embed_tokens.weight": (VOCAB, SIM_HIDDEN)}
+    for i in range(layers):
+        prefix = f"model.layers.{i}"
+        for module in ("q_proj", "k_proj", "v_proj", "o_proj"):
+            shapes[f"{prefix}.self_attn.{module}.weight"] = (SIM_HIDDEN, SIM_HIDDEN)
+        shapes[f"{prefix}.mlp.gate_proj.weight"] = (INTERMEDIATE, SIM_HIDDEN)
+        shapes[f"{prefix}.mlp.up_proj.weight"] = (INTERMEDIATE, SIM_HIDDEN)
+        shapes[f"{prefix}.mlp.down_proj.weight"] = (SIM_HIDDEN, INTERMEDIATE)
+        shapes[f"{prefix}.input_layernorm.weight"] = (SIM_HIDDEN,)
+    shapes["model.norm.weight"] = (SIM_HIDDEN,)
+    shapes["lm_head.weight"] = (VOCAB, SIM_HIDDEN)
+
+    shard, size, index, weight_map = {}, 0, 1, {}
+    total = 0
+
+    def flush():
+        name = f"model-{index:05d}.safetensors"
+        save_file(shard, str(base / name), metadata={"format": "pt"})
+        weight_map.update({n: name for n in shard})
+
+    for name, shape in shapes.items():
+        shard[name] = (rng.standard_normal(shape, dtype=np.float32) * 0.02).astype(dtype)
+        size += shard[name].nbytes
+        total += shard[name].nbytes
+        if size >= shard_mb * 1024 * 1024:
+            flush()
+            shard, size, index = {}, 0, index + 1
+    if shard:
+        flush()
+    (base / "model.safetensors.index.json").write_text(
+        json.dumps({"metadata": {"total_size": total}, "weight_map": weight_map})
+    )
+    (base / "config.json").write_text(
+        json.dumps({"architectures": ["LlamaForCausalLM"], "hidden_size": SIM_HIDDEN})
+    )
+
+    job_dir = root / "jobs" / "job_train"
+    job_dir.mkdir(parents=True)
+    (job_dir / "job.json").write_text(
+        json.dumps({"config": {"lora_r": LORA_R, "lora_alpha": LORA_ALPHA}})
+    )
+    writer = CheckpointWriter(job_dir, keep_best=0)
+    writer.save(1, _SimulatedAdapter(LORA_R).shards(1))
+    writer.close()
+    return total
+
+
+def _streaming(root: str, ceiling: int, shard_mb: int):
+    from roland_ui_demo.studio.backend.core.export import run_export
+
+    job_dir = Path(root) / "jobs" / f"job_export_{ceiling}"
+    job_dir.mkdir()
+    events = []
+    config = {
+        "base_model": str(Path(root) / "base"),
+        "adapter_job_id": "job_train",
+        "max_memory_mb": ceiling,
+        "max_shard_mb": shard_mb,
+    }
+    with _PeakRSS() as rss:
+        started = time.perf_counter()
+        result = run_export(job_dir.name, config, lambda t, d: events.append(d), job_dir)
+        elapsed = time.perf_counter() - started
+    return {
+        "peak_mb": rss.growth_mb,
+        "seconds": elapsed,
+        "bytes": result["bytes"],
+        "output": result["output_dir"],
+        "progress_events": len(events),
+    }
+
+
+def _naive(root: str, shard_mb: int):
+    from safetensors.numpy import load_file, save_file
+
+    root = Path(root)
+    with _PeakRSS() as rss:
+        started = time.perf_counter()
+        weights = _naive_merge(root, load_file, save_file)
+        elapsed = time.perf_counter() - started
+    return {
+        "peak_mb": rss.growth_mb,
+        "seconds": elapsed,
+        "bytes": sum(w.nbytes for w in weights.values()),
+        "output": str(root / "naive"),
+        "progress_events": 0,
+    }
+
+
+def _naive_merge(root: Path, load_file, save_file):
+    """Load every tensor, merge in place and save, as a plain PEFT merge would."""
+    weights = {}
+    for path in sorted((root / "base").glob("*.safetensors")):
+        weights.update(load_file(str(path)))
+    adapter = {}
+    for path in (root / "jobs" / "job_train" / "checkpoints" / "blobs").glob("*.safetensors"):
+        adapter.update(load_file(str(path)))
+    for name, a in adapter.items():
+        if ".lora_A." not in name:
+            continue
+        target = "model." + name.replace("base_model.model.", "").replace(".lora_A", "")
+        b = adapter[name.replace("lora_A", "lora_B")]
+        merged = weights[target].astype(np.float32) + (LORA_ALPHA / LORA_R) * (b @ a)
+        weights[target] = merged.astype(weights[target].dtype)
+    out = root / "naive"
+    out.mkdir()
+    save_file(weights, str(out / "model.safetensors"))
+    return weights
+
+
+def _in_fresh_process(func, *args):
+    with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+
+def verify(root: Path, output: str) -> bool:
+    """The merged model matches a float32 reference on one target and one copied tensor."""
+    from safetensors import safe_open
+
+    def read(directory: Path, name: str):
+        index = directory / "model.safetensors.index.json"
+        shard = (
+            json.loads(index.read_text())["weight_map"][name]
+            if index.exists()
+            else "model.safetensors"
+        )
+        with safe_open(str(directory / shard), framework="numpy") as f:
+            return f.get_tensor(name)
+
+    adapter = {}
+    for path in (root / "jobs" / "job_train" / "checkpoints" / "blobs").glob("*.safetensors"):
+        with safe_open(str(path), framework="numpy") as f:
+            adapter.update({name: f.get_tensor(name) for name in f.keys()})
+    prefix = "base_model.model.layers.0.self_attn.q_proj"
+    base = read(root / "base", CHECKED)
+    expected = base.astype(np.float32) + (LORA_ALPHA / LORA_R) * (
+        adapter[f"{prefix}.lora_B.weight"] @ adapter[f"{prefix}.lora_A.weight"]
+    )
+    merged = read(Path(output), CHECKED)
+    return bool(
+        np.allclose(merged.astype(np.float32), expected, rtol=1e-2, atol=1e-2)
+        and np.array_equal(read(Path(output), UNTOUCHED), read(root / "base", UNTOUCHED))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming LoRA merge")
+    parser.add_argument("--layers", type=int, default=SIM_LAYERS)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--ceilings", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--shard-mb", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    if args.layers < SIM_LAYERS:
+        sys.exit(f"--layers must be at least {SIM_LAYERS}, the simulated adapter's depth")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        model_bytes = build(root, args.layers, args.dtype, args.shard_mb)
+        runs = [(f"stream {c} MB", _streaming, (tmp, c, args.shard_mb)) for c in args.ceilings]
+        runs.append(("naive", _naive, (tmp, args.shard_mb)))
+        results = []
+        for label, func, func_args in runs:
+            run = _in_fresh_process(func, *func_args)
+            results.append(
+                {
+                    "merge": label,
+                    "model_mb": round(model_bytes / 1024 / 1024, 1),
+                    "peak_mb": round(run["peak_mb"], 1),
+                    "mb_per_sec": round(run["bytes"] / 1024 / 1024 / run["seconds"], 1),
+                    "seconds": round(run["seconds"], 2),
+                    "progress_events": run["progress_events"],
+                    "correct": verify(root, run["output"]),
+                }
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.layers}-layer model, {results[0]['model_mb']} MB of {args.dtype} weights")
+    print(f"{'merge':<16}{'peak MB':>9}{'MB/s':>8}{'seconds':>9}{'events':>8}{'correct':>9}")
+    for r in results:
+        print(
+            f"{r['merge']:<16}{r['peak_mb']:>9.1f}{r['mb_per_sec']:>8.1f}"
+            f"{r['seconds']:>9.2f}{r['progress_events']:>8}{str(r['correct']):>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
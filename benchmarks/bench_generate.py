@@ -0,0 +1,121 @@
+"""
+Benchmark: batched streaming generation against one-request-at-a-time.
+
+Runs ``GenerationService`` in-process on CPU with the simulated model, with
+``clients`` concurrent requests of ``--max-tokens`` tokens each. Every level
+runs twice: with batch size 1, so requests take turns as a plain
+per-request server would, and with dynamic batching. Reported: aggregate
+tokens per second, time to first token (p50/p95) and the mean batch size.
+A final pair of runs sends prompts sharing a long system prompt, already
+seen once, with the prefix cache off and on.
+
+Usage:
+    python benchmarks/bench_generate.py
+    python benchmarks/bench_generate.py --clients 1 4 16 --max-tokens 64 --json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from roland_ui_demo.studio.backend.core.inference import (
+    MAX_BATCH_SIZE,
+    PREFIX_CACHE_BYTES,
+    GenerationService,
+)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions about fine-tuning "
+    "language models with LoRA adapters. Keep answers short and precise. "
+) * 6
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _one(service, prompt, max_tokens):
+    started = time.perf_counter()
+    first = None
+    handle = service.submit({"prompt": prompt, "max_tokens": max_tokens})
+    async for frame in service.stream(handle["request_id"]):
+        if first is None and frame.startswith(b"event: token"):
+            first = time.perf_counter() - started
+        if frame.startswith(b"event: done"):
+            summary = json.loads(frame.split(b"data: ", 1)[1])
+    return first, summary
+
+
+async def run(clients, max_tokens, batch_size, prefix_bytes=PREFIX_CACHE_BYTES, system=""):
+    service = GenerationService(max_batch_size=batch_size, prefix_cache_bytes=prefix_bytes)
+    service.start()
+    # Load the model before timing, and with a system prompt, see it once as a
+    # running server would have
+    await _one(service, system or "warm up", 1)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(_one(service, f"{system}Question {i}: what is LoRA?", max_tokens) for i in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+    service.stop()
+    ttfts = [1000 * first for first, _ in results]
+    tokens = sum(s["usage"]["completion_tokens"] for _, s in results)
+    return {
+        "clients": clients,
+        "batch_size": batch_size,
+        "prefix_cache": prefix_bytes > 0,
+        "tokens_per_sec": round(tokens / elapsed, 1),
+        "ttft_p50_ms": round(statistics.median(ttfts), 1),
+        "ttft_p95_ms": round(_percentile(ttfts, 0.95), 1),
+        "mean_batch_size": round(
+            statistics.mean(s["mean_batch_size"] for _, s in results), 2
+        ),
+        "cached_prompt_tokens": sum(s["usage"]["cached_prompt_tokens"] for _, s in results),
+        "seconds": round(elapsed, 2),
+    }
+
+
+async def main_async(args):
+    results = []
+    for clients in args.clients:
+        for batch_size in (1, args.batch_size):
+            results.append(await run(clients, args.max_tokens, batch_size))
+    clients = max(args.clients)
+    for prefix_bytes in (0, PREFIX_CACHE_BYTES):
+        results.append(
+            await run(clients, args.max_tokens, args.batch_size, prefix_bytes, SYSTEM_PROMPT)
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched generation")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.max_tokens} tokens per request, simulated model on CPU")
+    print(
+        f"{'clients':>7}{'batch':>6}{'prefix':>7}{'tok/s':>9}{'ttft p50':>10}"
+        f"{'ttft p95':>10}{'mean batch':>12}{'cached':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['clients']:>7}{r['batch_size']:>6}{'on' if r['prefix_cache'] else 'off':>7}"
+            f"{r['tokens_per_sec']:>9.1f}{r['ttft_p50_ms']:>10.1f}{r['ttft_p95_ms']:>10.1f}"
+            f"{r['mean_batch_size']:>12.2f}{r['cached_prompt_tokens']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Overhead of the request instrumentation middleware.
+
+Calls a small FastAPI app directly through the ASGI interface (no HTTP client
+or server in the way, so the middleware's share is not hidden by noise), with
+and without ``InstrumentationMiddleware``, and reports the added cost per
+request. Also times rendering ``/api/metrics`` with a realistic number of
+label sets.
+
+Usage:
+    python benchmarks/bench_instrumentation.py
+    python benchmarks/bench_instrumentation.py --requests 50000 --json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from roland_ui_demo.studio.backend.core.instrumentation import (
+    InstrumentationMiddleware,
+    MetricsRegistry,
+)
+
+# Paths requested round-robin: a plain route, a templated one and a catch-all
+PATHS = ("/api/health", "/api/train/job_1/metrics", "/assets/index.js")
+# Distinct label sets when timing render(), roughly a busy studio's worth
+RENDER_SERIES = 300
+
+
+def build_app(instrumented: bool, registry: MetricsRegistry) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/train/{job_id}/metrics")
+    async def metrics(job_id: str):
+        return {"job_id": job_id, "steps": []}
+
+    @app.get("/assets/{asset_path:path}")
+    async def asset(asset_path: str):
+        return PlainTextResponse("x" * 1024)
+
+    if instrumented:
+        app.add_middleware(InstrumentationMiddleware, registry=registry)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds taken to serve ``requests`` requests through the ASGI interface."""
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1),
+            "server": ("127.0.0.1", 80),
+        }
+        for path in PATHS
+    ]
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(dict(scopes[i % len(scopes)]), receive, send)
+    return time.perf_counter() - started
+
+
+def time_render(series: int):
+    registry = MetricsRegistry("bench")
+    for i in range(series):
+        registry.record("GET", f"/assets/file-{i}.js", 200, 1024, 0.002, False)
+    started = time.perf_counter()
+    text = registry.render()
+    return time.perf_counter() - started, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark instrumentation overhead")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5, help="Best-of rounds")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry("bench")
+    plain = build_app(False, registry)
+    instrumented = build_app(True, registry)
+
+    async def measure(app):
+        await drive(app, 1000)  # warm up routing and caches
+        return min([await drive(app, args.requests) for _ in range(args.rounds)])
+
+    base = asyncio.run(measure(plain))
+    with_middleware = asyncio.run(measure(instrumented))
+    render_seconds, render_bytes = time_render(RENDER_SERIES)
+
+    base_us = base / args.requests * 1e6
+    instrumented_us = with_middleware / args.requests * 1e6
+    results = {
+        "requests": args.requests,
+        "baseline_us_per_request": round(base_us, 2),
+        "instrumented_us_per_request": round(instrumented_us, 2),
+        "overhead_us_per_request": round(instrumented_us - base_us, 2),
+        "overhead_ratio": round(instrumented_us / base_us - 1, 4),
+        "render_series": RENDER_SERIES,
+        "render_ms": round(render_seconds * 1000, 3),
+        "render_bytes": render_bytes,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.requests} requests through the ASGI interface, best of {args.rounds}")
+    print(f"  without middleware  {base_us:8.2f} us/request")
+    print(f"  with middleware     {instrumented_us:8.2f} us/request")
+    print(
+        f"  overhead            {instrumented_us - base_us:8.2f} us/request "
+        f"({results['overhead_ratio']:.1%})"
+    )
+    print(
+        f"  render {RENDER_SERIES} series  {results['render_ms']:8.3f} ms "
+        f"({render_bytes:,} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: job history queries over tens of thousands of jobs.
+
+Fills a ``JobHistory`` database with ``--jobs`` synthetic job records across
+a handful of models and datasets, then times the history page's queries:
+the first page, a page deep into the history reached by following cursors,
+filtered pages, and per-model summaries. The same queries are then repeated
+while another thread upserts job updates as fast as it can, as the scheduler
+does while jobs run, to show reads do not wait for writes. For comparison it
+also times what listing jobs costs without the database: reading every
+``job.json``.
+
+Usage:
+    python benchmarks/bench_job_history.py
+    python benchmarks/bench_job_history.py --jobs 100000 --json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from roland_ui_demo.studio.backend.core.job_history import JobHistory
+
+MODELS = [f"unsloth/model-{i}b" for i in (1, 3, 7, 8, 13, 70)]
+DATASETS = ["alpaca", "dolly", "oasst", "gsm8k", "sharegpt"]
+STATES = ["completed"] * 8 + ["failed", "cancelled"]
+
+
+def _records(n: int, rng: random.Random):
+    start = time.time() - n * 60
+    for i in range(n):
+        state = rng.choice(STATES)
+        submitted = start + i * 60
+        yield {
+            "job_id": f"job_{i:08d}",
+            "type": "train",
+            "state": state,
+            "config": {"model_name": rng.choice(MODELS), "dataset": rng.choice(DATASETS)},
+            "submitted_at": submitted,
+            "started_at": submitted + 1,
+            "finished_at": submitted + 50,
+            "attempts": 1,
+            "progress": {"step": 50, "total_steps": 50, "loss": 0.7, "tokens_per_sec": rng.uniform(500, 5000)},
+            "result": {"final_loss": rng.uniform(0.5, 1.5), "runtime_sec": 49.0} if state == "completed" else None,
+            "message": "",
+            "error": None,
+        }
+
+
+def _time(func, repeat: int):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(1000 * (time.perf_counter() - started))
+    return round(statistics.median(times), 3), round(sorted(times)[int(0.95 * (len(times) - 1))], 3)
+
+
+def _queries(history: JobHistory, deep_cursor: str):
+    return {
+        "first page": lambda: history.page(limit=50),
+        "page at depth": lambda: history.page(cursor=deep_cursor, limit=50),
+        "state=failed": lambda: history.page(limit=50, state="failed"),
+        "model+dataset": lambda: history.page(limit=50, model=MODELS[2], dataset=DATASETS[1]),
+        "summary by model": lambda: history.summary("model"),
+        "summary, 1 model": lambda: history.summary("dataset", model=MODELS[0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job history queries")
+    parser.add_argument("--jobs", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = JobHistory(Path(tmp) / "jobs.db")
+        records = list(_records(args.jobs, rng))
+        started = time.perf_counter()
+        history.rebuild(records)
+        rebuild_sec = time.perf_counter() - started
+
+        # Follow cursors halfway down, as a user scrolling the history would
+        page = history.page(limit=500)
+        for _ in range(args.jobs // 1000):
+            page = history.page(cursor=page["next_cursor"], limit=500)
+        deep_cursor = page["next_cursor"]
+
+        results = {}
+        for name, query in _queries(history, deep_cursor).items():
+            results[name] = {"idle": _time(query, args.repeat)}
+
+        # The same reads against a writer updating running jobs
+        stop = threading.Event()
+        writes = [0]
+
+        def writer():
+            writer_history = JobHistory(history.path)
+            while not stop.is_set():
+                record = rng.choice(records)
+                record["progress"]["step"] = rng.randint(1, 50)
+                writer_history.upsert(record)
+                writes[0] += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        write_started = time.perf_counter()
+        for name, query in _queries(history, deep_cursor).items():
+            results[name]["writing"] = _time(query, args.repeat)
+        stop.set()
+        thread.join()
+        writes_per_sec = writes[0] / (time.perf_counter() - write_started)
+
+        # Without the database: every job.json read and sorted per request
+        jobs_dir = Path(tmp) / "jobs"
+        for record in records[:5000]:
+            (jobs_dir / record["job_id"]).mkdir(parents=True)
+            (jobs_dir / record["job_id"] / "job.json").write_text(json.dumps(record))
+        started = time.perf_counter()
+        listed = sorted(
+            (json.loads(p.read_text()) for p in jobs_dir.glob("*/job.json")),
+            key=lambda r: r["submitted_at"],
+            reverse=True,
+        )[:50]
+        scan_ms = 1000 * (time.perf_counter() - started) * args.jobs / 5000
+        assert len(listed) == 50
+
+    summary = {
+        "jobs": args.jobs,
+        "rebuild_sec": round(rebuild_sec, 2),
+        "writes_per_sec": round(writes_per_sec),
+        "json_scan_ms_estimate": round(scan_ms, 1),
+        "queries_ms": results,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.jobs} jobs; rebuilt from records in {summary['rebuild_sec']} s")
+    print(f"{'query':<18}{'p50 ms':>9}{'p95 ms':>9}{'p50 writing':>13}{'p95 writing':>13}")
+    for name, r in results.items():
+        print(f"{name:<18}{r['idle'][0]:>9.3f}{r['idle'][1]:>9.3f}{r['writing'][0]:>13.3f}{r['writing'][1]:>13.3f}")
+    print(f"concurrent writer: {summary['writes_per_sec']} upserts/s")
+    print(f"listing by reading every job.json instead: ~{summary['json_scan_ms_estimate']} ms")
+
+
+if __name__ == "__main__":
+    main()
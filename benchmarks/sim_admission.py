@@ -0,0 +1,111 @@
+"""
+Offline harness: admission decisions against simulated memory budgets.
+
+Runs a matrix of training configs (model size, quantization, batch size,
+sequence length) through ``decide`` for a set of simulated machines, from a
+free Colab T4 to an 80 GB A100 and a CPU-only host, each both idle and with
+part of its memory already taken. No GPU, model download or running server is
+needed, so the thresholds can be checked and tuned anywhere.
+
+Usage:
+    python benchmarks/sim_admission.py
+    python benchmarks/sim_admission.py --seq 4096 --json
+"""
+
+import argparse
+import json
+from collections import Counter
+
+from roland_ui_demo.studio.backend.core.admission import GB, MemoryBudget, decide
+
+# (name, device, total GB, host RAM GB)
+MACHINES = [
+    ("T4 16GB", "gpu", 15.0, 12.7),
+    ("RTX 4090", "gpu", 24.0, 64.0),
+    ("A100 40GB", "gpu", 40.0, 85.0),
+    ("A100 80GB", "gpu", 80.0, 170.0),
+    ("CPU 32GB", "cpu", 32.0, 32.0),
+]
+# Fraction of the device already in use by another job
+LOADS = (0.0, 0.5)
+
+MODELS = [
+    "unsloth/Llama-3.2-1B-Instruct",
+    "unsloth/Llama-3.2-3B-Instruct-bnb-4bit",
+    "unsloth/llama-3-8b-bnb-4bit",
+    "unsloth/llama-3-8b",
+    "unsloth/Qwen2.5-14B-Instruct-bnb-4bit",
+    "unsloth/Llama-3.3-70B-Instruct-bnb-4bit",
+]
+BATCH_SIZES = (2, 8)
+
+
+def budget(device: str, total_gb: float, host_gb: float, load: float) -> MemoryBudget:
+    free = total_gb * (1 - load) * GB
+    host_free = host_gb * (1 - load) * GB if device == "cpu" else host_gb * 0.8 * GB
+    return MemoryBudget(device, free, total_gb * GB, host_free)
+
+
+def simulate(seq: int, lora_r: int):
+    results = []
+    for machine, device, total_gb, host_gb in MACHINES:
+        for load in LOADS:
+            for model in MODELS:
+                for batch_size in BATCH_SIZES:
+                    config = {
+                        "model_name": model,
+                        "batch_size": batch_size,
+                        "max_seq_length": seq,
+                        "lora_r": lora_r,
+                    }
+                    result = decide(config, budget(device, total_gb, host_gb, load))
+                    results.append(
+                        {
+                            "machine": machine,
+                            "load": load,
+                            "model": model.split("/")[-1],
+                            "batch_size": batch_size,
+                            "decision": result["decision"],
+                            "peak_gb": (result["estimate_gb"] or {}).get("peak"),
+                            "run_batch_size": result.get("batch_size", batch_size),
+                            "accumulation": result.get(
+                                "gradient_accumulation_steps", 1
+                            ),
+                            "reason": result["reason"],
+                        }
+                    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate training admission decisions")
+    parser.add_argument("--seq", type=int, default=2048, help="max_seq_length")
+    parser.add_argument("--lora-r", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = simulate(args.seq, args.lora_r)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"max_seq_length {args.seq}, lora_r {args.lora_r}")
+    print(
+        f"{'machine':<11}{'load':>5}  {'model':<34}{'bs':>3}{'peak GB':>9}"
+        f"  {'decision':<8}{'runs as':>10}"
+    )
+    for r in results:
+        runs_as = ""
+        if r["decision"] == "adjust":
+            runs_as = f"{r['run_batch_size']}x{r['accumulation']}"
+        peak = f"{r['peak_gb']:.1f}" if r["peak_gb"] is not None else "?"
+        print(
+            f"{r['machine']:<11}{r['load']:>5.0%}  {r['model']:<34}{r['batch_size']:>3}"
+            f"{peak:>9}  {r['decision']:<8}{runs_as:>10}"
+        )
+    counts = Counter(r["decision"] for r in results)
+    print(", ".join(f"{decision}: {n}" for decision, n in sorted(counts.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Offline harness: ASHA sweep vs. the full grid on the simulated objective.
+
+Replays a sweep without the server or worker processes. Trials follow the
+simulated trainer's loss curve (``simulated_loss``), ``workers`` of them run at
+a time and advance one step per tick, and ``SuccessiveHalving`` stops them at
+rungs exactly as ``SweepManager`` does. The same trials are then run to the
+end as a plain grid. Reported per seed: steps used as a share of the grid's,
+and the noise-free final loss of ASHA's pick against the grid's best.
+
+Usage:
+    python benchmarks/sim_sweep.py
+    python benchmarks/sim_sweep.py --epochs 3 --workers 4 --seeds 10 --json
+"""
+
+import argparse
+import json
+import random
+from collections import deque
+
+from roland_ui_demo.studio.backend.core.sweeps import (
+    GRACE_FRACTION,
+    REDUCTION_FACTOR,
+    SMOOTHING_STEPS,
+    SuccessiveHalving,
+    expand_space,
+)
+from roland_ui_demo.studio.backend.core.training import STEPS_PER_EPOCH, simulated_loss
+
+SPACE = {
+    "learning_rate": [2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 3e-3],
+    "lora_r": [8, 16, 32],
+    "lora_alpha": [8, 16, 32, 64],
+}
+BASE_CONFIG = {"batch_size": 4}
+
+
+class _NoNoise(random.Random):
+    def gauss(self, mu=0.0, sigma=1.0):
+        return mu
+
+
+def true_loss(config, total_steps):
+    return simulated_loss(config, total_steps, total_steps, _NoNoise())
+
+
+def run_asha(trials, total_steps, workers, grace_period, reduction_factor, seed):
+    halving = SuccessiveHalving(total_steps, grace_period, reduction_factor)
+    rng = random.Random(seed)
+    pending = deque(range(len(trials)))
+    running = {}  # trial -> (step, recent losses)
+    final = {}  # trial -> (steps run, smoothed loss, completed)
+    steps_run = 0
+    while pending or running:
+        while pending and len(running) < workers:
+            running[pending.popleft()] = (0, deque(maxlen=SMOOTHING_STEPS))
+        for trial in list(running):
+            step, recent = running[trial]
+            step += 1
+            steps_run += 1
+            recent.append(simulated_loss(trials[trial], step, total_steps, rng))
+            loss = sum(recent) / len(recent)
+            _, stop = halving.report(trial, step, loss)
+            if stop or step == total_steps:
+                del running[trial]
+                final[trial] = (step, loss, not stop)
+            else:
+                running[trial] = (step, recent)
+    completed = [t for t, (_, _, done) in final.items() if done]
+    best = min(completed, key=lambda t: final[t][1])
+    return best, steps_run, len(completed)
+
+
+def run_grid(trials, total_steps, seed):
+    rng = random.Random(seed)
+    losses = []
+    for config in trials:
+        recent = deque(maxlen=SMOOTHING_STEPS)
+        for step in range(1, total_steps + 1):
+            recent.append(simulated_loss(config, step, total_steps, rng))
+        losses.append(sum(recent) / len(recent))
+    best = min(range(len(trials)), key=losses.__getitem__)
+    return best, len(trials) * total_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate an ASHA sweep against the grid")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--reduction-factor", type=int, default=REDUCTION_FACTOR)
+    parser.add_argument("--grace-period", type=int, default=None)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    total_steps = args.epochs * STEPS_PER_EPOCH
+    grace_period = args.grace_period or max(1, round(total_steps * GRACE_FRACTION))
+    oracle = min(true_loss({**BASE_CONFIG, **p}, total_steps) for p in expand_space(SPACE))
+
+    results = []
+    for seed in range(args.seeds):
+        # Trials start in a different order every seed, as a sampled sweep would
+        params = expand_space(SPACE)
+        random.Random(seed).shuffle(params)
+        trials = [{**BASE_CONFIG, **p} for p in params]
+        asha_best, asha_steps, completed = run_asha(
+            trials, total_steps, args.workers, grace_period, args.reduction_factor, seed
+        )
+        grid_best, grid_steps = run_grid(trials, total_steps, seed)
+        results.append(
+            {
+                "seed": seed,
+                "trials": len(trials),
+                "completed": completed,
+                "asha_steps": asha_steps,
+                "grid_steps": grid_steps,
+                "compute_fraction": round(asha_steps / grid_steps, 3),
+                "asha_best": params[asha_best],
+                "asha_loss": round(true_loss(trials[asha_best], total_steps), 4),
+                "grid_best": params[grid_best],
+                "grid_loss": round(true_loss(trials[grid_best], total_steps), 4),
+                "oracle_loss": round(oracle, 4),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{results[0]['trials']} trials x {total_steps} steps, {args.workers} workers, "
+        f"grace {grace_period}, reduction factor {args.reduction_factor}; "
+        f"best possible loss {oracle:.4f}"
+    )
+    print(
+        f"{'seed':>4}{'compute':>9}{'completed':>11}{'asha loss':>11}"
+        f"{'grid loss':>11}  asha pick"
+    )
+    for r in results:
+        print(
+            f"{r['seed']:>4}{r['compute_fraction']:>9.1%}{r['completed']:>11}"
+            f"{r['asha_loss']:>11.4f}{r['grid_loss']:>11.4f}  {r['asha_best']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import React, { useEffect, useState } from 'react';
+import { api } from '../services/api';
+import type { DatasetPage, DatasetSearchResult } from '../types';
+
+const PAGE_ROWS = 10;
+
+interface Props {
+  dataset: string;
+}
+
+// Browse a dataset a page at a time; the server only reads the rows shown
+const DatasetPreview: React.FC<Props> = ({ dataset }) => {
+  const [page, setPage] = useState<DatasetPage | DatasetSearchResult | null>(null);
+  const [offset, setOffset] = useState(0);
+  const [query, setQuery] = useState('');
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const load = async (fetchPage: () => Promise<DatasetPage | DatasetSearchResult>) => {
+    setLoading(true);
+    setError(null);
+    try {
+      setPage(await fetchPage());
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load dataset');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    if (dataset === 'custom') return;
+    setQuery('');
+    load(() => api.getDatasetRows(dataset, offset, PAGE_ROWS));
+  }, [dataset, offset]);
+
+  useEffect(() => setOffset(0), [dataset]);
+
+  if (dataset === 'custom') return null;
+
+  const search = (start = 0) =>
+    load(() => api.searchDataset(dataset, query, { start, limit: PAGE_ROWS }));
+  const searchResult = page && 'next_start' in page ? page : null;
+
+  return (
+    <div className="mt-6 border border-gray-200 rounded-lg p-4">
+      <div className="flex items-center justify-between mb-3 gap-2">
+        <h3 className="text-sm font-medium text-gray-700">
+          Preview{page ? ` · ${page.num_rows.toLocaleString()} rows` : ''}
+        </h3>
+        <div className="flex items-center gap-2">
+          <input
+            value={query}
+            onChange={(e) => setQuery(e.target.value)}
+            onKeyDown={(e) => e.key === 'Enter' && query && search()}
+            placeholder="Search…"
+            className="px-2 py-1 text-sm border border-gray-300 rounded"
+          />
+          <button
+            onClick={() => load(() => api.sampleDataset(dataset, PAGE_ROWS))}
+            className="px-2 py-1 text-sm border border-gray-300 rounded hover:bg-gray-50"
+          >
+            Random
+          </button>
+        </div>
+      </div>
+
+      {error && <p className="text-sm text-red-600">{error}</p>}
+
+      <div className={`space-y-2 max-h-96 overflow-auto ${loading ? 'opacity-50' : ''}`}>
+        {page?.rows.map((row) => (
+          <div key={row.index} className="text-xs bg-gray-50 p-2 rounded">
+            <span className="text-gray-400">#{row.index}</span>
+            {Object.entries(row.values).map(([column, value]) => (
+              <p key={column} className="whitespace-pre-wrap break-words">
+                <span className="font-medium text-gray-600">{column}: </span>
+                {typeof value === 'string' ? value : JSON.stringify(value)}
+              </p>
+            ))}
+          </div>
+        ))}
+      </div>
+
+      <div className="flex justify-between mt-3 text-sm">
+        {searchResult ? (
+          <>
+            <button
+              onClick={() => load(() => api.getDatasetRows(dataset, offset, PAGE_ROWS))}
+              className="text-unsloth-600"
+            >
+              Clear search
+            </button>
+            {searchResult.next_start !== null && (
+              <button onClick={() => search(searchResult.next_start!)} className="text-unsloth-600">
+                More matches
+              </button>
+            )}
+          </>
+        ) : (
+          <>
+            <button
+              onClick={() => setOffset(Math.max(0, offset - PAGE_ROWS))}
+              disabled={offset === 0}
+              className="text-unsloth-600 disabled:text-gray-300"
+            >
+              ← Previous
+            </button>
+            <button
+              onClick={() => setOffset(offset + PAGE_ROWS)}
+              disabled={!page || offset + PAGE_ROWS >= page.num_rows}
+              className="text-unsloth-600 disabled:text-gray-300"
+            >
+              Next →
+            </button>
+          </>
+        )}
+      </div>
+    </div>
+  );
+};
+
+export default DatasetPreview;
@@ -0,0 +1,127 @@
+import React, { useEffect, useState } from 'react';
+import { api } from '../services/api';
+import type { JobHistoryRow, JobState, JobSummary } from '../types';
+
+const PAGE_ROWS = 25;
+const STATES: JobState[] = ['queued', 'running', 'completed', 'failed', 'cancelled'];
+
+const STATE_COLORS: Record<JobState, string> = {
+  queued: 'text-gray-500',
+  running: 'text-blue-600',
+  completed: 'text-green-600',
+  failed: 'text-red-600',
+  cancelled: 'text-gray-400',
+};
+
+// Past jobs, a page at a time via the server's cursor, with per-model averages
+const JobHistory: React.FC = () => {
+  const [jobs, setJobs] = useState<JobHistoryRow[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [state, setState] = useState<JobState | ''>('');
+  const [summary, setSummary] = useState<JobSummary | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const load = async (after?: string) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const page = await api.getJobs(state ? { state } : {}, after, PAGE_ROWS);
+      setJobs((prev) => (after ? [...prev, ...page.jobs] : page.jobs));
+      setCursor(page.next_cursor);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load job history');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    load();
+  }, [state]);
+
+  useEffect(() => {
+    api.getJobSummary('model').then(setSummary).catch(() => setSummary(null));
+  }, []);
+
+  return (
+    <div className="bg-white rounded-xl shadow-sm p-6">
+      <div className="flex items-center justify-between mb-4">
+        <h2 className="text-lg font-semibold text-gray-900">
+          History{summary ? ` · ${summary.total.toLocaleString()} jobs` : ''}
+        </h2>
+        <select
+          value={state}
+          onChange={(e) => setState(e.target.value as JobState | '')}
+          className="px-2 py-1 text-sm border border-gray-300 rounded"
+        >
+          <option value="">All states</option>
+          {STATES.map((s) => (
+            <option key={s} value={s}>
+              {s}
+            </option>
+          ))}
+        </select>
+      </div>
+
+      {summary && summary.groups.length > 0 && (
+        <div className="flex flex-wrap gap-2 mb-4">
+          {summary.groups.map((group) => (
+            <div key={group.key ?? ''} className="text-xs bg-gray-50 px-3 py-2 rounded">
+              <p className="font-medium text-gray-700">{group.key ?? 'unknown model'}</p>
+              <p className="text-gray-500">
+                {group.jobs} jobs · {group.completed} done
+                {group.avg_tokens_per_sec !== null &&
+                  ` · ${Math.round(group.avg_tokens_per_sec).toLocaleString()} tok/s`}
+              </p>
+            </div>
+          ))}
+        </div>
+      )}
+
+      {error && <p className="text-sm text-red-600">{error}</p>}
+
+      <div className={`overflow-auto max-h-96 ${loading ? 'opacity-50' : ''}`}>
+        <table className="w-full text-sm">
+          <thead>
+            <tr className="text-left text-xs text-gray-500 border-b">
+              <th className="py-2">Submitted</th>
+              <th>Model</th>
+              <th>Dataset</th>
+              <th>State</th>
+              <th className="text-right">Loss</th>
+              <th className="text-right">tok/s</th>
+            </tr>
+          </thead>
+          <tbody>
+            {jobs.map((job) => (
+              <tr key={job.job_id} className="border-b border-gray-100" title={job.message ?? ''}>
+                <td className="py-2 text-gray-500">
+                  {new Date(job.submitted_at * 1000).toLocaleString()}
+                </td>
+                <td>{job.model ?? '—'}</td>
+                <td>{job.type === 'export' ? 'export' : job.dataset ?? '—'}</td>
+                <td className={STATE_COLORS[job.state]}>{job.state}</td>
+                <td className="text-right">{(job.final_loss ?? job.loss)?.toFixed(4) ?? '—'}</td>
+                <td className="text-right">
+                  {job.tokens_per_sec !== null ? Math.round(job.tokens_per_sec).toLocaleString() : '—'}
+                </td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+        {!loading && jobs.length === 0 && (
+          <p className="text-center py-6 text-sm text-gray-400">No jobs yet</p>
+        )}
+      </div>
+
+      {cursor && (
+        <button onClick={() => load(cursor)} disabled={loading} className="mt-3 text-sm text-unsloth-600">
+          Load more
+        </button>
+      )}
+    </div>
+  );
+};
+
+export default JobHistory;
@@ -92,6 +92,8 @@ const SystemInfo: React.FC = () => {
                 {systemInfo.gpu.devices[0]?.memory_total_gb} GB VRAM
               </p>
             </div>
+          ) : systemInfo?.gpu?.available === null ? (
+            <p className="text-lg font-bold text-gray-400">Detecting…</p>
           ) : (
             <p className="text-lg font-bold text-gray-400">Not Available</p>
           )}
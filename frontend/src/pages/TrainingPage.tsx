@@ -1,6 +1,8 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
+import DatasetPreview from '../components/DatasetPreview';
+import JobHistory from '../components/JobHistory';
 import { api } from '../services/api';
-import type { TrainingConfig, TrainingStatus } from '../types';
+import type { TrainingConfig, TrainingEvent, TrainingStatus } from '../types';
 
 const TrainingPage: React.FC = () => {
   const [config, setConfig] = useState<TrainingConfig>({
@@ -16,6 +18,19 @@ const TrainingPage: React.FC = () => {
 
   const [status, setStatus] = useState<TrainingStatus | null>(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState<TrainingEvent | null>(null);
+
+  // Follow the job over SSE instead of polling /api/train/status
+  useEffect(() => {
+    if (!status?.job_id) return;
+    return api.streamTrainingEvents(status.job_id, (type, event) => {
+      if (type === 'step') {
+        setProgress(event);
+      } else if (type === 'state' && event.state) {
+        setStatus((prev) => prev && { ...prev, status: event.state!, message: event.error ?? `Job ${event.state}` });
+      }
+    });
+  }, [status?.job_id]);
 
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement | HTMLSelectElement>) => {
     const { name, value } = e.target;
@@ -83,6 +98,7 @@ const TrainingPage: React.FC = () => {
                 <option value="dolly">Dolly (15k samples)</option>
                 <option value="custom">Custom Dataset</option>
               </select>
+              <DatasetPreview dataset={config.dataset} />
             </div>
 
             {/* Max Seq Length */}
@@ -218,11 +234,18 @@ const TrainingPage: React.FC = () => {
                 <span className={`font-medium ${
                   status.status === 'error' ? 'text-red-700' : 'text-green-700'
                 }`}>
-                  {status.status === 'error' ? 'Error' : 'Started'}
+                  {status.status === 'error' ? 'Error' : status.status}
                 </span>
               </div>
               <p className="text-sm text-gray-600">{status.message}</p>
 
+              {progress && (
+                <p className="text-sm text-gray-600 mt-2">
+                  Step {progress.step}/{progress.total_steps} · loss {progress.loss} ·{' '}
+                  {progress.tokens_per_sec} tok/s
+                </p>
+              )}
+
               {status.job_id && (
                 <p className="text-xs text-gray-400 mt-2">
                   Job ID: {status.job_id}
@@ -247,6 +270,8 @@ const TrainingPage: React.FC = () => {
           </div>
         </div>
       </div>
+
+      <JobHistory />
     </div>
   );
 };
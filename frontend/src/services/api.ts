@@ -1,15 +1,73 @@
 import type {
+  BatchRequest,
+  BatchResponse,
+  CheckpointList,
+  DatasetPage,
+  DatasetSearchResult,
+  DatasetStats,
   HealthResponse,
+  JobHistoryPage,
+  JobHistoryQuery,
+  JobSummary,
+  LogChunk,
+  LogQuery,
   SystemInfo,
+  SystemHistory,
   EchoResponse,
+  ExportRequest,
+  GenerateDone,
+  GenerateRequest,
+  GenerateStart,
+  GenerateToken,
   ModelsResponse,
+  ModelQuery,
+  Sweep,
+  SweepList,
+  SweepRequest,
   TrainingConfig,
   TrainingStatus,
+  TrainingEvent,
+  TrainingMetrics,
 } from "../types";
 
 const API_BASE = "";
 
+// GETs issued within this many ms of each other share one /api/batch request
+const BATCH_WINDOW_MS = 0;
+
+interface PendingCall {
+  path: string;
+  resolve: (value: unknown) => void;
+  reject: (reason: unknown) => void;
+}
+
+function queryString(params: Record<string, string | number | boolean | string[] | undefined>) {
+  const query = new URLSearchParams();
+  for (const [key, value] of Object.entries(params)) {
+    if (value === undefined) continue;
+    query.set(key, Array.isArray(value) ? value.join(",") : String(value));
+  }
+  return query.toString();
+}
+
+// An error response, carrying the server's explanation (e.g. why a job was not
+// admitted) when it gave one
+class HttpError extends Error {
+  status: number;
+
+  constructor(status: number, body: unknown) {
+    const detail = (body as { detail?: string | { reason?: string } } | null)?.detail;
+    const reason = typeof detail === "string" ? detail : detail?.reason;
+    super(reason ?? `HTTP error! status: ${status}`);
+    this.status = status;
+  }
+}
+
 class ApiService {
+  private pending: PendingCall[] = [];
+  private flushTimer: ReturnType<typeof setTimeout> | null = null;
+  private batchSupported = true;
+
   private async request<T>(
     endpoint: string,
     options: RequestInit = {},
@@ -23,24 +81,98 @@ class ApiService {
     });
 
     if (!response.ok) {
-      throw new Error(`HTTP error! status: ${response.status}`);
+      const body = await response.json().catch(() => null);
+      throw new HttpError(response.status, body);
     }
 
     return response.json();
   }
 
+  // Reads made in the same tick (a page's effects on first render, say) are
+  // coalesced into one /api/batch call, so a dashboard load costs a single
+  // round trip on high-latency links such as the Colab proxy or SSH tunnels.
+  private get<T>(endpoint: string): Promise<T> {
+    if (!this.batchSupported) {
+      return this.request<T>(endpoint);
+    }
+    return new Promise<T>((resolve, reject) => {
+      this.pending.push({
+        path: endpoint,
+        resolve: resolve as (value: unknown) => void,
+        reject,
+      });
+      if (this.flushTimer === null) {
+        this.flushTimer = setTimeout(() => this.flush(), BATCH_WINDOW_MS);
+      }
+    });
+  }
+
+  private async flush(): Promise<void> {
+    const calls = this.pending;
+    this.pending = [];
+    this.flushTimer = null;
+
+    if (calls.length === 1) {
+      this.request(calls[0].path).then(calls[0].resolve, calls[0].reject);
+      return;
+    }
+
+    let results: BatchResponse["responses"];
+    try {
+      const batch = await this.batch(calls.map((call) => ({ path: call.path })));
+      results = batch.responses;
+    } catch (err) {
+      // A server without /api/batch stops being asked; any other failure
+      // (network, 5xx, a rejected sub-request) only sends this round one by one
+      if (err instanceof HttpError && (err.status === 404 || err.status === 405)) {
+        this.batchSupported = false;
+      }
+      for (const call of calls) {
+        this.request(call.path).then(call.resolve, call.reject);
+      }
+      return;
+    }
+
+    results.forEach((result, i) => {
+      if (result.status >= 400) {
+        calls[i].reject(new HttpError(result.status, result.body));
+      } else {
+        calls[i].resolve(result.body);
+      }
+    });
+  }
+
+  // Several API calls in one request; each result carries its own status
+  batch(requests: BatchRequest[]): Promise<BatchResponse> {
+    return this.request<BatchResponse>("/api/batch", {
+      method: "POST",
+      body: JSON.stringify({ requests }),
+    });
+  }
+
   // Health & System
   health(): Promise<HealthResponse> {
-    return this.request<HealthResponse>("/api/health");
+    return this.get<HealthResponse>("/api/health");
   }
 
   getSystemInfo(): Promise<SystemInfo> {
-    return this.request<SystemInfo>("/api/system");
+    return this.get<SystemInfo>("/api/system");
+  }
+
+  getSystemHistory(window = 300, resolution = 5): Promise<SystemHistory> {
+    return this.get<SystemHistory>(
+      `/api/system/history?window=${window}&resolution=${resolution}`,
+    );
   }
 
   // Models
-  getModels(): Promise<ModelsResponse> {
-    return this.request<ModelsResponse>("/api/models");
+  getModels(query: ModelQuery = {}): Promise<ModelsResponse> {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+      if (value !== undefined && value !== "") params.set(key, String(value));
+    }
+    const qs = params.toString();
+    return this.get<ModelsResponse>(`/api/models${qs ? `?${qs}` : ""}`);
   }
 
   // Training
@@ -52,7 +184,186 @@ class ApiService {
   }
 
   getTrainingStatus(): Promise<TrainingStatus> {
-    return this.request<TrainingStatus>("/api/train/status");
+    return this.get<TrainingStatus>("/api/train/status");
+  }
+
+  getTrainingMetrics(
+    jobId: string,
+    params: { start?: number; end?: number; points?: number; columns?: string[] } = {},
+  ): Promise<TrainingMetrics> {
+    const query = new URLSearchParams();
+    if (params.start !== undefined) query.set("start", String(params.start));
+    if (params.end !== undefined) query.set("end", String(params.end));
+    if (params.points !== undefined) query.set("points", String(params.points));
+    if (params.columns) query.set("columns", params.columns.join(","));
+    return this.get<TrainingMetrics>(`/api/train/${jobId}/metrics?${query}`);
+  }
+
+  getCheckpoints(jobId: string): Promise<CheckpointList> {
+    return this.get<CheckpointList>(`/api/train/${jobId}/checkpoints`);
+  }
+
+  // Log records from a byte offset; pass back next_offset to fetch only new output
+  getTrainingLogs(jobId: string, query: LogQuery = {}): Promise<LogChunk> {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+      if (value !== undefined && value !== "") params.set(key, String(value));
+    }
+    const qs = params.toString();
+    return this.request<LogChunk>(`/api/train/${jobId}/logs${qs ? `?${qs}` : ""}`);
+  }
+
+  // Dataset preview: pages, random samples, search and column statistics,
+  // all read from the memory-mapped dataset on the server
+  getDatasetRows(
+    name: string,
+    offset = 0,
+    limit = 20,
+    columns?: string[],
+  ): Promise<DatasetPage> {
+    return this.get<DatasetPage>(
+      `/api/datasets/${encodeURIComponent(name)}/rows?${queryString({ offset, limit, columns })}`,
+    );
+  }
+
+  sampleDataset(name: string, n = 20, seed?: number, columns?: string[]): Promise<DatasetPage> {
+    return this.request<DatasetPage>(
+      `/api/datasets/${encodeURIComponent(name)}/sample?${queryString({ n, seed, columns })}`,
+    );
+  }
+
+  searchDataset(
+    name: string,
+    q: string,
+    options: { regex?: boolean; columns?: string[]; start?: number; limit?: number } = {},
+  ): Promise<DatasetSearchResult> {
+    return this.request<DatasetSearchResult>(
+      `/api/datasets/${encodeURIComponent(name)}/search?${queryString({ q, ...options })}`,
+    );
+  }
+
+  getDatasetStats(name: string, columns?: string[]): Promise<DatasetStats> {
+    return this.get<DatasetStats>(
+      `/api/datasets/${encodeURIComponent(name)}/stats?${queryString({ columns })}`,
+    );
+  }
+
+  // Job history, newest first; pass next_cursor back for the following page
+  getJobs(query: JobHistoryQuery = {}, cursor?: string, limit = 50): Promise<JobHistoryPage> {
+    return this.get<JobHistoryPage>(`/api/train/jobs?${queryString({ ...query, cursor, limit })}`);
+  }
+
+  getJobSummary(
+    groupBy: JobSummary["group_by"] = "model",
+    query: JobHistoryQuery = {},
+  ): Promise<JobSummary> {
+    return this.get<JobSummary>(
+      `/api/train/jobs/summary?${queryString({ ...query, group_by: groupBy })}`,
+    );
+  }
+
+  cancelTraining(jobId: string): Promise<TrainingStatus> {
+    return this.request<TrainingStatus>(`/api/train/${jobId}/cancel`, {
+      method: "POST",
+    });
+  }
+
+  // Merged model export (runs as a job, followed like training)
+  startExport(request: ExportRequest): Promise<TrainingStatus> {
+    return this.request<TrainingStatus>("/api/export", {
+      method: "POST",
+      body: JSON.stringify(request),
+    });
+  }
+
+  // Hyperparameter sweeps
+  createSweep(sweep: SweepRequest): Promise<Sweep> {
+    return this.request<Sweep>("/api/sweeps", {
+      method: "POST",
+      body: JSON.stringify(sweep),
+    });
+  }
+
+  getSweeps(): Promise<SweepList> {
+    return this.get<SweepList>("/api/sweeps");
+  }
+
+  getSweep(sweepId: string): Promise<Sweep> {
+    return this.get<Sweep>(`/api/sweeps/${sweepId}`);
+  }
+
+  cancelSweep(sweepId: string): Promise<Sweep> {
+    return this.request<Sweep>(`/api/sweeps/${sweepId}/cancel`, {
+      method: "POST",
+    });
+  }
+
+  // Push-based job updates over Server-Sent Events. The browser resumes from
+  // the last event id on reconnect. Returns a function that closes the stream.
+  streamTrainingEvents(
+    jobId: string,
+    onEvent: (type: string, event: TrainingEvent) => void,
+  ): () => void {
+    const source = new EventSource(`${API_BASE}/api/train/${jobId}/events`);
+    for (const type of ["state", "step", "lagged"]) {
+      source.addEventListener(type, (e) => {
+        const event: TrainingEvent = JSON.parse((e as MessageEvent).data);
+        onEvent(type, event);
+        if (
+          type === "state" &&
+          ["completed", "failed", "cancelled"].includes(event.state ?? "")
+        ) {
+          source.close();
+        }
+      });
+    }
+    return () => source.close();
+  }
+
+  // Streaming generation. POST bodies rule out EventSource, so the SSE stream
+  // is read from fetch. Aborting ``signal`` closes it, which cancels the
+  // request on the server. Resolves with the final "done" event.
+  async generate(
+    request: GenerateRequest,
+    onToken: (token: GenerateToken) => void,
+    onStart?: (start: GenerateStart) => void,
+    signal?: AbortSignal,
+  ): Promise<GenerateDone> {
+    const response = await fetch(`${API_BASE}/api/generate`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(request),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      const body = await response.json().catch(() => null);
+      throw new Error(body?.detail ?? `HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf("\n\n")) >= 0) {
+        const frame = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const type = /^event: (.*)$/m.exec(frame)?.[1];
+        const data = /^data: (.*)$/m.exec(frame)?.[1];
+        if (!type || !data) continue;
+        if (type === "start") onStart?.(JSON.parse(data));
+        else if (type === "token") onToken(JSON.parse(data));
+        else if (type === "done") return JSON.parse(data);
+      }
+    }
+    return { finish_reason: "cancelled" };
+  }
+
+  cancelGeneration(requestId: string): Promise<{ request_id: string; cancelled: boolean }> {
+    return this.request(`/api/generate/${requestId}/cancel`, { method: "POST" });
   }
 
   // Echo (for testing)
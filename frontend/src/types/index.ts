@@ -10,8 +10,10 @@ export interface GpuDevice {
 }
 
 export interface GpuInfo {
-  available: boolean;
+  // null until the server's first GPU probe finishes
+  available: boolean | null;
   devices: GpuDevice[];
+  source?: 'nvml' | 'nvidia-smi' | 'torch';
 }
 
 export interface MemoryInfo {
@@ -20,14 +22,32 @@ export interface MemoryInfo {
   percent_used: number;
 }
 
+export interface ProcessInfo {
+  pid: number;
+  rss_gb: number;
+  cpu_percent: number;
+  threads: number;
+}
+
 export interface SystemInfo {
   platform: string;
   python_version: string;
   cpu_count: number;
+  timestamp?: number;
+  cpu_percent?: number;
   memory: MemoryInfo;
+  process?: ProcessInfo;
   gpu: GpuInfo;
 }
 
+export interface SystemHistory {
+  interval: number;
+  window: number;
+  resolution: number;
+  timestamps: number[];
+  series: Record<string, (number | null)[]>;
+}
+
 export interface EchoResponse {
   received: Record<string, unknown>;
   message: string;
@@ -39,10 +59,32 @@ export interface Model {
   name: string;
   size?: string;
   description?: string;
+  source?: "hub" | "workspace";
+  path?: string;
+  size_bytes?: number;
+  parameters?: number | null;
+  parameters_label?: string | null;
+  architecture?: string | null;
+  quantization?: string | null;
+  modified?: number;
 }
 
 export interface ModelsResponse {
   models: Model[];
+  total?: number;
+  offset?: number;
+  limit?: number;
+}
+
+export interface ModelQuery {
+  q?: string;
+  source?: string;
+  quantization?: string;
+  architecture?: string;
+  sort?: "name" | "size" | "parameters" | "modified";
+  order?: "asc" | "desc";
+  offset?: number;
+  limit?: number;
 }
 
 export interface TrainingConfig {
@@ -52,12 +94,347 @@ export interface TrainingConfig {
   learning_rate: number;
   num_epochs: number;
   batch_size: number;
+  gradient_accumulation_steps?: number;
   lora_r: number;
   lora_alpha: number;
+  packing?: boolean;
+  batching?: "naive" | "bucketed" | "packed";
+  template?: string;
+  checkpoint_every?: number;
+  keep_last?: number;
+  keep_best?: number;
+}
+
+export interface AdmissionResult {
+  decision: "accept" | "adjust" | "wait" | "reject";
+  reason: string;
+  estimate_gb: Record<string, number> | null;
+  budget: {
+    device: "gpu" | "cpu";
+    free_gb: number;
+    total_gb: number;
+    host_free_gb: number;
+  };
+  batch_size?: number;
+  gradient_accumulation_steps?: number;
 }
 
 export interface TrainingStatus {
   status: string;
   message: string;
   job_id?: string;
+  events_url?: string;
+  queue_position?: number | null;
+  admission?: AdmissionResult | null;
+}
+
+export interface TrainingEvent {
+  job_id: string;
+  time: number;
+  state?: string;
+  step?: number;
+  total_steps?: number;
+  epoch?: number;
+  loss?: number;
+  tokens_per_sec?: number;
+  error?: string;
+}
+
+export interface MetricSeries {
+  min: (number | null)[];
+  max: (number | null)[];
+  mean: (number | null)[];
+}
+
+export interface TrainingMetrics {
+  total_rows: number;
+  rows: number;
+  bucket_size: number;
+  steps: number[];
+  series: Record<string, MetricSeries>;
+}
+
+export interface CheckpointShard {
+  blob: string;
+  bytes: number;
+}
+
+export interface Checkpoint {
+  step: number;
+  created: number;
+  metrics: Record<string, number>;
+  shards: Record<string, CheckpointShard>;
+  bytes: number;
+}
+
+export interface CheckpointList {
+  job_id: string;
+  checkpoints: Checkpoint[];
+}
+
+export type LogLevel = "DEBUG" | "INFO" | "WARNING" | "ERROR" | "CRITICAL";
+
+export interface LogRecord {
+  offset: number;
+  time: number | null;
+  level: LogLevel;
+  source: "stdout" | "stderr" | "logging" | "worker" | "raw";
+  message: string;
+  logger?: string;
+  event?: string;
+  data?: Record<string, unknown>;
+}
+
+export interface LogQuery {
+  offset?: number;
+  limit?: number;
+  tail?: number;
+  level?: LogLevel;
+  grep?: string;
+}
+
+export interface LogChunk {
+  job_id: string;
+  offset: number;
+  next_offset: number;
+  end_offset: number;
+  truncated: boolean;
+  records: LogRecord[];
+}
+
+export type SweepField = "learning_rate" | "lora_r" | "lora_alpha" | "batch_size";
+
+export type SweepRange = { min: number; max: number; log?: boolean };
+
+export interface SweepRequest {
+  config: Partial<TrainingConfig>;
+  space: Partial<Record<SweepField, number[] | SweepRange>>;
+  num_trials?: number;
+  max_concurrent?: number;
+  grace_period?: number;
+  reduction_factor?: number;
+  seed?: number;
+}
+
+export interface SweepTrial {
+  trial: number;
+  params: Partial<Record<SweepField, number>>;
+  job_id: string | null;
+  state: string;
+  step: number;
+  loss: number | null;
+  rungs: Record<string, number>;
+  message: string;
+}
+
+export interface SweepLeader {
+  rank: number;
+  trial: number;
+  job_id: string | null;
+  state: string;
+  params: Partial<Record<SweepField, number>>;
+  step: number;
+  loss: number;
+}
+
+export interface Sweep {
+  sweep_id: string;
+  state: "running" | "completed" | "cancelled";
+  config: Partial<TrainingConfig>;
+  space: SweepRequest["space"];
+  seed: number;
+  max_concurrent: number;
+  max_steps: number;
+  grace_period: number;
+  reduction_factor: number;
+  rungs: number[];
+  created_at: number;
+  finished_at: number | null;
+  best: SweepLeader | null;
+  steps_run: number;
+  grid_steps: number;
+  compute_fraction: number;
+  states: Record<string, number>;
+  leaderboard?: SweepLeader[];
+  trials?: SweepTrial[];
+}
+
+export interface SweepList {
+  sweeps: Sweep[];
+}
+
+export interface BatchRequest {
+  id?: string | number;
+  method?: "GET" | "POST";
+  path: string;
+  body?: unknown;
+  headers?: Record<string, string>;
+}
+
+export interface BatchResult {
+  id: string | number;
+  status: number;
+  etag?: string;
+  body: unknown;
+}
+
+export interface BatchResponse {
+  responses: BatchResult[];
+}
+
+export interface GenerateRequest {
+  prompt: string;
+  model?: string;
+  max_tokens?: number;
+  temperature?: number;
+  top_k?: number;
+  seed?: number;
+}
+
+export interface GenerateStart {
+  request_id: string;
+  model: string;
+  shared: boolean;
+  prompt_tokens: number;
+  queue_position: number | null;
+}
+
+export interface GenerateToken {
+  index: number;
+  count: number;
+  text: string;
+}
+
+export interface GenerateDone {
+  finish_reason: "stop" | "length" | "cancelled" | "error";
+  shared?: boolean;
+  usage?: {
+    prompt_tokens: number;
+    cached_prompt_tokens: number;
+    completion_tokens: number;
+  };
+  ttft_ms?: number;
+  tokens_per_sec?: number;
+  mean_batch_size?: number;
+  error?: string;
+}
+
+export interface DatasetColumn {
+  name: string;
+  type: string;
+}
+
+export interface DatasetRow {
+  index: number;
+  values: Record<string, unknown>;
+}
+
+export interface DatasetPage {
+  dataset: string;
+  num_rows: number;
+  columns: DatasetColumn[];
+  rows: DatasetRow[];
+  offset?: number;
+  limit?: number;
+  seed?: number | null;
+}
+
+export interface DatasetSearchResult extends DatasetPage {
+  query: string;
+  regex: boolean;
+  start: number;
+  scanned: number;
+  next_start: number | null;
+}
+
+export interface DatasetColumnStats {
+  type: string;
+  count: number;
+  nulls: number;
+  [stat: string]: string | number;
+}
+
+export interface DatasetStats {
+  dataset: string;
+  num_rows: number;
+  columns: DatasetColumn[];
+  stats: Record<string, DatasetColumnStats>;
+}
+
+export interface ExportRequest {
+  base_model: string;
+  adapter_job_id?: string;
+  adapter_step?: number;
+  adapter_path?: string;
+  format?: "safetensors" | "gguf";
+  gguf_outtype?: "f32" | "f16" | "bf16" | "q8_0";
+  max_memory_mb?: number;
+  max_shard_mb?: number;
+  lora_r?: number;
+  lora_alpha?: number;
+}
+
+export interface ExportProgress {
+  stage: "merge" | "gguf";
+  tensors_done?: number;
+  total_tensors?: number;
+  bytes_done?: number;
+  total_bytes?: number;
+  shard?: number;
+  shards?: number;
+  bytes_per_sec?: number;
+  elapsed_sec?: number;
+}
+
+export type JobState = "queued" | "running" | "completed" | "failed" | "cancelled";
+
+export interface JobHistoryRow {
+  job_id: string;
+  type: "train" | "export";
+  state: JobState;
+  model: string | null;
+  dataset: string | null;
+  submitted_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+  attempts: number | null;
+  step: number | null;
+  total_steps: number | null;
+  loss: number | null;
+  tokens_per_sec: number | null;
+  final_loss: number | null;
+  runtime_sec: number | null;
+  message: string | null;
+  error: string | null;
+}
+
+export interface JobHistoryQuery {
+  state?: JobState;
+  model?: string;
+  dataset?: string;
+  type?: "train" | "export";
+  since?: number;
+  until?: number;
+}
+
+export interface JobHistoryPage {
+  jobs: JobHistoryRow[];
+  next_cursor: string | null;
+}
+
+export interface JobSummaryGroup {
+  key: string | null;
+  jobs: number;
+  completed: number;
+  failed: number;
+  active: number;
+  avg_tokens_per_sec: number | null;
+  avg_final_loss: number | null;
+  avg_runtime_sec: number | null;
+}
+
+export interface JobSummary {
+  group_by: "model" | "dataset" | "state" | "type";
+  total: number;
+  groups: JobSummaryGroup[];
 }
@@ -1,5 +1,6 @@
 """Unsloth CLI entry point."""
 
+import os
 import sys
 import argparse
 
@@ -12,13 +13,51 @@ def main():
     studio_parser = subparsers.add_parser("studio", help="Launch Unsloth Studio")
     studio_parser.add_argument("--port", type=int, default=8000, help="Port number")
     studio_parser.add_argument("--host", default="127.0.0.1", help="Host address")
+    studio_parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=None,
+        help="Maximum number of training jobs running at once",
+    )
+    studio_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Server processes sharing the port (jobs and telemetry stay shared)",
+    )
+
+    studio_parser.add_argument(
+        "--warmup",
+        default=None,
+        help="Comma-separated heavy modules to import in the background after startup",
+    )
+    studio_parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import time and memory of a cold start, then exit",
+    )
 
     args = parser.parse_args()
 
-    if args.command == "studio":
+    if args.command == "studio" and args.profile_startup:
+        from roland_ui_demo.studio.backend.core.startup_profile import (
+            print_report,
+            profile_startup,
+        )
+
+        print_report(profile_startup())
+    elif args.command == "studio":
+        if args.warmup is not None:
+            # Through the environment so multi-worker coordinators see it too
+            os.environ["UNSLOTH_STUDIO_WARMUP"] = args.warmup
         from roland_ui_demo.studio.backend.main import start_studio
 
-        start_studio(host=args.host, port=args.port)
+        start_studio(
+            host=args.host,
+            port=args.port,
+            max_jobs=args.max_jobs,
+            workers=args.workers,
+        )
     else:
         parser.print_help()
         return 1
@@ -0,0 +1,393 @@
+"""
+Memory-aware admission control for training jobs.
+
+``estimate_memory`` predicts a LoRA fine-tune's peak memory from the model's
+parameter count (from the model catalog, or parsed from names such as
+``llama-3-8b-bnb-4bit``), its quantization, ``lora_r``, ``batch_size`` and
+``max_seq_length``. ``decide`` compares the estimate with a ``MemoryBudget``
+(free GPU memory when there is a GPU, otherwise free host RAM) and returns
+one of:
+
+- ``accept``: the job fits as submitted;
+- ``adjust``: it fits once the micro-batch is halved (repeatedly), with
+  gradient accumulation raised to keep the effective batch size;
+- ``wait``: it fits the hardware but not what is free right now, so it is
+  queued and the scheduler holds it until enough memory is free;
+- ``reject``: it cannot fit even with a micro-batch of one.
+
+The estimate is deliberately coarse (weights, LoRA parameters with their
+gradients and optimizer states, checkpointed activations, logits and a fixed
+runtime overhead) and errs on the high side: a job held in the queue costs
+minutes, an out-of-memory crash and retry costs hours. GPU usage comes from
+NVML or nvidia-smi; when only torch is available it cannot see the job
+workers' memory, so the running jobs' own estimates are counted as used.
+``benchmarks/sim_admission.py`` runs the decisions against simulated budgets.
+"""
+
+import re
+from typing import Any, Callable, Dict, Optional, Union
+
+import psutil
+
+from .model_catalog import catalog
+from .telemetry import GB, sampler
+
+# Only this fraction of free memory is planned for; the rest absorbs fragmentation
+SAFETY_FRACTION = 0.9
+# CUDA context, allocator slack and framework buffers
+RUNTIME_OVERHEAD = 1.0 * GB
+# Bytes per trainable LoRA parameter: bf16 weight and gradient, fp32 Adam moments
+LORA_BYTES_PER_PARAM = 2 + 2 + 8
+# Vocabulary assumed when the config does not name one (Llama 3 sized)
+DEFAULT_VOCAB = 128256
+# Weight bytes per parameter, including quantization constants
+BYTES_PER_PARAM = {4: 0.5 * 1.15, 8: 1.0 * 1.05, 16: 2.0, 32: 4.0}
+# Halving the micro-batch stops here
+MIN_BATCH_SIZE = 1
+
+# "8b", "0.5B", "135m" in a model name
+_SIZE_PATTERN = re.compile(
+    r"(?<![\d.])(\d+(?:\.\d+)?)\s*([bm])(?![a-z])", re.IGNORECASE
+)
+
+DECISIONS = ("accept", "adjust", "wait", "reject")
+
+
+class AdmissionRejected(ValueError):
+    """A job that cannot fit on this machine with any micro-batch size."""
+
+    def __init__(self, reason: str, admission: Dict[str, Any]):
+        super().__init__(reason, admission)
+        self.reason = reason
+        self.admission = admission
+
+    def __str__(self) -> str:
+        return self.reason
+
+
+class MemoryBudget:
+    """
+    Memory a job can use.
+
+    Args:
+        device: "gpu" or "cpu", where the model and activations live
+        free: Bytes free on that device now
+        total: Bytes the device has in all
+        host_free: Bytes of host RAM free (checkpoint loading passes through it)
+    """
+
+    def __init__(self, device: str, free: float, total: float, host_free: float):
+        self.device = device
+        self.free = free
+        self.total = total
+        self.host_free = host_free
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "free_gb": round(self.free / GB, 2),
+            "total_gb": round(self.total / GB, 2),
+            "host_free_gb": round(self.host_free / GB, 2),
+        }
+
+
+def parameters_from_name(name: str) -> Optional[int]:
+    """Parameter count spelled in a model name ("8b", "0.5B", "135m"), if any."""
+    matches = _SIZE_PATTERN.findall(name.split("/")[-1])
+    if not matches:
+        return None
+    value, unit = matches[-1]
+    return int(float(value) * (1e9 if unit.lower() == "b" else 1e6))
+
+
+def quantization_bits(config: Dict[str, Any], quantization: Optional[str] = None) -> int:
+    """Weight precision implied by the config, the catalog entry or the model name."""
+    if config.get("load_in_4bit"):
+        return 4
+    if config.get("load_in_8bit"):
+        return 8
+    hint = f"{quantization or ''} {config.get('model_name', '')}".lower()
+    if "4bit" in hint or "4-bit" in hint or "int4" in hint or "nf4" in hint:
+        return 4
+    if "8bit" in hint or "8-bit" in hint or "int8" in hint:
+        return 8
+    if "float32" in hint or "fp32" in hint:
+        return 32
+    return 16
+
+
+def estimate_memory(
+    config: Dict[str, Any],
+    parameters: Optional[int] = None,
+    quantization: Optional[str] = None,
+) -> Optional[Dict[str, float]]:
+    """
+    Peak training memory in bytes, broken down by component.
+
+    Args:
+        config: TrainingConfig as submitted
+        parameters: Model parameter count, when the catalog knows it
+        quantization: Catalog quantization label, e.g. "bnb-4bit"
+
+    Returns:
+        ``{"weights", "lora", "activations", "logits", "overhead", "peak"}``, or
+        None when the model's size cannot be determined
+    """
+    parameters = parameters or parameters_from_name(str(config.get("model_name", "")))
+    if not parameters:
+        return None
+    bits = quantization_bits(config, quantization)
+    batch = max(1, int(config.get("batch_size", 4)))
+    seq = max(1, int(config.get("max_seq_length", 2048)))
+    rank = max(1, int(config.get("lora_r", 16)))
+    vocab = int(config.get("vocab_size", DEFAULT_VOCAB))
+
+    # Decoder shape from the parameter count: P ~ 12 * layers * hidden^2 with
+    # layers ~ hidden / 128, which lands close to Llama/Qwen/Mistral shapes
+    hidden = int(config.get("hidden_size") or (parameters * 128 / 12) ** (1 / 3))
+    layers = int(config.get("num_layers") or max(1, round(hidden / 128)))
+
+    # LoRA on q/k/v/o (4 x 2h) and the MLP (3 x (h + 3.5h)) in every layer
+    lora_params = rank * layers * 21.5 * hidden
+    weights = parameters * BYTES_PER_PARAM[bits]
+    lora = lora_params * LORA_BYTES_PER_PARAM
+    # Gradient checkpointing keeps each layer's bf16 input, plus one layer's
+    # recomputed intermediates during the backward pass
+    activations = batch * seq * hidden * (2 * layers + 20)
+    # bf16 logits for the chunked cross-entropy
+    logits = batch * seq * vocab * 2
+    estimate = {
+        "weights": weights,
+        "lora": lora,
+        "activations": activations,
+        "logits": logits,
+        "overhead": RUNTIME_OVERHEAD,
+    }
+    estimate["peak"] = sum(estimate.values())
+    return estimate
+
+
+def _gb(estimate: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    if estimate is None:
+        return None
+    return {key: round(value / GB, 2) for key, value in estimate.items()}
+
+
+def decide(
+    config: Dict[str, Any],
+    budget: MemoryBudget,
+    parameters: Optional[int] = None,
+    quantization: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Admission decision for ``config`` under ``budget``.
+
+    Returns a dict with ``decision`` (one of DECISIONS), ``reason``, the
+    estimate in GB, the budget, and for "adjust" the new ``batch_size`` and
+    ``gradient_accumulation_steps``.
+    """
+    estimate = estimate_memory(config, parameters, quantization)
+    result: Dict[str, Any] = {"budget": budget.to_dict(), "estimate_gb": _gb(estimate)}
+    if estimate is None:
+        result.update(decision="accept", reason="Model size unknown; not checked")
+        return result
+
+    usable = budget.free * SAFETY_FRACTION
+    capacity = budget.total * SAFETY_FRACTION
+    needed = estimate["peak"]
+
+    minimal = estimate_memory(
+        {**config, "batch_size": MIN_BATCH_SIZE}, parameters, quantization
+    )
+    if minimal["peak"] > capacity:
+        result.update(
+            decision="reject",
+            reason=(
+                f"Needs ~{minimal['peak'] / GB:.1f} GB even at batch size "
+                f"{MIN_BATCH_SIZE}, but at most {capacity / GB:.1f} GB of the "
+                f"{budget.device}'s {budget.total / GB:.1f} GB can be used. Use a "
+                "smaller model, 4-bit loading, a shorter max_seq_length or a lower "
+                "lora_r."
+            ),
+            estimate_gb=_gb(minimal),
+        )
+        return result
+
+    # Loading onto a GPU stages the weights through host RAM
+    host_needed = estimate["weights"] if budget.device == "gpu" else 0.0
+    if host_needed > budget.host_free * SAFETY_FRACTION:
+        result.update(
+            decision="wait",
+            reason=(
+                f"Loading needs ~{host_needed / GB:.1f} GB of host RAM, "
+                f"{budget.host_free / GB:.1f} GB free; queued until memory frees up"
+            ),
+        )
+        return result
+
+    if needed <= usable:
+        result.update(
+            decision="accept",
+            reason=f"Needs ~{needed / GB:.1f} GB, {usable / GB:.1f} GB usable",
+        )
+        return result
+
+    # Trade micro-batch size for gradient accumulation until it fits
+    batch = max(1, int(config.get("batch_size", 4)))
+    accumulation = max(1, int(config.get("gradient_accumulation_steps", 1)))
+    smallest = estimate
+    while batch > MIN_BATCH_SIZE:
+        batch = max(MIN_BATCH_SIZE, batch // 2)
+        accumulation *= 2
+        smallest = estimate_memory(
+            {**config, "batch_size": batch}, parameters, quantization
+        )
+        if smallest["peak"] <= usable:
+            result.update(
+                decision="adjust",
+                reason=(
+                    f"Needs ~{needed / GB:.1f} GB at batch size "
+                    f"{config.get('batch_size', 4)}, {usable / GB:.1f} GB usable; "
+                    f"running micro-batches of {batch} with {accumulation}x "
+                    f"gradient accumulation (~{smallest['peak'] / GB:.1f} GB)"
+                ),
+                batch_size=batch,
+                gradient_accumulation_steps=accumulation,
+                estimate_gb=_gb(smallest),
+            )
+            return result
+
+    # Fits the device, just not alongside whatever is using it now
+    result.update(
+        decision="wait",
+        reason=(
+            f"Needs ~{smallest['peak'] / GB:.1f} GB, only {usable / GB:.1f} GB "
+            f"of {budget.total / GB:.1f} GB free on {budget.device}; "
+            "queued until memory frees up"
+        ),
+    )
+    return result
+
+
+class AdmissionController:
+    """
+    Live admission checks against the telemetry sampler and model catalog.
+
+    Args:
+        sampler: ``TelemetrySampler`` providing GPU totals and usage
+        model_info: Returns ``(parameters, quantization)`` for a model name
+    """
+
+    def __init__(self, sampler, model_info: Callable[[str], tuple]):
+        self.sampler = sampler
+        self.model_info = model_info
+        # Returns every job record (``JobScheduler.list``); set by the coordinator
+        self.jobs: Optional[Callable[[], list]] = None
+
+    def _reserved(self) -> float:
+        """Bytes the running jobs were admitted with, by their own estimates."""
+        if self.jobs is None:
+            return 0.0
+        reserved = 0.0
+        for record in self.jobs():
+            if record["state"] != "running":
+                continue
+            estimate = record["config"].get("admission", {}).get("estimate_gb")
+            if estimate is not None:
+                reserved += estimate["peak"] * GB
+        return reserved
+
+    def budget(self) -> Optional[MemoryBudget]:
+        """Memory free for a job now, or None while telemetry is still probing GPUs."""
+        memory = psutil.virtual_memory()
+        gpu = self.sampler.latest()["gpu"]
+        if gpu["available"] is None:
+            return None
+        if gpu["available"]:
+            metrics = self.sampler.latest_metrics()
+            # Through torch, "used" is only this process's own reservation and
+            # misses the job workers entirely, so count what they were admitted with
+            reserved = self._reserved() if gpu.get("source") == "torch" else None
+            # The job gets the device with the most free memory
+            best = None
+            for device in gpu["devices"]:
+                total = device["memory_total_gb"] * GB
+                if reserved is None:
+                    used = metrics.get(f"gpu{device['index']}_memory_used_gb", 0.0) * GB
+                else:
+                    used = reserved
+                if best is None or total - used > best[0]:
+                    best = (total - used, total)
+            return MemoryBudget("gpu", max(0.0, best[0]), best[1], memory.available)
+        return MemoryBudget("cpu", memory.available, memory.total, memory.available)
+
+    def check(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        parameters, quantization = self.model_info(str(config.get("model_name", "")))
+        budget = self.budget()
+        if budget is None:
+            # Not knowing yet whether there is a GPU, hold the job rather than
+            # judge it against host RAM
+            return {
+                "decision": "wait",
+                "reason": "Detecting GPUs; queued until that finishes",
+                "budget": None,
+                "estimate_gb": _gb(estimate_memory(config, parameters, quantization)),
+            }
+        return decide(config, budget, parameters, quantization)
+
+    def admit(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check a submitted config. Returns the config to run and the decision.
+
+        Raises:
+            AdmissionRejected: If the job cannot fit on this machine at all
+        """
+        result = self.check(config)
+        if result["decision"] == "reject":
+            raise AdmissionRejected(result["reason"], result)
+        if result["decision"] == "adjust":
+            config = {
+                **config,
+                "batch_size": result["batch_size"],
+                "gradient_accumulation_steps": result["gradient_accumulation_steps"],
+            }
+        return {**config, "admission": result}
+
+    def gate(self, record: Dict[str, Any]) -> Union[str, Dict[str, Any], None]:
+        """
+        Why a queued job cannot start yet, or None if it can (``JobScheduler.gate``).
+
+        Memory may have changed since submission, so the check is repeated
+        right before launch, shrinking the micro-batch again if needed. A job
+        that no longer fits at all gets the rejecting decision back, which
+        fails it instead of holding the queue behind it forever.
+        """
+        config = record["config"]
+        if config.get("admission", {}).get("estimate_gb") is None:
+            return None  # unknown size, or submitted with admission control off
+        result = self.check(config)
+        if result["decision"] == "adjust":
+            config["batch_size"] = result["batch_size"]
+            config["gradient_accumulation_steps"] = result["gradient_accumulation_steps"]
+        if result["decision"] in ("accept", "adjust"):
+            config["admission"] = result
+            return None
+        if result["decision"] == "reject":
+            return result
+        return f"Waiting for memory: {result['reason']}"
+
+
+def catalog_model_info(catalog) -> Callable[[str], tuple]:
+    """Look models up in a ``ModelCatalog`` by id or name."""
+
+    def lookup(name: str):
+        model = catalog.find(name)
+        if model is None:
+            return None, None
+        return model["parameters"], model["quantization"]
+
+    return lookup
+
+
+# Shared controller for the app
+admission = AdmissionController(sampler, catalog_model_info(catalog))
@@ -0,0 +1,257 @@
+"""
+Asynchronous, deduplicated training checkpoints.
+
+``CheckpointWriter`` runs inside the job worker process. ``save()`` only
+copies the tensors to host memory and returns; a background thread encodes
+each shard as safetensors and writes it to disk, so the training loop keeps
+stepping while a checkpoint is written. At most ``MAX_PENDING`` snapshots
+wait for the writer, which bounds the host memory they can take.
+
+Layout under ``<job_dir>/checkpoints/``::
+
+    blobs/<sha256>.safetensors      content-addressed shards
+    step-000050/manifest.json       shard -> blob, step, metrics
+
+Shards are stored by the hash of their encoded bytes, so a shard that did not
+change since the previous checkpoint (frozen modules, an embedding that is not
+trained) is written once and shared. Blobs and manifests are written to a temp
+file, fsynced and renamed; a checkpoint exists once its manifest does, so a
+crash mid-save never leaves a half-written checkpoint behind.
+
+After every save the retention policy keeps the last ``keep_last``
+checkpoints plus the ``keep_best`` best by an eval metric, deletes the rest
+and then any blob no remaining manifest refers to, so disk use stays bounded
+however long the run.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+# Snapshots waiting for the writer before save() blocks
+MAX_PENDING = 2
+# Retention defaults: newest checkpoints kept, and best ones kept by metric
+KEEP_LAST = 3
+KEEP_BEST = 1
+
+CHECKPOINTS_DIR = "checkpoints"
+BLOBS_DIR = "blobs"
+MANIFEST = "manifest.json"
+BLOB_SUFFIX = ".safetensors"
+
+Tensors = Mapping[str, Any]
+Reporter = Callable[[str, Dict[str, Any]], None]
+
+
+def _to_host(tensor):
+    """Copy of a tensor in host memory, detached from whatever training does next."""
+    if hasattr(tensor, "detach"):  # torch
+        return tensor.detach().to("cpu", copy=True)
+    import numpy as np
+
+    return np.array(tensor, copy=True)
+
+
+def _encode(tensors: Dict[str, Any]) -> bytes:
+    """Serialize one shard to safetensors bytes (deterministic for equal tensors)."""
+    if any(hasattr(t, "detach") for t in tensors.values()):
+        from safetensors.torch import save
+    else:
+        from safetensors.numpy import save
+    return save(tensors)
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def step_dir_name(step: int) -> str:
+    return f"step-{step:06d}"
+
+
+def list_checkpoints(job_dir: Path) -> List[Dict[str, Any]]:
+    """Manifests of a job's complete checkpoints, oldest first."""
+    root = job_dir / CHECKPOINTS_DIR
+    manifests = []
+    if not root.is_dir():
+        return manifests
+    for path in root.glob(f"step-*/{MANIFEST}"):
+        try:
+            manifests.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # being deleted by retention, or not ours
+    return sorted(manifests, key=lambda m: m["step"])
+
+
+def select_retained(
+    manifests: List[Dict[str, Any]],
+    keep_last: int,
+    keep_best: int,
+    metric: Optional[str],
+    mode: str = "min",
+) -> List[int]:
+    """Steps kept by the retention policy."""
+    keep = {m["step"] for m in manifests[-keep_last:]} if keep_last > 0 else set()
+    if keep_best > 0 and metric:
+        scored = [m for m in manifests if m["metrics"].get(metric) is not None]
+        scored.sort(key=lambda m: m["metrics"][metric], reverse=mode == "max")
+        keep.update(m["step"] for m in scored[:keep_best])
+    return sorted(keep)
+
+
+class CheckpointWriter:
+    """
+    Background checkpoint writer for one job.
+
+    Args:
+        job_dir: Per-job directory under the workspace
+        keep_last: Most recent checkpoints to keep (0 keeps none for recency)
+        keep_best: Best checkpoints by ``metric`` to keep as well
+        metric: Metric in each save's ``metrics`` ranking checkpoints
+        mode: "min" if lower ``metric`` is better, "max" otherwise
+        report: Optional reporter that receives a "checkpoint" event per save
+    """
+
+    def __init__(
+        self,
+        job_dir: Path,
+        keep_last: int = KEEP_LAST,
+        keep_best: int = KEEP_BEST,
+        metric: Optional[str] = "eval_loss",
+        mode: str = "min",
+        report: Optional[Reporter] = None,
+    ):
+        if mode not in ("min", "max"):
+            raise ValueError("mode must be 'min' or 'max'")
+        self.root = job_dir / CHECKPOINTS_DIR
+        self.blobs = self.root / BLOBS_DIR
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.metric = metric
+        self.mode = mode
+        self.report = report
+        self.errors: List[str] = []
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=MAX_PENDING)
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-writer", daemon=True
+        )
+        self._thread.start()
+
+    def save(
+        self,
+        step: int,
+        shards: Mapping[str, Tensors],
+        metrics: Optional[Dict[str, float]] = None,
+    ) -> float:
+        """
+        Snapshot ``shards`` (``{shard: {tensor name: tensor}}``) and queue the write.
+
+        Blocks only while ``MAX_PENDING`` earlier saves are still being written.
+        Returns the seconds the caller was paused.
+        """
+        started = time.perf_counter()
+        snapshot = {
+            shard: {name: _to_host(t) for name, t in tensors.items()}
+            for shard, tensors in shards.items()
+        }
+        self._queue.put((step, snapshot, dict(metrics or {}), time.time()))
+        return time.perf_counter() - started
+
+    def close(self):
+        """Wait for queued checkpoints to be written and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as e:  # a failed save must not kill training
+                self.errors.append(f"step {item[0]}: {e}")
+                print(f"Checkpoint at step {item[0]} failed: {e}")
+
+    def _write(self, step: int, snapshot, metrics: Dict[str, float], created: float):
+        started = time.perf_counter()
+        files = {}
+        written = 0
+        reused = 0
+        total = 0
+        for shard, tensors in snapshot.items():
+            data = _encode(tensors)
+            digest = hashlib.sha256(data).hexdigest()
+            blob = self.blobs / f"{digest}{BLOB_SUFFIX}"
+            if blob.exists():
+                reused += 1
+            else:
+                _write_atomic(blob, data)
+                written += len(data)
+            files[shard] = {"blob": blob.name, "bytes": len(data)}
+            total += len(data)
+
+        step_dir = self.root / step_dir_name(step)
+        step_dir.mkdir(exist_ok=True)
+        manifest = {
+            "step": step,
+            "created": created,
+            "metrics": metrics,
+            "shards": files,
+            "bytes": total,
+        }
+        _write_atomic(step_dir / MANIFEST, json.dumps(manifest, indent=2).encode())
+        deleted = self._apply_retention()
+
+        if self.report is not None:
+            self.report(
+                "checkpoint",
+                {
+                    "step": step,
+                    "metrics": metrics,
+                    "bytes": total,
+                    "bytes_written": written,
+                    "shards_reused": reused,
+                    "write_seconds": round(time.perf_counter() - started, 3),
+                    "deleted": deleted,
+                    "retained": [m["step"] for m in list_checkpoints(self.root.parent)],
+                },
+            )
+
+    def _apply_retention(self) -> List[int]:
+        """Delete checkpoints outside the policy and unreferenced blobs."""
+        manifests = list_checkpoints(self.root.parent)
+        keep = set(
+            select_retained(
+                manifests, self.keep_last, self.keep_best, self.metric, self.mode
+            )
+        )
+        deleted = []
+        referenced = set()
+        for manifest in manifests:
+            if manifest["step"] in keep:
+                referenced.update(f["blob"] for f in manifest["shards"].values())
+                continue
+            # Manifest first, so a partly deleted checkpoint is never listed
+            step_dir = self.root / step_dir_name(manifest["step"])
+            (step_dir / MANIFEST).unlink(missing_ok=True)
+            shutil.rmtree(step_dir, ignore_errors=True)
+            deleted.append(manifest["step"])
+
+        for blob in self.blobs.glob(f"*{BLOB_SUFFIX}"):
+            if blob.name not in referenced:
+                blob.unlink(missing_ok=True)
+        return deleted
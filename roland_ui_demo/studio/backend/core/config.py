@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+class Settings:
+    PROJECT_NAME: str = "Unsloth Studio"
+    VERSION: str = "0.1.0"
+    API_PREFIX: str = "/api"
+
+    # Everything the studio persists (jobs, metrics, caches) lives here
+    WORKSPACE_DIR: Path = Path(
+        os.environ.get("UNSLOTH_STUDIO_WORKSPACE", Path.home() / ".unsloth_demo")
+    )
+
+    # Training jobs run in worker processes; at most this many at once
+    MAX_CONCURRENT_JOBS: int = int(os.environ.get("UNSLOTH_MAX_CONCURRENT_JOBS", "1"))
+    # Times a job interrupted by a server crash is re-queued before failing
+    MAX_JOB_ATTEMPTS: int = 3
+    # Check a job's estimated memory against what is free before it is queued
+    # and again before it starts; "0" turns the check off
+    ADMISSION_CONTROL: bool = os.environ.get("UNSLOTH_ADMISSION_CONTROL", "1") != "0"
+
+    # Processes used to tokenize datasets, and the on-disk budget for their cache
+    PREPROCESS_WORKERS: int = int(
+        os.environ.get("UNSLOTH_PREPROCESS_WORKERS", min(8, os.cpu_count() or 1))
+    )
+    DATASET_CACHE_MAX_BYTES: int = int(
+        float(os.environ.get("UNSLOTH_DATASET_CACHE_GB", "20")) * 1e9
+    )
+
+    # Heavy modules to import in the background after startup (comma-separated)
+    WARMUP_MODULES: Tuple[str, ...] = tuple(
+        m.strip()
+        for m in os.environ.get("UNSLOTH_STUDIO_WARMUP", "").split(",")
+        if m.strip()
+    )
+
+    # llama.cpp checkout whose convert_hf_to_gguf.py GGUF exports run
+    LLAMA_CPP_DIR: Path = Path(
+        os.environ.get("UNSLOTH_LLAMA_CPP_DIR", Path.home() / "llama.cpp")
+    ).expanduser()
+
+    # Set in server worker processes when running with --workers > 1
+    COORDINATOR_ADDRESS: Optional[str] = os.environ.get("UNSLOTH_STUDIO_COORDINATOR")
+
+    @property
+    def JOBS_DIR(self) -> Path:
+        return self.WORKSPACE_DIR / "jobs"
+
+    @property
+    def JOB_HISTORY_DB(self) -> Path:
+        return self.WORKSPACE_DIR / "jobs.db"
+
+    @property
+    def SWEEPS_DIR(self) -> Path:
+        return self.WORKSPACE_DIR / "sweeps"
+
+    @property
+    def DATASET_CACHE_DIR(self) -> Path:
+        return self.WORKSPACE_DIR / "cache" / "datasets"
+
+    @property
+    def DATASET_STATS_DIR(self) -> Path:
+        return self.WORKSPACE_DIR / "cache" / "dataset_stats"
+
+    def setup_directories(self):
+        self.WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
+        self.JOBS_DIR.mkdir(parents=True, exist_ok=True)
+
+
+settings = Settings()
@@ -0,0 +1,441 @@
+"""
+Shared state for multi-worker serving.
+
+With ``--workers N`` uvicorn runs N server processes behind one port, but the
+job scheduler, event broker and telemetry sampler must exist exactly once. So
+the supervising process runs them as the coordinator: a ``StudioService`` on
+its own event loop thread, served to the workers over a ``multiprocessing``
+manager on localhost. Route handlers only ever talk to a ``StudioClient``,
+which calls the service in-process with one worker and through the
+coordinator with several, so every worker gives the same answers.
+
+Everything else a worker serves (frontend assets, metric files, the model
+catalog index) is read from disk and is already consistent across processes.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .admission import admission
+from .blocking import run_blocking
+from .config import settings
+from .events import (
+    KEEPALIVE_FRAME,
+    KEEPALIVE_INTERVAL,
+    RETRY_FRAME,
+    Event,
+    EventBroker,
+    broker,
+)
+from .export import validate_export_config
+from .instrumentation import merge_expositions
+from .inference import DEFAULT_MODEL, GenerationService, UnknownModel, generation
+from .jobs import JobScheduler, scheduler
+from .model_catalog import catalog
+from .sweeps import REDUCTION_FACTOR, SweepManager, sweeps
+from .telemetry import TelemetrySampler, sampler
+from .warmup import warmup
+
+# Environment variable through which workers find the coordinator ("host:port")
+COORDINATOR_ENV = "UNSLOTH_STUDIO_COORDINATOR"
+
+# Threads per worker for long-polling the coordinator, i.e. concurrent SSE
+# streams before new ones queue. Kept apart from the default thread pool so
+# open streams never starve ordinary requests.
+EVENT_POLL_THREADS = 256
+# Seconds between workers' reports of their own request metrics, and after
+# which a worker that stopped reporting is left out of /api/metrics
+METRICS_REPORT_INTERVAL = 5.0
+METRICS_REPORT_TTL = 30.0
+
+
+class StudioService:
+    """
+    The stateful half of the studio: jobs, sweeps, their event streams,
+    telemetry and generation batches.
+    """
+
+    def __init__(
+        self,
+        scheduler: JobScheduler,
+        broker: EventBroker,
+        sampler: TelemetrySampler,
+        sweeps: SweepManager,
+        generation: GenerationService,
+    ):
+        self.scheduler = scheduler
+        self.broker = broker
+        self.sampler = sampler
+        self.sweeps = sweeps
+        self.generation = generation
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Worker -> (report time, rendered metrics) for multi-worker /api/metrics
+        self._worker_metrics: Dict[str, Tuple[float, str]] = {}
+
+    def start(self):
+        """Start telemetry and the scheduler. Must run on the service's event loop."""
+        self._loop = asyncio.get_running_loop()
+        self.sampler.start()
+        if settings.ADMISSION_CONTROL:
+            self.scheduler.gate = admission.gate
+            admission.jobs = self.scheduler.list
+            self.sweeps.admit = admission.admit
+        self.scheduler.start()
+        self.sweeps.start()
+        self.generation.start()
+        warmup.start(settings.WARMUP_MODULES)
+
+    def stop(self):
+        self.scheduler.stop()
+        self.sampler.stop()
+        if self._loop is not None:
+            self._on_loop(self.generation.stop)
+
+    def _on_loop(self, func, *args):
+        """Call ``func`` on the service's event loop, from whichever thread this is."""
+        try:
+            if asyncio.get_running_loop() is self._loop:
+                return func(*args)
+        except RuntimeError:
+            pass
+
+        async def call():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    # Everything below returns plain picklable values, since workers call it
+    # through the coordinator.
+
+    def submit(self, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        Queue a training job. Returns its record and queue position.
+
+        Raises:
+            AdmissionRejected: If the job cannot fit in this machine's memory
+        """
+        if settings.ADMISSION_CONTROL:
+            config = admission.admit(config)
+        job_id = self.scheduler.submit(config)["job_id"]
+        return self.scheduler.snapshot(job_id), self.scheduler.queue_position(job_id)
+
+    def export(self, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        Queue an export job merging an adapter into its base model.
+
+        Raises:
+            ValueError: If the request is invalid or names an unknown job
+        """
+        validate_export_config(config)
+        source = config.get("adapter_job_id")
+        if source and self.scheduler.get(source) is None:
+            raise ValueError(f"Unknown job {source}")
+        job_id = self.scheduler.submit(config, job_type="export")["job_id"]
+        return self.scheduler.snapshot(job_id), self.scheduler.queue_position(job_id)
+
+    def job(self, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A job's record, or the most recent job's when ``job_id`` is None."""
+        return self.scheduler.snapshot(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.scheduler.cancel(job_id) is None:
+            return None
+        return self.scheduler.snapshot(job_id)
+
+    def create_sweep(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Start a sweep from a ``/api/sweeps`` request body.
+
+        Raises:
+            ValueError: If the search space or settings are invalid
+        """
+        return self.sweeps.create(
+            request.get("config") or {},
+            request.get("space"),
+            num_trials=request.get("num_trials"),
+            max_concurrent=request.get("max_concurrent"),
+            grace_period=request.get("grace_period"),
+            reduction_factor=int(request.get("reduction_factor") or REDUCTION_FACTOR),
+            seed=request.get("seed"),
+        )
+
+    def sweep(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        return self.sweeps.get(sweep_id)
+
+    def list_sweeps(self) -> List[Dict[str, Any]]:
+        return self.sweeps.list()
+
+    def cancel_sweep(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        return self.sweeps.cancel(sweep_id)
+
+    def system(self) -> Dict[str, Any]:
+        return self.sampler.latest()
+
+    def system_history(self, window: float, resolution: float) -> Dict[str, Any]:
+        return self.sampler.history(window=window, resolution=resolution)
+
+    def start_generation(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a ``/api/generate`` request into its model's batch.
+
+        Raises:
+            ValueError: If the request is malformed
+            UnknownModel: If the model is neither simulated nor in the catalog
+            QueueFull: If too many requests are already waiting
+        """
+        model = request.get("model") if isinstance(request, dict) else None
+        if model and model != DEFAULT_MODEL and catalog.find(str(model)) is None:
+            raise UnknownModel(f"Unknown model {model}")
+        return self._on_loop(self.generation.submit, request)
+
+    def cancel_generation(self, request_id: str) -> bool:
+        return self._on_loop(self.generation.cancel, request_id)
+
+    def poll_generation(self, request_id: str, seen: int, timeout: float):
+        """Blocking read of a generation's frames after ``seen`` tokens; see ``GenerationService.poll``."""
+        return self.generation.poll(request_id, seen, timeout)
+
+    def generation_metrics(self, namespace: str) -> List[str]:
+        return self._on_loop(self.generation.metric_lines, namespace)
+
+    def report_metrics(self, worker: str, exposition: str):
+        """Keep a worker's latest ``MetricsRegistry.render``."""
+        self._worker_metrics[worker] = (time.monotonic(), exposition)
+
+    def worker_metrics(self, worker: str, exposition: str) -> str:
+        """
+        Report ``worker``'s metrics and return every live worker's, merged.
+
+        Each worker counts only the requests it served, so the answer to one
+        scrape has to cover all of them, labelled by worker.
+        """
+        self.report_metrics(worker, exposition)
+        cutoff = time.monotonic() - METRICS_REPORT_TTL
+        for key, (reported, _) in list(self._worker_metrics.items()):
+            if reported < cutoff:
+                self._worker_metrics.pop(key, None)
+        live = dict(self._worker_metrics)
+        return merge_expositions({key: text for key, (_, text) in sorted(live.items())})
+
+    def poll_events(self, job_id: str, after_id: int, timeout: float):
+        """
+        Blocking read of a job's events newer than ``after_id``.
+
+        Waits up to ``timeout`` seconds for one to arrive, then returns
+        ``(frames, dropped, closed, last_id)`` where ``frames`` holds
+        ``(event_id, sse_frame)`` pairs.
+        """
+        channel = self.scheduler.channel_for(job_id)
+        after_id = channel.resume_point(after_id)
+        events, dropped = channel.since(after_id)
+        if not events and not dropped and not channel.closed:
+            asyncio.run_coroutine_threadsafe(
+                channel.wait(after_id, timeout), self._loop
+            ).result()
+            events, dropped = channel.since(after_id)
+        frames = [(event.id, event.frame) for event in events]
+        return frames, dropped, channel.closed, channel.last_id
+
+
+class StudioClient:
+    """Async access to a ``StudioService``, in-process or through the coordinator."""
+
+    def __init__(self, service, remote: bool = False):
+        self.service = service
+        self.remote = remote
+        self._pollers = (
+            ThreadPoolExecutor(EVENT_POLL_THREADS, thread_name_prefix="event-poll")
+            if remote
+            else None
+        )
+
+    async def _call(self, method: str, *args, blocking: bool = False):
+        func = getattr(self.service, method)
+        if self.remote or blocking:
+            # A round trip to the coordinator, or disk and process work in-process
+            return await run_blocking(func, *args)
+        return func(*args)
+
+    async def submit(self, config: Dict[str, Any]):
+        # Writes and fsyncs the job record, and may spawn its worker process
+        return await self._call("submit", config, blocking=True)
+
+    async def export(self, config: Dict[str, Any]):
+        return await self._call("export", config, blocking=True)
+
+    async def job(self, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return await self._call("job", job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call("cancel", job_id, blocking=True)
+
+    async def create_sweep(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # Submits (and fsyncs) the first trials
+        return await self._call("create_sweep", request, blocking=True)
+
+    async def sweep(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call("sweep", sweep_id)
+
+    async def list_sweeps(self) -> List[Dict[str, Any]]:
+        return await self._call("list_sweeps")
+
+    async def cancel_sweep(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call("cancel_sweep", sweep_id, blocking=True)
+
+    async def system(self) -> Dict[str, Any]:
+        return await self._call("system")
+
+    async def system_history(self, window: float, resolution: float) -> Dict[str, Any]:
+        return await self._call("system_history", window, resolution)
+
+    async def start_generation(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # May rescan the model catalog to look the model up
+        return await self._call("start_generation", request, blocking=True)
+
+    async def cancel_generation(self, request_id: str) -> bool:
+        return await self._call("cancel_generation", request_id)
+
+    async def report_metrics(self, worker: str, exposition: str):
+        return await self._call("report_metrics", worker, exposition)
+
+    async def worker_metrics(self, worker: str, exposition: str) -> str:
+        return await self._call("worker_metrics", worker, exposition)
+
+    async def generation_metrics(self, namespace: str) -> List[str]:
+        return await self._call("generation_metrics", namespace)
+
+    async def stream_generation(self, request_id: str) -> AsyncIterator[bytes]:
+        """SSE frames for a started generation. Leaving early cancels it."""
+        if not self.remote:
+            async for frame in self.service.generation.stream(request_id):
+                yield frame
+            return
+
+        loop = asyncio.get_running_loop()
+        seen, done = 0, False
+        try:
+            while not done:
+                frames, seen, done = await loop.run_in_executor(
+                    self._pollers,
+                    self.service.poll_generation,
+                    request_id,
+                    seen,
+                    KEEPALIVE_INTERVAL,
+                )
+                for frame in frames:
+                    yield frame
+                if not frames:
+                    yield KEEPALIVE_FRAME
+        finally:
+            if not done:
+                await self._call("cancel_generation", request_id)
+
+    async def stream(self, job_id: str, last_event_id: int = 0) -> AsyncIterator[bytes]:
+        """SSE frames for ``job_id``, as ``EventBroker.stream`` yields them."""
+        if not self.remote:
+            self.service.scheduler.channel_for(job_id)
+            async for frame in self.service.broker.stream(job_id, last_event_id):
+                yield frame
+            return
+
+        loop = asyncio.get_running_loop()
+        cursor = last_event_id
+        yield RETRY_FRAME
+        while True:
+            frames, dropped, closed, last_id = await loop.run_in_executor(
+                self._pollers,
+                self.service.poll_events,
+                job_id,
+                cursor,
+                KEEPALIVE_INTERVAL,
+            )
+            if cursor > last_id:
+                cursor = 0  # from before a restart; the coordinator started over
+            if dropped:
+                lagged = Event(
+                    cursor + dropped, "lagged", {"job_id": job_id, "dropped": dropped}
+                )
+                yield lagged.frame
+            for event_id, frame in frames:
+                yield frame
+                cursor = event_id
+
+            if closed and cursor >= last_id:
+                return
+            if not frames:
+                yield KEEPALIVE_FRAME
+
+    def close(self):
+        if self._pollers is not None:
+            self._pollers.shutdown(wait=False, cancel_futures=True)
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register("studio")
+
+
+class Coordinator:
+    """Runs a ``StudioService`` on a private event loop and serves it to workers."""
+
+    def __init__(self, service: StudioService):
+        self.service = service
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+
+    def start(self) -> str:
+        """Start the service and its server. Returns the address workers connect to."""
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="coordinator-loop", daemon=True
+        ).start()
+
+        async def start_service():
+            self.service.start()
+
+        asyncio.run_coroutine_threadsafe(start_service(), self._loop).result()
+
+        _ServerManager.register("studio", callable=lambda: self.service)
+        # Spawned workers inherit this process's authkey, so only they can connect
+        manager = _ServerManager(
+            address=("127.0.0.1", 0),
+            authkey=multiprocessing.current_process().authkey,
+        )
+        self._server = manager.get_server()
+        threading.Thread(
+            target=self._server.serve_forever, name="coordinator", daemon=True
+        ).start()
+        host, port = self._server.address
+        return f"{host}:{port}"
+
+    def stop(self):
+        self.service.stop()
+        if self._server is not None and hasattr(self._server, "stop_event"):
+            self._server.stop_event.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def connect(address: str) -> StudioClient:
+    """Client for the coordinator at ``address`` (``host:port``)."""
+    host, _, port = address.rpartition(":")
+    manager = _ClientManager(
+        address=(host, int(port)), authkey=multiprocessing.current_process().authkey
+    )
+    manager.connect()
+    return StudioClient(manager.studio(), remote=True)
+
+
+# Shared service for the app
+service = StudioService(scheduler, broker, sampler, sweeps, generation)
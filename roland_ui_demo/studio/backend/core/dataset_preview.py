@@ -0,0 +1,340 @@
+"""
+Paged dataset preview for the Training page.
+
+Datasets are opened the way training opens them (``load_source_dataset``),
+which leaves the rows in memory-mapped Arrow files. Every read works on the
+Arrow table directly:
+
+- a page is a zero-copy slice of the table, converted to Python only for the
+  rows and columns asked for, with long values clipped to ``MAX_CELL_CHARS``;
+- a random sample slices out just the sampled rows;
+- a search streams the table in ``SCAN_BATCH_ROWS`` record batches, matching
+  with Arrow's vectorised substring or regex kernels, and returns a cursor
+  to resume from once it has enough matches or has used its time budget;
+- column statistics are one streaming pass per column, cached per dataset
+  fingerprint in memory and under ``<WORKSPACE_DIR>/cache/dataset_stats/``.
+
+So memory stays bounded by the page or batch size whatever the dataset's
+size, and paging costs the same at row 10 as at row 10 million.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+from .preprocess import load_source_dataset
+
+# Datasets kept open (memory-mapped) at once
+MAX_OPEN_DATASETS = 4
+# Rows per page and per random sample
+DEFAULT_PAGE_ROWS = 20
+MAX_PAGE_ROWS = 500
+# Longer string values are clipped in previews
+MAX_CELL_CHARS = 2000
+# Rows per record batch when scanning for search and statistics
+SCAN_BATCH_ROWS = 8192
+# Seconds a search scans before returning what it found with a cursor
+SCAN_TIME_BUDGET = 2.0
+# Values a column's length quantiles are estimated from
+STATS_SAMPLE_SIZE = 100_000
+
+
+def _is_string(arrow_type) -> bool:
+    import pyarrow as pa
+
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_CELL_CHARS:
+        return value[:MAX_CELL_CHARS] + "…"
+    if isinstance(value, list):
+        return [_clip(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clip(v) for k, v in value.items()}
+    return value
+
+
+def _rows(table, indices) -> List[Dict[str, Any]]:
+    return [
+        {"index": int(index), "values": {k: _clip(v) for k, v in row.items()}}
+        for index, row in zip(indices, table.to_pylist())
+    ]
+
+
+class _OpenDataset:
+    __slots__ = ("name", "table", "fingerprint", "columns")
+
+    def __init__(self, name: str, dataset):
+        self.name = name
+        if dataset._indices is not None:
+            # A shuffled or selected view; previews read the rows in order
+            dataset = dataset.flatten_indices()
+        self.table = dataset.data.table
+        self.fingerprint = dataset._fingerprint
+        self.columns = [
+            {"name": field.name, "type": str(field.type)} for field in self.table.schema
+        ]
+
+
+class DatasetPreview:
+    """Pages, samples, searches and column statistics of datasets. Thread-safe."""
+
+    def __init__(self, stats_dir: Path):
+        self.stats_dir = stats_dir
+        self._open: "OrderedDict[str, _OpenDataset]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _dataset(self, name: str) -> _OpenDataset:
+        with self._lock:
+            if name in self._open:
+                self._open.move_to_end(name)
+                return self._open[name]
+        # Outside the lock: the first open of a Hub dataset downloads it
+        opened = _OpenDataset(name, load_source_dataset(name))
+        with self._lock:
+            self._open[name] = opened
+            while len(self._open) > MAX_OPEN_DATASETS:
+                self._open.popitem(last=False)
+        return opened
+
+    def _columns(self, dataset: _OpenDataset, columns: Optional[List[str]]) -> List[str]:
+        names = [c["name"] for c in dataset.columns]
+        if not columns:
+            return names
+        unknown = [c for c in columns if c not in names]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}; {dataset.name} has {names}")
+        return columns
+
+    def _header(self, dataset: _OpenDataset) -> Dict[str, Any]:
+        return {
+            "dataset": dataset.name,
+            "num_rows": dataset.table.num_rows,
+            "columns": dataset.columns,
+        }
+
+    def info(self, name: str) -> Dict[str, Any]:
+        dataset = self._dataset(name)
+        return {
+            **self._header(dataset),
+            "fingerprint": dataset.fingerprint,
+            "size_bytes": dataset.table.nbytes,
+        }
+
+    def rows(
+        self,
+        name: str,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_ROWS,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        One page of rows.
+
+        Raises:
+            ValueError: If ``offset``, ``limit`` or ``columns`` are invalid
+        """
+        if offset < 0 or not 1 <= limit <= MAX_PAGE_ROWS:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_ROWS}")
+        dataset = self._dataset(name)
+        columns = self._columns(dataset, columns)
+        page = dataset.table.slice(offset, limit).select(columns)
+        return {
+            **self._header(dataset),
+            "offset": offset,
+            "limit": limit,
+            "rows": _rows(page, range(offset, offset + page.num_rows)),
+        }
+
+    def sample(
+        self,
+        name: str,
+        n: int = DEFAULT_PAGE_ROWS,
+        seed: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """``n`` distinct rows drawn uniformly at random, in dataset order."""
+        import numpy as np
+        import pyarrow as pa
+
+        if not 1 <= n <= MAX_PAGE_ROWS:
+            raise ValueError(f"n must be between 1 and {MAX_PAGE_ROWS}")
+        dataset = self._dataset(name)
+        columns = self._columns(dataset, columns)
+        num_rows = dataset.table.num_rows
+        rng = np.random.default_rng(seed)
+        indices = np.sort(rng.choice(num_rows, size=min(n, num_rows), replace=False))
+        # One-row slices: take() across a table of many record batches costs
+        # about a hundred times more for a page-sized sample
+        table = dataset.table.select(columns)
+        picked = pa.concat_tables([table.slice(int(i), 1) for i in indices])
+        return {**self._header(dataset), "seed": seed, "rows": _rows(picked, indices)}
+
+    def search(
+        self,
+        name: str,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        columns: Optional[List[str]] = None,
+        start: int = 0,
+        limit: int = DEFAULT_PAGE_ROWS,
+    ) -> Dict[str, Any]:
+        """
+        Rows whose string columns contain ``query`` (or match it as a regex).
+
+        Scans from row ``start`` until ``limit`` matches or ``SCAN_TIME_BUDGET``
+        seconds; ``next_start`` resumes the scan and is None at the end.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if not query:
+            raise ValueError("query must not be empty")
+        if start < 0 or not 1 <= limit <= MAX_PAGE_ROWS:
+            raise ValueError(f"start must be >= 0 and limit between 1 and {MAX_PAGE_ROWS}")
+        dataset = self._dataset(name)
+        columns = self._columns(dataset, columns)
+        searched = [
+            c for c in columns if _is_string(dataset.table.schema.field(c).type)
+        ]
+        if not searched:
+            raise ValueError(f"None of {columns} are string columns")
+        match = pc.match_substring_regex if regex else pc.match_substring
+
+        deadline = time.monotonic() + SCAN_TIME_BUDGET
+        table = dataset.table.slice(start)
+        found, matches = [], 0
+        position = start
+        for batch in table.select(columns).to_batches(max_chunksize=SCAN_BATCH_ROWS):
+            mask = None
+            for column in searched:
+                try:
+                    hits = match(batch.column(column), query, ignore_case=not case_sensitive)
+                except pa.ArrowInvalid as e:
+                    raise ValueError(f"Invalid regex: {e}")
+                mask = hits if mask is None else pc.or_kleene(mask, hits)
+            mask = pc.fill_null(mask, False)
+            rows = pc.indices_nonzero(mask).to_numpy()
+            take = rows[: limit - matches]
+            if len(take):
+                found.append((batch.take(take), position + take))
+                matches += len(take)
+            if len(take) < len(rows):
+                # Stopped inside this batch: resume just after the last match
+                position += int(take[-1]) + 1
+                break
+            position += batch.num_rows
+            if matches >= limit or time.monotonic() > deadline:
+                break
+
+        return {
+            **self._header(dataset),
+            "query": query,
+            "regex": regex,
+            "start": start,
+            "scanned": position - start,
+            "next_start": position if position < dataset.table.num_rows else None,
+            "rows": [row for batch, indices in found for row in _rows(batch, indices)],
+        }
+
+    def stats(self, name: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Per-column statistics, computed once per dataset fingerprint."""
+        dataset = self._dataset(name)
+        columns = self._columns(dataset, columns)
+        cached = self._load_stats(dataset.fingerprint)
+        missing = [c for c in columns if c not in cached]
+        if missing:
+            for column in missing:
+                cached[column] = _column_stats(dataset.table, column)
+            self._save_stats(dataset.fingerprint, cached)
+        return {**self._header(dataset), "stats": {c: cached[c] for c in columns}}
+
+    def _load_stats(self, fingerprint: str) -> Dict[str, Any]:
+        with self._lock:
+            if fingerprint not in self._stats:
+                try:
+                    stats = json.loads((self.stats_dir / f"{fingerprint}.json").read_text())
+                except (OSError, ValueError):
+                    stats = {}
+                self._stats[fingerprint] = stats
+            return dict(self._stats[fingerprint])
+
+    def _save_stats(self, fingerprint: str, stats: Dict[str, Any]):
+        with self._lock:
+            self._stats[fingerprint] = stats
+        self.stats_dir.mkdir(parents=True, exist_ok=True)
+        path = self.stats_dir / f"{fingerprint}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(stats))
+        os.replace(tmp, path)
+
+
+def _column_stats(table, column: str) -> Dict[str, Any]:
+    """One streaming pass over ``column``: counts, and value or length ranges."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrow_type = table.schema.field(column).type
+    if _is_string(arrow_type):
+        kind, measure = "string", pc.utf8_length
+    elif pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        kind, measure = "list", pc.list_value_length
+    elif pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        kind, measure = "numeric", None
+    else:
+        kind, measure = "other", None
+
+    # Every stride-th value is kept for quantiles, at most STATS_SAMPLE_SIZE
+    stride = max(1, math.ceil(table.num_rows / STATS_SAMPLE_SIZE))
+    count = nulls = 0
+    total = 0.0
+    low = high = None
+    sample = []
+    position = 0
+    for batch in table.select([column]).to_batches(max_chunksize=SCAN_BATCH_ROWS):
+        values = batch.column(0)
+        count += len(values)
+        nulls += values.null_count
+        if kind == "other":
+            continue
+        if measure is not None:
+            values = measure(values)
+        values = values.drop_null()
+        if len(values):
+            bounds = pc.min_max(values)
+            low = bounds["min"].as_py() if low is None else min(low, bounds["min"].as_py())
+            high = bounds["max"].as_py() if high is None else max(high, bounds["max"].as_py())
+            total += pc.sum(values).as_py()
+            offset = (-position) % stride
+            sample.append(values.to_numpy(zero_copy_only=False)[offset::stride])
+        position += len(batch)
+
+    stats: Dict[str, Any] = {"type": str(arrow_type), "count": count, "nulls": nulls}
+    if kind == "other" or low is None:
+        return stats
+    prefix = "" if kind == "numeric" else "length_"
+    sample = np.concatenate(sample).astype(np.float64)
+    stats.update(
+        {
+            f"{prefix}min": low,
+            f"{prefix}max": high,
+            f"{prefix}mean": round(total / (count - nulls), 4),
+            f"{prefix}p50": round(float(np.quantile(sample, 0.5)), 4),
+            f"{prefix}p95": round(float(np.quantile(sample, 0.95)), 4),
+        }
+    )
+    return stats
+
+
+# Shared dataset preview for the app
+dataset_preview = DatasetPreview(settings.DATASET_STATS_DIR)
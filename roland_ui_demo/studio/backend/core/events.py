@@ -0,0 +1,182 @@
+"""
+Per-job event channels for push-based status streaming.
+
+A producer publishes events for a job; each event is encoded once into a
+Server-Sent Events frame and appended to a bounded per-job ring. Subscribers
+walk the ring with their own cursor and send the shared frame bytes as-is, so
+fan-out costs no per-subscriber copies and a slow client can never make the
+producer block or the ring grow. A client that falls further behind than the
+ring holds gets a ``lagged`` event and continues from the oldest retained one.
+A ``Last-Event-ID`` from before a server restart is past every current id, so
+that client is sent the retained events again from the start.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+# Events retained per job for resume / slow subscribers
+RETAINED_EVENTS = 1024
+# Seconds between SSE keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+# Event types after which a job's stream ends
+FINAL_STATES = ("completed", "failed", "cancelled")
+
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+# Tells EventSource how long to wait before reconnecting
+RETRY_FRAME = b"retry: 2000\n\n"
+
+
+class Event:
+    """A published event. ``frame`` is the pre-encoded SSE message."""
+
+    __slots__ = ("id", "type", "data", "frame")
+
+    def __init__(self, event_id: int, event_type: str, data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        payload = json.dumps(data, separators=(",", ":"))
+        self.frame = f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+
+
+class EventChannel:
+    """Bounded, append-only event log for one job."""
+
+    def __init__(self, job_id: str, capacity: int = RETAINED_EVENTS):
+        self.job_id = job_id
+        self._events: Deque[Event] = deque(maxlen=capacity)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.closed = False
+        self.last_state: Optional[Dict[str, Any]] = None
+
+        # Waiters are (loop, future) pairs so producers on other threads can wake them
+        self._waiters: List[tuple] = []
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Event:
+        """Append an event and wake subscribers. Safe to call from any thread."""
+        data = {"job_id": self.job_id, "time": time.time(), **data}
+        with self._lock:
+            event = Event(self._next_id, event_type, data)
+            self._next_id += 1
+            self._events.append(event)
+            if event_type == "state":
+                self.last_state = data
+                if data.get("state") in FINAL_STATES:
+                    self.closed = True
+            waiters, self._waiters = self._waiters, []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        return event
+
+    def resume_point(self, after_id: int) -> int:
+        """
+        Cursor a subscriber resuming after ``after_id`` should start from.
+
+        Ids restart at 1 in every server process (and when a discarded
+        channel is recreated), so a cursor past the last event was issued by
+        an earlier one: the subscriber starts over from the oldest retained
+        event instead of waiting for the new ids to pass its old cursor.
+        """
+        return 0 if after_id > self.last_id else after_id
+
+    def since(self, after_id: int):
+        """Return ``(events, dropped)`` for everything newer than ``after_id``."""
+        with self._lock:
+            if not self._events or after_id >= self.last_id:
+                return [], 0
+            oldest = self._events[0].id
+            dropped = max(0, oldest - after_id - 1)
+            start = max(0, after_id + 1 - oldest)
+            return list(itertools.islice(self._events, start, None)), dropped
+
+    async def wait(self, after_id: int, timeout: float):
+        """Wait until an event newer than ``after_id`` exists or ``timeout`` passes."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if after_id < self.last_id or self.closed:
+                return
+            self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EventBroker:
+    """Registry of per-job event channels."""
+
+    def __init__(self, capacity: int = RETAINED_EVENTS):
+        self.capacity = capacity
+        self._channels: Dict[str, EventChannel] = {}
+        self._lock = threading.Lock()
+
+    def channel(self, job_id: str) -> EventChannel:
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is None:
+                channel = self._channels[job_id] = EventChannel(job_id, self.capacity)
+            return channel
+
+    def get(self, job_id: str) -> Optional[EventChannel]:
+        return self._channels.get(job_id)
+
+    def publish(self, job_id: str, event_type: str, data: Dict[str, Any]) -> Event:
+        return self.channel(job_id).publish(event_type, data)
+
+    def discard(self, job_id: str):
+        with self._lock:
+            self._channels.pop(job_id, None)
+
+    async def stream(
+        self, job_id: str, last_event_id: int = 0
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield SSE frames for ``job_id`` starting after ``last_event_id``.
+
+        The generator ends once the job reaches a final state and every
+        retained event has been sent.
+        """
+        channel = self.channel(job_id)
+        cursor = channel.resume_point(last_event_id)
+        yield RETRY_FRAME
+
+        while True:
+            events, dropped = channel.since(cursor)
+            if dropped:
+                lagged = Event(
+                    cursor + dropped, "lagged", {"job_id": job_id, "dropped": dropped}
+                )
+                yield lagged.frame
+            for event in events:
+                # Sending awaits the client, which is our backpressure: a slow
+                # reader only delays itself, and its cursor falls behind the ring.
+                yield event.frame
+                cursor = event.id
+
+            if channel.closed and cursor >= channel.last_id:
+                return
+            if not events:
+                await channel.wait(cursor, KEEPALIVE_INTERVAL)
+                if cursor >= channel.last_id and not channel.closed:
+                    yield KEEPALIVE_FRAME
+
+
+# Shared broker for the app
+broker = EventBroker()
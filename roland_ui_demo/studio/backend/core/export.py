@@ -0,0 +1,663 @@
+"""
+Merge a LoRA adapter into its base model and export the result.
+
+``run_export`` is executed inside a job worker process, like training. A
+naive merge loads the base model, adds the adapter's deltas and saves it,
+holding the whole model in memory at least once. Here it is streamed instead:
+
+- base and adapter safetensors files are memory-mapped and read one tensor
+  at a time, and a large tensor one block of rows at a time;
+- a weight the adapter targets is merged block by block, as
+  ``W[i:j] + scale * B[i:j] @ A`` in float32, and cast back to its dtype;
+  every other tensor is copied through unchanged;
+- tensors keep their names, shapes and dtypes, so the output shards are
+  planned up front: each shard's header is written first and its tensors
+  are appended as they are produced;
+- pages of the inputs are released as soon as they have been consumed.
+
+So the memory the merge works in stays under ``max_memory_mb`` whatever the
+size of the model. With ``format: "gguf"`` the merged model is then converted
+by llama.cpp's ``convert_hf_to_gguf.py``, which reads it lazily as well.
+
+Layout under ``<job_dir>/export/``::
+
+    model-00001-of-00003.safetensors    merged weights
+    model.safetensors.index.json        tensor -> shard (when sharded)
+    config.json, tokenizer files        copied from the base model
+    model-f16.gguf                      with format "gguf"
+"""
+
+import json
+import mmap
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .checkpoints import BLOBS_DIR, CHECKPOINTS_DIR, list_checkpoints
+from .config import settings
+
+# Defaults for the merge's working memory and the size of output shards
+DEFAULT_MAX_MEMORY_MB = 1024
+DEFAULT_MAX_SHARD_MB = 5000
+# Working memory below this cannot hold a useful block of rows
+MIN_MEMORY_MB = 16
+# Tensors copied through unchanged are written in chunks of at most this size
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+# Seconds between progress events
+REPORT_INTERVAL = 1.0
+
+EXPORT_DIR = "export"
+INDEX_FILE = "model.safetensors.index.json"
+ADAPTER_CONFIG = "adapter_config.json"
+# Base model files copied next to the merged weights
+COPIED_SUFFIXES = (".json", ".model", ".txt", ".tiktoken", ".jinja")
+EXPORT_FORMATS = ("safetensors", "gguf")
+GGUF_OUTTYPES = ("f32", "f16", "bf16", "q8_0")
+# How PEFT names adapter tensors: prefix of the wrapped model, LoRA factor suffixes
+PEFT_PREFIX = "base_model.model."
+LORA_SUFFIXES = (
+    ".lora_A.weight",
+    ".lora_B.weight",
+    ".lora_A.default.weight",
+    ".lora_B.default.weight",
+)
+
+# safetensors dtype -> NumPy dtype the raw bytes are viewed as
+DTYPES = {
+    "F64": "<f8",
+    "F32": "<f4",
+    "F16": "<f2",
+    "BF16": "<u2",  # no NumPy bfloat16: merged through float32 by hand
+    "I64": "<i8",
+    "I32": "<i4",
+    "I16": "<i2",
+    "I8": "i1",
+    "U8": "u1",
+    "BOOL": "?",
+    "F8_E4M3": "u1",
+    "F8_E5M2": "u1",
+}
+# Dtypes a LoRA delta can be merged into
+MERGEABLE_DTYPES = ("F64", "F32", "F16", "BF16")
+
+Reporter = Callable[[str, Dict[str, Any]], None]
+
+
+def validate_export_config(config: Dict[str, Any]):
+    """
+    Check an export request before it is queued.
+
+    Raises:
+        ValueError: If the request is incomplete or inconsistent
+    """
+    if not config.get("base_model"):
+        raise ValueError("base_model is required")
+    sources = [k for k in ("adapter_job_id", "adapter_path") if config.get(k)]
+    if len(sources) != 1:
+        raise ValueError("Exactly one of adapter_job_id and adapter_path is required")
+    if config.get("format", "safetensors") not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {EXPORT_FORMATS}")
+    if config.get("gguf_outtype", "f16") not in GGUF_OUTTYPES:
+        raise ValueError(f"gguf_outtype must be one of {GGUF_OUTTYPES}")
+    if float(config.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)) < MIN_MEMORY_MB:
+        raise ValueError(f"max_memory_mb must be at least {MIN_MEMORY_MB}")
+    if float(config.get("max_shard_mb", DEFAULT_MAX_SHARD_MB)) <= 0:
+        raise ValueError("max_shard_mb must be positive")
+    if config.get("format") == "gguf" and not _gguf_converter().exists():
+        raise ValueError(
+            f"GGUF export needs llama.cpp; {_gguf_converter()} was not found "
+            "(set UNSLOTH_LLAMA_CPP_DIR)"
+        )
+
+
+def _gguf_converter() -> Path:
+    return settings.LLAMA_CPP_DIR / "convert_hf_to_gguf.py"
+
+
+# ---- reading safetensors ----
+
+
+class SafetensorsFile:
+    """
+    A memory-mapped safetensors file whose tensors are read as NumPy views.
+
+    Nothing is copied until a view is used, and ``release`` hands the pages
+    of a consumed byte range back to the kernel so they stop counting
+    against this process.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len))
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.metadata: Dict[str, str] = header.pop("__metadata__", None) or {}
+        self.tensors: Dict[str, Dict[str, Any]] = header
+        self._data_start = 8 + header_len
+
+    def names(self) -> List[str]:
+        """Tensor names in the order their data is stored."""
+        return sorted(self.tensors, key=lambda n: self.tensors[n]["data_offsets"][0])
+
+    def nbytes(self, name: str) -> int:
+        begin, end = self.tensors[name]["data_offsets"]
+        return end - begin
+
+    def span(self, name: str) -> Tuple[int, int]:
+        """Absolute byte range of a tensor's data in the file."""
+        begin, end = self.tensors[name]["data_offsets"]
+        return self._data_start + begin, self._data_start + end
+
+    def raw(self, name: str) -> memoryview:
+        start, end = self.span(name)
+        return memoryview(self._mm)[start:end]
+
+    def array(self, name: str):
+        """A read-only view of a tensor, in the NumPy dtype of ``DTYPES``."""
+        import numpy as np
+
+        info = self.tensors[name]
+        dtype = DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"{self.path.name}: {name} has unsupported dtype {info['dtype']}")
+        start, _ = self.span(name)
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=start).reshape(
+            info["shape"]
+        )
+
+    def release(self, start: int, end: int):
+        """Drop this process's pages of ``[start, end)``; they are re-read if touched."""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start -= start % mmap.PAGESIZE
+        if end > start:
+            self._mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            # A view is still referenced (e.g. by the traceback of the error
+            # being raised); the mapping is unmapped when it is collected
+            pass
+
+
+def _to_float32(block, dtype: str):
+    import numpy as np
+
+    if dtype == "BF16":
+        bits = block.astype(np.uint32)
+        bits <<= 16
+        return bits.view(np.float32)
+    return block.astype(np.float32)
+
+
+def _from_float32(block, dtype: str):
+    import numpy as np
+
+    if dtype == "BF16":
+        # Round to nearest even on the 16 bits dropped; in place, as blocks are large
+        bits = block.view(np.uint32)
+        rounding = bits >> 16
+        rounding &= 1
+        rounding += 0x7FFF
+        bits += rounding
+        del rounding
+        bits >>= 16
+        return bits.astype(np.uint16)
+    return block.astype(DTYPES[dtype])
+
+
+# ---- locating the model and adapter ----
+
+
+def _base_files(base_model: str) -> Tuple[Path, List[Path]]:
+    """The base model's directory and safetensors files, downloading a Hub model."""
+    path = Path(base_model).expanduser()
+    if not path.exists():
+        from huggingface_hub import snapshot_download
+
+        print(f"Downloading {base_model} from the Hugging Face Hub")
+        path = Path(
+            snapshot_download(
+                base_model,
+                allow_patterns=["*.safetensors", *(f"*{s}" for s in COPIED_SUFFIXES)],
+            )
+        )
+    if path.is_file():
+        return path.parent, [path]
+    index = path / INDEX_FILE
+    if index.exists():
+        weight_map = json.loads(index.read_text())["weight_map"]
+        files = [path / name for name in sorted(set(weight_map.values()))]
+    else:
+        files = sorted(path.glob("*.safetensors"))
+    if not files:
+        raise FileNotFoundError(f"No safetensors weights in {path}")
+    return path, files
+
+
+def _adapter_files(config: Dict[str, Any], job_dir: Path) -> Tuple[List[Path], Dict[str, Any]]:
+    """The adapter's safetensors files and its LoRA settings."""
+    if config.get("adapter_path"):
+        path = Path(config["adapter_path"]).expanduser()
+        directory = path.parent if path.is_file() else path
+        files = [path] if path.is_file() else sorted(path.glob("*.safetensors"))
+        if not files:
+            raise FileNotFoundError(f"No adapter weights in {path}")
+        settings_path = directory / ADAPTER_CONFIG
+        lora = json.loads(settings_path.read_text()) if settings_path.exists() else {}
+        return files, lora
+
+    # A checkpoint saved by a training job, the latest one unless a step is given
+    source_dir = job_dir.parent / config["adapter_job_id"]
+    manifests = list_checkpoints(source_dir)
+    step = config.get("adapter_step")
+    if step is not None:
+        manifests = [m for m in manifests if m["step"] == int(step)]
+    if not manifests:
+        at = "" if step is None else f" at step {step}"
+        raise FileNotFoundError(f"No checkpoint{at} for job {config['adapter_job_id']}")
+    manifest = manifests[-1]
+    blobs = source_dir / CHECKPOINTS_DIR / BLOBS_DIR
+    files = [blobs / shard["blob"] for shard in manifest["shards"].values()]
+    try:
+        train_config = json.loads((source_dir / "job.json").read_text())["config"]
+    except (OSError, ValueError, KeyError):
+        train_config = {}
+    lora = {
+        "r": train_config.get("lora_r"),
+        "lora_alpha": train_config.get("lora_alpha"),
+        "step": manifest["step"],
+    }
+    return files, lora
+
+
+def _target_name(adapter_name: str, base_names) -> Optional[str]:
+    """The base tensor an adapter tensor's module applies to, if any."""
+    name = adapter_name
+    if name.startswith(PEFT_PREFIX):
+        name = name[len(PEFT_PREFIX) :]
+    for suffix in LORA_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)] + ".weight"
+            break
+    else:
+        if ".modules_to_save." not in name:
+            return None
+        module, _, param = name.partition(".modules_to_save.")
+        name = f"{module}.{param.split('.', 1)[-1]}"
+    # PEFT names are relative to the wrapped model, which may or may not
+    # carry the "model." prefix the checkpoint's names have
+    candidates = [name, f"model.{name}"]
+    if name.startswith("model."):
+        candidates.append(name[len("model.") :])
+    return next((c for c in candidates if c in base_names), None)
+
+
+class _Adapter:
+    """LoRA pairs and replaced modules of an adapter, keyed by base tensor name."""
+
+    def __init__(self, files: List[Path], lora: Dict[str, Any], config: Dict[str, Any], base_names):
+        self.files = [SafetensorsFile(path) for path in files]
+        self.pairs: Dict[str, Dict[str, Tuple[SafetensorsFile, str]]] = {}
+        self.replaced: Dict[str, Tuple[SafetensorsFile, str]] = {}
+        self.skipped: List[str] = []
+        for file in self.files:
+            for name in file.names():
+                target = _target_name(name, base_names)
+                if target is None:
+                    self.skipped.append(name)
+                elif ".lora_A." in name:
+                    self.pairs.setdefault(target, {})["A"] = (file, name)
+                elif ".lora_B." in name:
+                    self.pairs.setdefault(target, {})["B"] = (file, name)
+                else:
+                    self.replaced[target] = (file, name)
+        unpaired = [t for t, pair in self.pairs.items() if len(pair) != 2]
+        if unpaired:
+            raise ValueError(f"LoRA A/B pairs are incomplete for {unpaired[:5]}")
+        lora_targets = [n for n in self.skipped if ".lora_" in n]
+        if lora_targets:
+            raise ValueError(
+                f"{len(lora_targets)} LoRA tensors match no base weight, e.g. {lora_targets[0]}; "
+                "is this the adapter's base model?"
+            )
+        if not self.pairs and not self.replaced:
+            raise ValueError("The adapter has no tensors that apply to this base model")
+
+        rank = config.get("lora_r") or lora.get("r")
+        if rank is None and self.pairs:
+            file, name = next(iter(self.pairs.values()))["A"]
+            rank = file.tensors[name]["shape"][0]
+        rank = int(rank or 1)
+        alpha = float(config.get("lora_alpha") or lora.get("lora_alpha") or rank)
+        rslora = config.get("use_rslora", lora.get("use_rslora", False))
+        self.scale = alpha / (rank ** 0.5 if rslora else rank)
+        self.fan_in_fan_out = bool(config.get("fan_in_fan_out", lora.get("fan_in_fan_out", False)))
+        self.rank, self.alpha, self.step = rank, alpha, lora.get("step")
+
+    def factors(self, target: str):
+        """float32 copies of a target's A (r, in) and B (out, r)."""
+        pair = self.pairs[target]
+        (file_a, name_a), (file_b, name_b) = pair["A"], pair["B"]
+        a = _to_float32(file_a.array(name_a), file_a.tensors[name_a]["dtype"])
+        b = _to_float32(file_b.array(name_b), file_b.tensors[name_b]["dtype"])
+        return a, b
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+
+# ---- writing ----
+
+
+def plan_shards(tensors: List[Tuple[str, int]], max_shard_bytes: int) -> List[List[str]]:
+    """Group ``(name, nbytes)`` in order into shards of at most ``max_shard_bytes``."""
+    shards: List[List[str]] = [[]]
+    size = 0
+    for name, nbytes in tensors:
+        if shards[-1] and size + nbytes > max_shard_bytes:
+            shards.append([])
+            size = 0
+        shards[-1].append(name)
+        size += nbytes
+    return shards
+
+
+def _header(entries: List[Tuple[str, str, List[int], int]], metadata: Dict[str, str]) -> bytes:
+    header: Dict[str, Any] = {"__metadata__": metadata}
+    offset = 0
+    for name, dtype, shape, nbytes in entries:
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    # Pad so the tensor data starts 8-byte aligned
+    encoded += b" " * (-len(encoded) % 8)
+    return len(encoded).to_bytes(8, "little") + encoded
+
+
+class _Progress:
+    def __init__(self, report: Reporter, total_tensors: int, total_bytes: int, shards: int):
+        self.report = report
+        self.total_tensors = total_tensors
+        self.total_bytes = total_bytes
+        self.shards = shards
+        self.tensors = 0
+        self.bytes = 0
+        self.shard = 0
+        self.started = time.perf_counter()
+        self._last = 0.0
+
+    def advance(self, nbytes: int, tensor_done: bool = False):
+        self.bytes += nbytes
+        self.tensors += tensor_done
+        if time.perf_counter() - self._last >= REPORT_INTERVAL:
+            self.emit()
+
+    def emit(self, stage: str = "merge"):
+        self._last = time.perf_counter()
+        elapsed = max(self._last - self.started, 1e-9)
+        self.report(
+            "export",
+            {
+                "stage": stage,
+                "tensors_done": self.tensors,
+                "total_tensors": self.total_tensors,
+                "bytes_done": self.bytes,
+                "total_bytes": self.total_bytes,
+                "shard": self.shard,
+                "shards": self.shards,
+                "bytes_per_sec": round(self.bytes / elapsed, 1),
+                "elapsed_sec": round(elapsed, 2),
+            },
+        )
+
+
+def _copy(out, source: SafetensorsFile, name: str, chunk_bytes: int, progress: _Progress):
+    data = source.raw(name)
+    start, _ = source.span(name)
+    for offset in range(0, len(data), chunk_bytes):
+        chunk = data[offset : offset + chunk_bytes]
+        out.write(chunk)
+        source.release(start + offset, start + offset + len(chunk))
+        progress.advance(len(chunk))
+    data.release()
+
+
+def _merge(out, source: SafetensorsFile, name: str, adapter: _Adapter, budget: int, progress: _Progress):
+    """Write ``source[name]`` with the adapter's delta added, a block of rows at a time."""
+    import numpy as np
+
+    dtype = source.tensors[name]["dtype"]
+    if dtype not in MERGEABLE_DTYPES:
+        raise ValueError(f"Cannot merge a LoRA delta into {name} ({dtype})")
+    weight = source.array(name)
+    try:
+        if weight.ndim != 2:
+            raise ValueError(
+                f"Cannot merge a LoRA delta into {name} with shape {list(weight.shape)}"
+            )
+        a, b = adapter.factors(name)
+        if adapter.fan_in_fan_out:
+            # Weight stored (in, out): its rows take A.T[i:j] @ B.T
+            a, b = b.T, a.T
+        b = b * np.float32(adapter.scale)
+        if b.shape[0] != weight.shape[0] or a.shape[1] != weight.shape[1]:
+            raise ValueError(
+                f"LoRA delta {b.shape[0]}x{a.shape[1]} does not fit {name} {list(weight.shape)}"
+            )
+
+        # Per row: the weight and the delta in float32, the converted input and the output
+        row_bytes = weight.shape[1] * (4 + 4 + 4 + weight.itemsize)
+        rows = max(1, (budget - a.nbytes - b.nbytes) // row_bytes)
+        start, _ = source.span(name)
+        row_stride = weight.shape[1] * weight.itemsize
+        for i in range(0, weight.shape[0], rows):
+            j = min(i + rows, weight.shape[0])
+            block = _to_float32(weight[i:j], dtype)
+            block += b[i:j] @ a
+            out.write(_from_float32(block, dtype).data)
+            del block
+            source.release(start + i * row_stride, start + j * row_stride)
+            progress.advance((j - i) * row_stride)
+    finally:
+        # The view pins the mapping; drop it even on error so close() can unmap
+        del weight
+
+
+def _replace(out, source: SafetensorsFile, name: str, adapter: _Adapter, budget: int, progress: _Progress):
+    """Write the adapter's trained copy of a module in place of the base tensor."""
+    file, adapter_name = adapter.replaced[name]
+    info, base = file.tensors[adapter_name], source.tensors[name]
+    if info["shape"] != base["shape"]:
+        raise ValueError(f"{adapter_name} {info['shape']} does not fit {name} {base['shape']}")
+    value = file.array(adapter_name)
+    value = value.reshape(value.shape[0] if value.ndim else 1, -1)
+    rows = max(1, budget // (value.shape[1] * 12))
+    for i in range(0, value.shape[0], rows):
+        block = _to_float32(value[i : i + rows], info["dtype"])
+        out.write(_from_float32(block, base["dtype"]).data)
+    del value
+    file.release(*file.span(adapter_name))
+    progress.advance(source.nbytes(name))
+
+
+def _shard_name(index: int, count: int) -> str:
+    if count == 1:
+        return "model.safetensors"
+    return f"model-{index + 1:05d}-of-{count:05d}.safetensors"
+
+
+def merge_to_safetensors(
+    base_files: List[Path],
+    adapter: _Adapter,
+    output_dir: Path,
+    max_memory_bytes: int,
+    max_shard_bytes: int,
+    report: Reporter,
+) -> Dict[str, Any]:
+    """Stream ``base_files`` with ``adapter`` merged into shards under ``output_dir``."""
+    bases = [SafetensorsFile(path) for path in base_files]
+    try:
+        owner: Dict[str, SafetensorsFile] = {}
+        order: List[Tuple[str, int]] = []
+        for base in bases:
+            for name in base.names():
+                owner[name] = base
+                order.append((name, base.nbytes(name)))
+        missing = [t for t in list(adapter.pairs) + list(adapter.replaced) if t not in owner]
+        if missing:
+            raise ValueError(f"Adapter targets missing from the base model: {missing[:5]}")
+        metadata = {**bases[0].metadata, "format": bases[0].metadata.get("format", "pt")}
+
+        shards = plan_shards(order, max_shard_bytes)
+        total_bytes = sum(nbytes for _, nbytes in order)
+        progress = _Progress(report, len(order), total_bytes, len(shards))
+        progress.emit()
+        weight_map = {}
+        for index, names in enumerate(shards):
+            progress.shard = index + 1
+            shard_name = _shard_name(index, len(shards))
+            entries = [
+                (n, owner[n].tensors[n]["dtype"], owner[n].tensors[n]["shape"], owner[n].nbytes(n))
+                for n in names
+            ]
+            path = output_dir / shard_name
+            tmp = path.with_name(f".{shard_name}.tmp")
+            with open(tmp, "wb") as out:
+                out.write(_header(entries, metadata))
+                for name in names:
+                    source = owner[name]
+                    if name in adapter.replaced:
+                        _replace(out, source, name, adapter, max_memory_bytes, progress)
+                    elif name in adapter.pairs:
+                        _merge(out, source, name, adapter, max_memory_bytes, progress)
+                    else:
+                        _copy(out, source, name, min(max_memory_bytes, COPY_CHUNK_BYTES), progress)
+                    progress.advance(0, tensor_done=True)
+                    weight_map[name] = shard_name
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, path)
+            print(f"Wrote {shard_name} ({len(names)} tensors)")
+
+        if len(shards) > 1:
+            index = {"metadata": {"total_size": total_bytes}, "weight_map": weight_map}
+            (output_dir / INDEX_FILE).write_text(json.dumps(index, indent=2))
+        progress.emit()
+        return {
+            "tensors": len(order),
+            "merged_tensors": len(adapter.pairs),
+            "replaced_tensors": len(adapter.replaced),
+            "bytes": total_bytes,
+            "shards": len(shards),
+            "merge_seconds": round(time.perf_counter() - progress.started, 2),
+            "bytes_per_sec": round(total_bytes / max(time.perf_counter() - progress.started, 1e-9), 1),
+        }
+    finally:
+        for base in bases:
+            base.close()
+
+
+def _copy_model_files(base_dir: Path, output_dir: Path):
+    """Config and tokenizer files go next to the merged weights."""
+    for path in base_dir.iterdir():
+        if (
+            path.is_file()
+            and path.suffix in COPIED_SUFFIXES
+            and path.name not in (INDEX_FILE, ADAPTER_CONFIG)
+        ):
+            shutil.copy2(path, output_dir / path.name)
+
+
+def _convert_to_gguf(output_dir: Path, outtype: str) -> Path:
+    gguf_path = output_dir / f"model-{outtype}.gguf"
+    subprocess.run(
+        [
+            sys.executable,
+            str(_gguf_converter()),
+            str(output_dir),
+            "--outfile",
+            str(gguf_path),
+            "--outtype",
+            outtype,
+        ],
+        check=True,
+    )
+    return gguf_path
+
+
+def run_export(
+    job_id: str, config: Dict[str, Any], report: Reporter, job_dir: Path
+) -> Dict[str, Any]:
+    """
+    Run an export job: merge an adapter into its base model and save it.
+
+    Args:
+        job_id: Id of the job being run
+        config: Export request (see ``validate_export_config``)
+        report: Callback forwarding ``(event_type, data)`` to the API process
+        job_dir: Per-job directory under the workspace
+
+    Returns:
+        Summary stored on the job record when it completes
+    """
+    validate_export_config(config)
+    output_dir = job_dir / EXPORT_DIR
+    # A retried attempt starts over; drop what an interrupted one left behind
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+
+    base_dir, base_files = _base_files(config["base_model"])
+    adapter_files, lora = _adapter_files(config, job_dir)
+    base_names = set()
+    for path in base_files:
+        base = SafetensorsFile(path)
+        base_names.update(base.tensors)
+        base.close()
+    adapter = _Adapter(adapter_files, lora, config, base_names)
+    if adapter.skipped:
+        print(f"Skipping {len(adapter.skipped)} adapter tensors with no base weight: {adapter.skipped[:5]}")
+    print(
+        f"Merging {len(adapter.pairs)} LoRA pairs (r={adapter.rank}, alpha={adapter.alpha}) "
+        f"into {len(base_files)} base shards"
+    )
+
+    try:
+        result = merge_to_safetensors(
+            base_files,
+            adapter,
+            output_dir,
+            int(float(config.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)) * 1024 * 1024),
+            int(float(config.get("max_shard_mb", DEFAULT_MAX_SHARD_MB)) * 1024 * 1024),
+            report,
+        )
+    finally:
+        adapter.close()
+    _copy_model_files(base_dir, output_dir)
+    result.update(
+        {
+            "output_dir": str(output_dir),
+            "adapter_step": adapter.step,
+            "scale": adapter.scale,
+            "skipped_adapter_tensors": len(adapter.skipped),
+        }
+    )
+
+    if config.get("format") == "gguf":
+        report("export", {"stage": "gguf"})
+        started = time.perf_counter()
+        gguf_path = _convert_to_gguf(output_dir, config.get("gguf_outtype", "f16"))
+        result["gguf"] = str(gguf_path)
+        result["gguf_bytes"] = gguf_path.stat().st_size
+        result["gguf_seconds"] = round(time.perf_counter() - started, 2)
+
+    return result
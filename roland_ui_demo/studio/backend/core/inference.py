@@ -0,0 +1,872 @@
+"""
+Streaming text generation with dynamic batching.
+
+Requests for the same model share one ``GenerationEngine``. Each step of its
+loop is a single forward pass over every active sequence: prompts admitted
+this step are prefilled while running sequences decode their next token in
+the same pass, so the weights are read once per step rather than once per
+request. When the engine is idle, the first request waits ``BATCH_WINDOW``
+for others to arrive before the first pass.
+
+Work is shared three ways:
+
+- identical deterministic requests (greedy, or sampled with the same seed)
+  attach to the sequence already producing that output;
+- a prompt starting with a prefix seen before (a shared system prompt or
+  few-shot header) copies that prefix's keys and values from the
+  ``PrefixCache`` and only prefills the rest;
+- everything else shares forward passes through batching.
+
+At most ``MAX_QUEUED`` requests wait per model; beyond that ``submit`` raises
+``QueueFull``. A request whose client goes away, or that is cancelled, leaves
+the batch at the next step.
+
+The model is ``TinyLM``, a small decoder-only transformer in NumPy with random
+weights seeded from the model name. Like the simulated trainer its output is
+meaningless, but its compute and memory behave like a real model's, so the
+batching, caching and metrics can be exercised and benchmarked on CPU. NumPy
+is imported by the code that needs it, so it loads with the first request
+rather than at server startup.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import string
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter, OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from .blocking import run_blocking
+from .events import KEEPALIVE_FRAME, KEEPALIVE_INTERVAL
+from .instrumentation import LATENCY_BUCKETS
+
+# Model used when a request does not name one
+DEFAULT_MODEL = "simulated-tiny"
+# Shape of the simulated model
+SIM_D_MODEL = 512
+SIM_LAYERS = 4
+SIM_HEADS = 8
+SIM_D_FF = 2048
+MAX_CONTEXT = 2048
+
+# Sequences decoded together in one forward pass
+MAX_BATCH_SIZE = 16
+# Prompt tokens prefilled per forward pass, across the batch
+MAX_PREFILL_TOKENS = 512
+# Requests waiting for a batch slot per model before new ones are refused
+MAX_QUEUED = 64
+# Seconds an idle engine waits for more requests before its first pass
+BATCH_WINDOW = 0.01
+# Models kept loaded, and seconds an unused one stays loaded
+MAX_MODELS = 2
+IDLE_UNLOAD = 300.0
+
+# Request limits and defaults
+MAX_NEW_TOKENS = 1024
+DEFAULT_MAX_TOKENS = 128
+DEFAULT_TEMPERATURE = 0.7
+
+# Prompt prefixes are cached in blocks of this many tokens, up to this many bytes
+PREFIX_BLOCK = 16
+PREFIX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Upper bounds of the batch size histogram
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+# Seconds of history behind the tokens-per-second gauge
+THROUGHPUT_WINDOW = 10.0
+
+
+class QueueFull(RuntimeError):
+    """Too many requests are already waiting; the client should retry later."""
+
+
+class UnknownModel(LookupError):
+    """The request names a model that is neither simulated nor in the model catalog."""
+
+
+class CharTokenizer:
+    """Printable-ASCII characters plus BOS and EOS; other characters become "?"."""
+
+    def __init__(self):
+        self.chars = [c for c in string.printable if c not in "\r\x0b\x0c"]
+        self.index = {c: i for i, c in enumerate(self.chars)}
+        self.unknown = self.index["?"]
+        self.bos = len(self.chars)
+        self.eos = self.bos + 1
+        self.vocab_size = self.bos + 2
+
+    def encode(self, text: str) -> List[int]:
+        return [self.bos] + [self.index.get(c, self.unknown) for c in text]
+
+    def decode(self, ids: List[int]) -> str:
+        return "".join(self.chars[i] for i in ids if i < self.bos)
+
+
+class KVCache:
+    """Keys and values of one sequence, for every layer; grows as it decodes."""
+
+    __slots__ = ("keys", "values", "length")
+
+    def __init__(self, layers: int, heads: int, head_dim: int, capacity: int = 64):
+        import numpy as np
+
+        self.keys = np.zeros((layers, heads, capacity, head_dim), np.float32)
+        self.values = np.zeros_like(self.keys)
+        self.length = 0
+
+    def reserve(self, extra: int):
+        import numpy as np
+
+        needed = self.length + extra
+        capacity = self.keys.shape[2]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name in ("keys", "values"):
+            old = getattr(self, name)
+            new = np.zeros(old.shape[:2] + (capacity,) + old.shape[3:], np.float32)
+            new[:, :, : self.length] = old[:, :, : self.length]
+            setattr(self, name, new)
+
+    def load(self, keys: "np.ndarray", values: "np.ndarray"):
+        """Start from a cached prefix's keys and values."""
+        length = keys.shape[2]
+        self.reserve(length - self.length)
+        self.keys[:, :, :length] = keys
+        self.values[:, :, :length] = values
+        self.length = length
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.values.nbytes
+
+
+def _rms_norm(x: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    return x / np.sqrt(np.mean(x * x, axis=-1, keepdims=True) + 1e-6)
+
+
+def _softmax(x: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    x = np.exp(x - x.max(axis=-1, keepdims=True))
+    return x / x.sum(axis=-1, keepdims=True)
+
+
+class TinyLM:
+    """
+    Decoder-only transformer in NumPy with random weights.
+
+    ``forward`` takes a ragged batch, any number of new tokens per sequence,
+    so prefill and decode share one pass: the projections and MLP run as one
+    matrix product over all the batch's tokens, and only attention is done
+    per sequence against its own ``KVCache``.
+    """
+
+    def __init__(self, name: str, vocab_size: int):
+        import numpy as np
+
+        seed = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "little")
+        rng = np.random.default_rng(seed)
+        d, ff = SIM_D_MODEL, SIM_D_FF
+
+        def weight(*shape):
+            return (rng.standard_normal(shape) / np.sqrt(shape[0])).astype(np.float32)
+
+        self.name = name
+        self.heads = SIM_HEADS
+        self.head_dim = d // SIM_HEADS
+        self.embed = rng.standard_normal((vocab_size, d)).astype(np.float32)
+        self.positions = (0.1 * rng.standard_normal((MAX_CONTEXT, d))).astype(np.float32)
+        self.layers = [
+            (weight(d, 3 * d), weight(d, d), weight(d, ff), weight(ff, d))
+            for _ in range(SIM_LAYERS)
+        ]
+
+    def new_cache(self) -> KVCache:
+        return KVCache(len(self.layers), self.heads, self.head_dim)
+
+    def forward(self, tokens: List[List[int]], caches: List[KVCache]) -> "np.ndarray":
+        """Append ``tokens[i]`` to ``caches[i]``; returns each sequence's next-token logits."""
+        import numpy as np
+
+        lengths = [len(t) for t in tokens]
+        starts = [cache.length for cache in caches]
+        for cache, n in zip(caches, lengths):
+            cache.reserve(n)
+        bounds = np.cumsum([0] + lengths)
+        positions = np.concatenate([np.arange(s, s + n) for s, n in zip(starts, lengths)])
+        x = self.embed[np.concatenate(tokens)] + self.positions[positions]
+
+        heads, head_dim = self.heads, self.head_dim
+        scale = 1.0 / np.sqrt(head_dim)
+        for layer, (w_qkv, w_out, w_up, w_down) in enumerate(self.layers):
+            q, k, v = np.split(_rms_norm(x) @ w_qkv, 3, axis=1)
+            attended = np.empty_like(q)
+            for i, cache in enumerate(caches):
+                lo, hi, start = bounds[i], bounds[i + 1], starts[i]
+                n, end = hi - lo, starts[i] + hi - lo
+                cache.keys[layer, :, start:end] = k[lo:hi].reshape(n, heads, head_dim).transpose(1, 0, 2)
+                cache.values[layer, :, start:end] = v[lo:hi].reshape(n, heads, head_dim).transpose(1, 0, 2)
+                qh = q[lo:hi].reshape(n, heads, head_dim).transpose(1, 0, 2)
+                scores = qh @ cache.keys[layer, :, :end].transpose(0, 2, 1) * scale
+                if n > 1:
+                    causal = np.arange(end)[None, :] > (start + np.arange(n))[:, None]
+                    scores = np.where(causal, -np.inf, scores)
+                out = _softmax(scores) @ cache.values[layer, :, :end]
+                attended[lo:hi] = out.transpose(1, 0, 2).reshape(n, heads * head_dim)
+            x = x + attended @ w_out
+            x = x + np.maximum(_rms_norm(x) @ w_up, 0) @ w_down
+
+        for cache, n in zip(caches, lengths):
+            cache.length += n
+        return _rms_norm(x[bounds[1:] - 1]) @ self.embed.T
+
+
+def _sample(logits: "np.ndarray", temperature: float, top_k: int, rng) -> int:
+    import numpy as np
+
+    if temperature <= 0:
+        return int(np.argmax(logits))
+    logits = logits.astype(np.float64) / temperature
+    if 0 < top_k < len(logits):
+        kth = np.partition(logits, -top_k)[-top_k]
+        logits = np.where(logits < kth, -np.inf, logits)
+    probs = np.exp(logits - logits.max())
+    return int(rng.choice(len(probs), p=probs / probs.sum()))
+
+
+class PrefixCache:
+    """
+    Keys and values of prompt prefixes, shared across requests and sequences.
+
+    Prefixes are cut at ``PREFIX_BLOCK`` token boundaries and identified by a
+    hash chained over their blocks, so a prompt finds the longest cached
+    prefix it shares with any earlier one. Least recently used entries are
+    dropped beyond ``max_bytes``. Thread-safe.
+    """
+
+    def __init__(self, max_bytes: int = PREFIX_CACHE_BYTES, block: int = PREFIX_BLOCK):
+        self.max_bytes = max_bytes
+        self.block = block
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_tokens = 0
+        # Entry key -> (keys, values, block hashes); every block hash points at
+        # an entry holding that prefix, with the prefix's length
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, np.ndarray, List[bytes]]]" = OrderedDict()
+        self._index: Dict[bytes, Tuple[bytes, int]] = {}
+        self._lock = threading.Lock()
+
+    def _hashes(self, model: str, tokens: List[int]) -> List[bytes]:
+        chain = hashlib.blake2b(model.encode(), digest_size=16)
+        hashes = []
+        for start in range(0, len(tokens) - self.block + 1, self.block):
+            chain.update(array("i", tokens[start : start + self.block]).tobytes())
+            hashes.append(chain.copy().digest())
+        return hashes
+
+    def lookup(self, model: str, tokens: List[int]):
+        """``(length, keys, values)`` of the longest cached prefix of ``tokens``."""
+        # At least one token must be left to prefill, to get logits from
+        hashes = self._hashes(model, tokens[:-1])
+        with self._lock:
+            for digest in reversed(hashes):
+                found = self._index.get(digest)
+                if found is None:
+                    continue
+                key, length = found
+                keys, values, _ = self._entries[key]
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.hit_tokens += length
+                return length, keys[:, :, :length], values[:, :, :length]
+            self.misses += 1
+        return 0, None, None
+
+    def store(self, model: str, tokens: List[int], cache: KVCache):
+        """Keep the keys and values of ``tokens``' longest whole-block prefix."""
+        hashes = self._hashes(model, tokens[: cache.length])
+        if not hashes:
+            return
+        key = hashes[-1]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+        length = len(hashes) * self.block
+        keys = cache.keys[:, :, :length].copy()
+        values = cache.values[:, :, :length].copy()
+        with self._lock:
+            self._entries[key] = (keys, values, hashes)
+            self.bytes += keys.nbytes + values.nbytes
+            for i, digest in enumerate(hashes):
+                self._index[digest] = (key, (i + 1) * self.block)
+            while self.bytes > self.max_bytes and self._entries:
+                old, (old_keys, old_values, old_hashes) = self._entries.popitem(last=False)
+                self.bytes -= old_keys.nbytes + old_values.nbytes
+                for digest in old_hashes:
+                    if self._index.get(digest, (None,))[0] == old:
+                        del self._index[digest]
+
+
+class Sequence:
+    """One decoding stream in a batch; identical requests may share it."""
+
+    def __init__(self, prompt: List[int], params: Dict[str, Any]):
+        self.prompt = prompt
+        self.params = params
+        self._rng = None
+        self.generated: List[int] = []
+        self.feed: List[int] = []
+        self.cache: Optional[KVCache] = None
+        self.readers = 0
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cached_tokens = 0
+        self.created = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.batch_total = 0
+        self.steps = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def rng(self):
+        # Created on first use, by sampling on the blocking pool, so a request
+        # arriving before the model is loaded never imports NumPy on the loop
+        if self._rng is None:
+            import numpy as np
+
+            self._rng = np.random.default_rng(self.params["seed"])
+        return self._rng
+
+    @property
+    def finished(self) -> bool:
+        return self.finish_reason is not None
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, reason: str, error: Optional[str] = None):
+        self.finish_reason = reason
+        self.error = error
+        self.finished_at = time.perf_counter()
+        self.cache = None
+        self.notify()
+
+    async def wait(self, seen: int, timeout: float):
+        """Wait until there are more than ``seen`` tokens, the end, or ``timeout``."""
+        if len(self.generated) > seen or self.finished:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class GenerationRequest:
+    """A client's view of a sequence."""
+
+    __slots__ = ("id", "model", "sequence", "shared", "cancelled")
+
+    def __init__(self, model: str, sequence: Sequence, shared: bool):
+        self.id = f"gen_{uuid.uuid4().hex[:12]}"
+        self.model = model
+        self.sequence = sequence
+        self.shared = shared
+        self.cancelled = False
+
+
+class GenerationMetrics:
+    """Counters behind the ``generate`` Prometheus metrics. Updated on the loop."""
+
+    def __init__(self):
+        self.requests: Counter = Counter()
+        self.shared = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.generated_tokens = 0
+        self.passes = 0
+        self.batch_counts = [0] * (len(BATCH_BUCKETS) + 1)
+        self.ttft_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.ttft_total = 0.0
+        self.ttft_count = 0
+        self._recent: Deque[Tuple[float, int]] = deque()
+
+    def record_pass(self, batch_size: int, tokens: int):
+        now = time.monotonic()
+        self.passes += 1
+        self.batch_counts[bisect.bisect_left(BATCH_BUCKETS, batch_size)] += 1
+        self.generated_tokens += tokens
+        self._recent.append((now, tokens))
+        while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW:
+            self._recent.popleft()
+
+    def record_ttft(self, seconds: float):
+        self.ttft_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.ttft_total += seconds
+        self.ttft_count += 1
+
+    def tokens_per_second(self) -> float:
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        return sum(n for t, n in self._recent if t >= cutoff) / THROUGHPUT_WINDOW
+
+
+def _frame(event_type: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class GenerationEngine:
+    """Batches the sequences of one model. Runs on the service's event loop."""
+
+    def __init__(self, model_name: str, service: "GenerationService"):
+        self.model_name = model_name
+        self.service = service
+        self.model: Optional[TinyLM] = None
+        self.pending: Deque[Sequence] = deque()
+        self.active: List[Sequence] = []
+        # Deterministic request key -> the sequence producing its output
+        self.shared: Dict[Tuple, Sequence] = {}
+        self.closed = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.pending or self.active)
+
+    def add(self, sequence: Sequence):
+        if len(self.pending) >= MAX_QUEUED:
+            raise QueueFull(
+                f"{len(self.pending)} requests are already waiting for {self.model_name}"
+            )
+        self.pending.append(sequence)
+        self._wake.set()
+
+    def close(self):
+        self.closed = True
+        self._task.cancel()
+        for sequence in itertools.chain(self.pending, self.active):
+            sequence.finish("error", "Model unloaded")
+        self.pending.clear()
+        self.active.clear()
+
+    async def _run(self):
+        try:
+            self.model = await run_blocking(
+                TinyLM, self.model_name, self.service.tokenizer.vocab_size
+            )
+        except Exception as e:
+            print(f"Failed to load {self.model_name}: {e}")
+            # Not unload(): the waiting requests keep this engine busy, and a
+            # dead engine left in place would swallow every later request
+            if self.service.engines.get(self.model_name) is self:
+                del self.service.engines[self.model_name]
+            self.closed = True
+            for sequence in self.pending:
+                sequence.finish("error", f"Failed to load {self.model_name}: {e}")
+            self.pending.clear()
+            self.shared.clear()
+            return
+
+        while True:
+            if not self.busy:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), IDLE_UNLOAD)
+                except asyncio.TimeoutError:
+                    self.service.unload(self.model_name)
+                    return
+                # Let requests arriving together start in the same pass
+                await asyncio.sleep(BATCH_WINDOW)
+            self._admit()
+            if self.active:
+                await self._step()
+
+    def _admit(self):
+        cache = self.service.prefix_cache
+        while self.pending and len(self.active) < self.service.max_batch_size:
+            sequence = self.pending.popleft()
+            if sequence.readers == 0:
+                self._finish(sequence, "cancelled")
+                continue
+            sequence.cache = self.model.new_cache()
+            length, keys, values = cache.lookup(self.model_name, sequence.prompt)
+            if length:
+                sequence.cache.load(keys, values)
+            sequence.cached_tokens = length
+            sequence.feed = sequence.prompt[length:]
+            self.active.append(sequence)
+
+    def _forward(self, batch: List[Sequence], chunks: List[List[int]]) -> List[Optional[int]]:
+        """
+        One forward pass and sampling step. Runs on the blocking pool.
+
+        Returns each sequence's next token, or None while its prompt is still
+        being prefilled.
+        """
+        logits = self.model.forward(chunks, [s.cache for s in batch])
+        tokens = []
+        for sequence, chunk, row in zip(batch, chunks, logits):
+            if len(chunk) < len(sequence.feed):
+                tokens.append(None)
+                continue
+            if not sequence.generated:
+                # The prompt was just prefilled; later prompts can start from it
+                self.service.prefix_cache.store(
+                    self.model_name, sequence.prompt, sequence.cache
+                )
+            params = sequence.params
+            tokens.append(_sample(row, params["temperature"], params["top_k"], sequence.rng))
+        return tokens
+
+    async def _step(self):
+        batch = list(self.active)
+        # Long prompts are prefilled a chunk per pass, so they do not hold up
+        # the tokens of sequences already decoding
+        chunks, budget = [], MAX_PREFILL_TOKENS
+        for sequence in batch:
+            chunk = sequence.feed
+            if len(chunk) > 1:
+                chunk = chunk[: max(1, budget)]
+                budget -= len(chunk)
+            chunks.append(chunk)
+        try:
+            tokens = await run_blocking(self._forward, batch, chunks)
+        except Exception as e:
+            print(f"Generation step failed for {self.model_name}: {e}")
+            for sequence in batch:
+                self._finish(sequence, "error", str(e))
+            self.active.clear()
+            return
+
+        now = time.perf_counter()
+        metrics = self.service.metrics
+        eos = self.service.tokenizer.eos
+        emitted = 0
+        for sequence, chunk, token in zip(batch, chunks, tokens):
+            sequence.steps += 1
+            sequence.batch_total += len(batch)
+            if token is None:
+                sequence.feed = sequence.feed[len(chunk) :]
+                if sequence.readers == 0:
+                    self._finish(sequence, "cancelled")
+                continue
+            if sequence.first_token_at is None:
+                sequence.first_token_at = now
+                metrics.record_ttft(now - sequence.created)
+            if sequence.readers == 0:
+                self._finish(sequence, "cancelled")
+            elif token == eos:
+                self._finish(sequence, "stop")
+            else:
+                sequence.generated.append(token)
+                sequence.feed = [token]
+                emitted += 1
+                if (
+                    len(sequence.generated) >= sequence.params["max_tokens"]
+                    or sequence.cache.length >= MAX_CONTEXT
+                ):
+                    self._finish(sequence, "length")
+                else:
+                    sequence.notify()
+        metrics.record_pass(len(batch), emitted)
+        self.active = [s for s in self.active if not s.finished]
+
+    def _finish(self, sequence: Sequence, reason: str, error: Optional[str] = None):
+        key = sequence.params.get("share_key")
+        if key is not None and self.shared.get(key) is sequence:
+            del self.shared[key]
+        sequence.finish(reason, error)
+
+
+class GenerationService:
+    """Generation requests, their engines and metrics. Runs on the service's event loop."""
+
+    def __init__(
+        self,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        prefix_cache_bytes: int = PREFIX_CACHE_BYTES,
+    ):
+        self.max_batch_size = max_batch_size
+        self.tokenizer = CharTokenizer()
+        self.prefix_cache = PrefixCache(prefix_cache_bytes)
+        self.metrics = GenerationMetrics()
+        self.engines: Dict[str, GenerationEngine] = {}
+        self._requests: Dict[str, GenerationRequest] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        for engine in list(self.engines.values()):
+            engine.close()
+        self.engines.clear()
+
+    def unload(self, model: str):
+        engine = self.engines.get(model)
+        if engine is not None and not engine.busy:
+            del self.engines[model]
+            engine.closed = True
+
+    def _parse(self, request: Dict[str, Any]) -> Tuple[str, List[int], Dict[str, Any]]:
+        if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+            raise ValueError('Expected {"prompt": "...", ...}')
+        model = str(request.get("model") or DEFAULT_MODEL)
+        try:
+            max_tokens = int(request.get("max_tokens", DEFAULT_MAX_TOKENS))
+            temperature = float(request.get("temperature", DEFAULT_TEMPERATURE))
+            top_k = int(request.get("top_k") or 0)
+            seed = None if request.get("seed") is None else int(request["seed"])
+        except (TypeError, ValueError):
+            raise ValueError("max_tokens, top_k and seed must be integers, temperature a number")
+        if not 1 <= max_tokens <= MAX_NEW_TOKENS:
+            raise ValueError(f"max_tokens must be between 1 and {MAX_NEW_TOKENS}")
+        if temperature < 0 or top_k < 0 or (seed is not None and seed < 0):
+            raise ValueError("temperature, top_k and seed must not be negative")
+        prompt = self.tokenizer.encode(request["prompt"])
+        if len(prompt) + max_tokens > MAX_CONTEXT:
+            raise ValueError(
+                f"Prompt ({len(prompt)} tokens) plus max_tokens exceeds the "
+                f"{MAX_CONTEXT}-token context"
+            )
+        params = {
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_k": top_k,
+            "seed": seed,
+            # Requests that must produce the same output can share one sequence
+            "share_key": (
+                (tuple(prompt), max_tokens, temperature, top_k, seed)
+                if temperature == 0 or seed is not None
+                else None
+            ),
+        }
+        return model, prompt, params
+
+    def _engine(self, model: str) -> GenerationEngine:
+        engine = self.engines.get(model)
+        if engine is not None and not engine.closed:
+            return engine
+        if len(self.engines) >= MAX_MODELS:
+            idle = [name for name, e in self.engines.items() if not e.busy]
+            if not idle:
+                raise QueueFull(f"{MAX_MODELS} other models are busy")
+            self.engines.pop(idle[0]).close()
+        engine = self.engines[model] = GenerationEngine(model, self)
+        return engine
+
+    def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a generation request. Returns what the stream's "start" event carries.
+
+        Raises:
+            ValueError: If the request is malformed
+            QueueFull: If the model's queue is full
+        """
+        model, prompt, params = self._parse(request)
+        engine = self._engine(model)
+        key = params["share_key"]
+        sequence = engine.shared.get(key) if key is not None else None
+        shared = sequence is not None
+        if not shared:
+            sequence = Sequence(prompt, params)
+            try:
+                engine.add(sequence)
+            except QueueFull:
+                self.metrics.requests["rejected"] += 1
+                raise
+            if key is not None:
+                engine.shared[key] = sequence
+        sequence.readers += 1
+
+        handle = GenerationRequest(model, sequence, shared)
+        self._requests[handle.id] = handle
+        self.metrics.prompt_tokens += len(prompt)
+        self.metrics.shared += shared
+        return {
+            "request_id": handle.id,
+            "model": model,
+            "shared": shared,
+            "prompt_tokens": len(prompt),
+            "queue_position": None if shared else len(engine.pending) - 1,
+        }
+
+    def cancel(self, request_id: str) -> bool:
+        handle = self._requests.get(request_id)
+        if handle is None:
+            return False
+        handle.cancelled = True
+        self._release(handle)
+        # Wake the request's stream so it ends now
+        handle.sequence.notify()
+        return True
+
+    def _release(self, handle: GenerationRequest):
+        if self._requests.pop(handle.id, None) is None:
+            return
+        sequence = handle.sequence
+        sequence.readers -= 1
+        if handle.cancelled or not sequence.finished:
+            self.metrics.requests["cancelled"] += 1
+        else:
+            self.metrics.requests[sequence.finish_reason] += 1
+            if not handle.shared:
+                self.metrics.cached_tokens += sequence.cached_tokens
+
+    def _frames(self, handle: GenerationRequest, seen: int) -> Tuple[List[bytes], int, bool]:
+        sequence = handle.sequence
+        frames = []
+        new = sequence.generated[seen:]
+        if new:
+            frames.append(
+                _frame(
+                    "token",
+                    {"index": seen, "count": len(new), "text": self.tokenizer.decode(new)},
+                )
+            )
+            seen += len(new)
+        if handle.cancelled:
+            frames.append(_frame("done", {"finish_reason": "cancelled"}))
+            return frames, seen, True
+        if sequence.finished:
+            frames.append(_frame("done", self._summary(handle)))
+            return frames, seen, True
+        return frames, seen, False
+
+    def _summary(self, handle: GenerationRequest) -> Dict[str, Any]:
+        sequence = handle.sequence
+        summary: Dict[str, Any] = {
+            "finish_reason": sequence.finish_reason,
+            "shared": handle.shared,
+            "usage": {
+                "prompt_tokens": len(sequence.prompt),
+                "cached_prompt_tokens": sequence.cached_tokens,
+                "completion_tokens": len(sequence.generated),
+            },
+        }
+        if sequence.error:
+            summary["error"] = sequence.error
+        if sequence.first_token_at is not None:
+            summary["ttft_ms"] = round(1000 * (sequence.first_token_at - sequence.created), 1)
+            decode_time = sequence.finished_at - sequence.first_token_at
+            if decode_time > 0 and len(sequence.generated) > 1:
+                summary["tokens_per_sec"] = round(
+                    (len(sequence.generated) - 1) / decode_time, 1
+                )
+            summary["mean_batch_size"] = round(sequence.batch_total / sequence.steps, 2)
+        return summary
+
+    async def stream(self, request_id: str) -> AsyncIterator[bytes]:
+        """SSE frames for a submitted request. Leaving early cancels it."""
+        handle = self._requests.get(request_id)
+        if handle is None:
+            return
+        seen = 0
+        try:
+            while True:
+                frames, seen, done = self._frames(handle, seen)
+                for frame in frames:
+                    yield frame
+                if done:
+                    return
+                await handle.sequence.wait(seen, KEEPALIVE_INTERVAL)
+                if len(handle.sequence.generated) == seen and not (
+                    handle.sequence.finished or handle.cancelled
+                ):
+                    yield KEEPALIVE_FRAME
+        finally:
+            self._release(handle)
+
+    def poll(self, request_id: str, seen: int, timeout: float):
+        """
+        Blocking read of a request's frames after ``seen`` tokens, for remote clients.
+
+        Returns ``(frames, seen, done)``.
+        """
+        handle = self._requests.get(request_id)
+        if handle is None:
+            return [], seen, True
+        asyncio.run_coroutine_threadsafe(
+            handle.sequence.wait(seen, timeout), self._loop
+        ).result()
+        frames, seen, done = self._frames(handle, seen)
+        if done:
+            self._loop.call_soon_threadsafe(self._release, handle)
+        return frames, seen, done
+
+    def metric_lines(self, namespace: str) -> List[str]:
+        """Prometheus lines for ``MetricsRegistry.add_collector``."""
+        ns = namespace
+        m = self.metrics
+        lines = [
+            f"# HELP {ns}_generate_requests_total Generation requests, by outcome.",
+            f"# TYPE {ns}_generate_requests_total counter",
+        ]
+        for outcome, count in sorted(m.requests.items()):
+            lines.append(f'{ns}_generate_requests_total{{outcome="{outcome}"}} {count}')
+        lines += [
+            f"# HELP {ns}_generate_shared_requests_total Requests served by another request's sequence.",
+            f"# TYPE {ns}_generate_shared_requests_total counter",
+            f"{ns}_generate_shared_requests_total {m.shared}",
+            f"# HELP {ns}_generate_prompt_tokens_total Prompt tokens submitted.",
+            f"# TYPE {ns}_generate_prompt_tokens_total counter",
+            f"{ns}_generate_prompt_tokens_total {m.prompt_tokens}",
+            f"# HELP {ns}_generate_cached_prompt_tokens_total Prompt tokens taken from the prefix cache.",
+            f"# TYPE {ns}_generate_cached_prompt_tokens_total counter",
+            f"{ns}_generate_cached_prompt_tokens_total {m.cached_tokens}",
+            f"# HELP {ns}_generate_tokens_total Tokens generated.",
+            f"# TYPE {ns}_generate_tokens_total counter",
+            f"{ns}_generate_tokens_total {m.generated_tokens}",
+            f"# HELP {ns}_generate_tokens_per_second Tokens generated per second, last {THROUGHPUT_WINDOW:g}s.",
+            f"# TYPE {ns}_generate_tokens_per_second gauge",
+            f"{ns}_generate_tokens_per_second {m.tokens_per_second():.1f}",
+            f"# HELP {ns}_generate_queued Requests waiting for a batch slot.",
+            f"# TYPE {ns}_generate_queued gauge",
+            f"{ns}_generate_queued {sum(len(e.pending) for e in self.engines.values())}",
+            f"# HELP {ns}_generate_active Sequences in the running batches.",
+            f"# TYPE {ns}_generate_active gauge",
+            f"{ns}_generate_active {sum(len(e.active) for e in self.engines.values())}",
+            f"# HELP {ns}_generate_prefix_cache_bytes Bytes of cached prompt prefixes.",
+            f"# TYPE {ns}_generate_prefix_cache_bytes gauge",
+            f"{ns}_generate_prefix_cache_bytes {self.prefix_cache.bytes}",
+            f"# HELP {ns}_generate_batch_size Sequences per forward pass.",
+            f"# TYPE {ns}_generate_batch_size histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(BATCH_BUCKETS, m.batch_counts):
+            cumulative += count
+            lines.append(f'{ns}_generate_batch_size_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{ns}_generate_batch_size_bucket{{le="+Inf"}} {m.passes}')
+        lines.append(f"{ns}_generate_batch_size_count {m.passes}")
+        lines += [
+            f"# HELP {ns}_generate_time_to_first_token_seconds Time from request to first token.",
+            f"# TYPE {ns}_generate_time_to_first_token_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, m.ttft_counts):
+            cumulative += count
+            lines.append(
+                f'{ns}_generate_time_to_first_token_seconds_bucket{{le="{bound}"}} {cumulative}'
+            )
+        lines += [
+            f'{ns}_generate_time_to_first_token_seconds_bucket{{le="+Inf"}} {m.ttft_count}',
+            f"{ns}_generate_time_to_first_token_seconds_sum {m.ttft_total:.6f}",
+            f"{ns}_generate_time_to_first_token_seconds_count {m.ttft_count}",
+        ]
+        return lines
+
+
+# Shared generation service for the app
+generation = GenerationService()
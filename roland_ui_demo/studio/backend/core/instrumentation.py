@@ -0,0 +1,274 @@
+"""
+Request instrumentation and Prometheus exposition.
+
+``InstrumentationMiddleware`` is a plain ASGI middleware (no
+``BaseHTTPMiddleware``, so streaming responses pass through untouched). For
+every HTTP request it records, labelled by method and route template:
+
+- a latency histogram (time to the last body chunk; SSE streams are counted
+  but not timed, since their duration is the client's session length),
+- request counts by status code, server errors, and response body bytes,
+- the number of requests in flight.
+
+Everything runs on the event loop thread, so updates are plain dict and list
+operations with no locking. Catch-all routes (static files, SPA fallback) are
+labelled with the concrete path while it resolves, so the metrics show which
+files dominate, up to ``MAX_PATH_LABELS`` distinct paths per route.
+``MetricsRegistry.render`` produces the Prometheus text format, followed by
+the lines of any collectors registered with ``add_collector`` (such as the
+event-loop lag monitor). With several server workers, ``merge_expositions``
+combines every worker's render into one, labelled by worker.
+"""
+
+import bisect
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Distinct concrete paths kept per catch-all route before folding into the template
+MAX_PATH_LABELS = 200
+
+UNMATCHED_ROUTE = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, str]
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """HTTP request metrics for one app."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.errors: Dict[Labels, int] = {}
+        self.response_bytes: Dict[Labels, int] = {}
+        self.latency: Dict[Labels, _Histogram] = {}
+        self._path_labels: Dict[str, set] = {}
+        self._collectors: List[Callable[[str], List[str]]] = []
+
+    def add_collector(self, collector: Callable[[str], List[str]]):
+        """Append ``collector(namespace)``'s exposition lines to every render."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def route_label(self, scope, status: int) -> str:
+        route = scope.get("route")
+        template = getattr(route, "path", None)
+        if template is None:
+            return UNMATCHED_ROUTE
+        if ":path}" not in template or status >= 400:
+            return template
+        seen = self._path_labels.setdefault(template, set())
+        path = scope["path"]
+        if path in seen:
+            return path
+        if len(seen) < MAX_PATH_LABELS:
+            seen.add(path)
+            return path
+        return template
+
+    def record(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        size: int,
+        seconds: float,
+        streamed: bool,
+    ):
+        key = (method, route)
+        self.requests[(method, route, status)] = (
+            self.requests.get((method, route, status), 0) + 1
+        )
+        self.response_bytes[key] = self.response_bytes.get(key, 0) + size
+        if status >= 500:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if not streamed:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} {kind}")
+
+        header("http_requests_in_flight", "gauge", "Requests currently being served.")
+        lines.append(f"{ns}_http_requests_in_flight {self.in_flight}")
+
+        header("http_requests_total", "counter", "Requests served, by status code.")
+        for (method, route, status), value in sorted(self.requests.items()):
+            lines.append(
+                f'{ns}_http_requests_total{{method="{method}",route="{_escape(route)}",'
+                f'status="{status}"}} {value}'
+            )
+
+        header("http_errors_total", "counter", "Requests answered with a 5xx status.")
+        for (method, route), value in sorted(self.errors.items()):
+            lines.append(
+                f'{ns}_http_errors_total{{method="{method}",route="{_escape(route)}"}} {value}'
+            )
+
+        header("http_response_bytes_total", "counter", "Response body bytes sent.")
+        for (method, route), value in sorted(self.response_bytes.items()):
+            lines.append(
+                f'{ns}_http_response_bytes_total{{method="{method}",'
+                f'route="{_escape(route)}"}} {value}'
+            )
+
+        header(
+            "http_request_duration_seconds",
+            "histogram",
+            "Time from request start to the last response byte.",
+        )
+        for (method, route), histogram in sorted(self.latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{ns}_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'{ns}_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                f"{histogram.count}"
+            )
+            lines.append(
+                f"{ns}_http_request_duration_seconds_sum{{{labels}}} {histogram.total:.6f}"
+            )
+            lines.append(
+                f"{ns}_http_request_duration_seconds_count{{{labels}}} {histogram.count}"
+            )
+
+        for collector in self._collectors:
+            lines.extend(collector(ns))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _with_label(sample: str, name: str, value: str) -> str:
+    """An exposition sample line with the label ``name="value"`` added first."""
+    metric, brace, rest = sample.partition("{")
+    if brace:
+        return f'{metric}{{{name}="{_escape(value)}",{rest}'
+    metric, _, rest = sample.partition(" ")
+    return f'{metric}{{{name}="{_escape(value)}"}} {rest}'
+
+
+def merge_expositions(expositions: Dict[str, str], label: str = "worker") -> str:
+    """
+    Several processes' renders as one exposition.
+
+    Every sample gets ``label`` set to its process's key, so each process's
+    counters stay separate, monotonic series that queries can ``sum()``.
+    Each metric family keeps one HELP and TYPE line, followed by the samples
+    of every process, as the text format requires.
+    """
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for key, text in expositions.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                family = line.split(" ", 3)[2]
+                meta, _ = families.setdefault(family, ([], []))
+                if line not in meta:
+                    meta.append(line)
+            elif line and family is not None:
+                families[family][1].append(_with_label(line, label, key))
+    lines: List[str] = []
+    for meta, samples in families.values():
+        lines.extend(meta)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware feeding a ``MetricsRegistry``."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        started = time.perf_counter()
+        status = 500
+        size = 0
+        streamed = False
+        finished = None
+
+        async def instrumented_send(message):
+            nonlocal status, size, streamed, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        streamed = True
+                        break
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = time.perf_counter()
+            await send(message)
+
+        registry.in_flight += 1
+        try:
+            await self.app(scope, receive, instrumented_send)
+        finally:
+            registry.in_flight -= 1
+            registry.record(
+                scope["method"],
+                registry.route_label(scope, status),
+                status,
+                size,
+                (finished or time.perf_counter()) - started,
+                streamed,
+            )
+
+
+# Shared registry for the app
+http_metrics = MetricsRegistry("unsloth")
@@ -0,0 +1,411 @@
+"""
+Queryable history of every job, in SQLite.
+
+``job.json`` stays the source of truth for each job; the scheduler mirrors
+every record it persists into one row of ``<WORKSPACE_DIR>/jobs.db``, and
+rebuilds the table from the ``job.json`` files at startup. The history page
+then never has to read thousands of JSON files:
+
+- the database is in WAL mode, so reads run concurrently with the scheduler's
+  writes and never wait for them;
+- rows are indexed by submit time, alone and after state, model, dataset and
+  type, so a page of any filtered list is one index range scan;
+- pages are addressed by a keyset cursor (the last row's submit time and id),
+  so page 500 costs the same as page 1 and rows arriving meanwhile neither
+  shift nor repeat what the client has seen.
+
+Server processes other than the coordinator only read, and open their own
+connection, like every other file the workers serve from the workspace.
+"""
+
+import base64
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import settings
+
+# Bump to rebuild the table from job.json files on the next start
+SCHEMA_VERSION = 1
+# Rows per page by default, and at most
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Milliseconds a writer waits for another writer's lock before failing
+BUSY_TIMEOUT_MS = 5000
+
+# Columns filtered with ?<name>=<value>, each backed by an index
+FILTER_COLUMNS = ("state", "model", "dataset", "type")
+# Columns summaries can be grouped by
+GROUP_COLUMNS = ("model", "dataset", "state", "type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    state TEXT NOT NULL,
+    model TEXT,
+    dataset TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER,
+    step INTEGER,
+    total_steps INTEGER,
+    loss REAL,
+    tokens_per_sec REAL,
+    final_loss REAL,
+    runtime_sec REAL,
+    message TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted_at, job_id);
+"""
+# One index per filter column, ordered for pages and carrying what summaries
+# aggregate, so a summary grouped by the column reads only the index
+INDEX = (
+    "CREATE INDEX IF NOT EXISTS jobs_{0} ON jobs "
+    "({0}, submitted_at, job_id, state, tokens_per_sec, final_loss, runtime_sec)"
+)
+
+# Running totals per group value, kept by triggers on ``jobs``, so a summary
+# without filters reads one row per group instead of every job
+TOTALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_totals (
+    dim TEXT NOT NULL,
+    key TEXT NOT NULL,
+    jobs INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    active INTEGER NOT NULL,
+    tokens_per_sec_sum REAL NOT NULL,
+    tokens_per_sec_n INTEGER NOT NULL,
+    final_loss_sum REAL NOT NULL,
+    final_loss_n INTEGER NOT NULL,
+    runtime_sec_sum REAL NOT NULL,
+    runtime_sec_n INTEGER NOT NULL,
+    PRIMARY KEY (dim, key)
+) WITHOUT ROWID;
+"""
+# Columns summaries average, over completed jobs
+AVERAGED = ("tokens_per_sec", "final_loss", "runtime_sec")
+TOTAL_COUNTS = ("jobs", "completed", "failed", "active") + tuple(
+    f"{c}_{part}" for c in AVERAGED for part in ("sum", "n")
+)
+
+COLUMNS = (
+    "job_id",
+    "type",
+    "state",
+    "model",
+    "dataset",
+    "submitted_at",
+    "started_at",
+    "finished_at",
+    "attempts",
+    "step",
+    "total_steps",
+    "loss",
+    "tokens_per_sec",
+    "final_loss",
+    "runtime_sec",
+    "message",
+    "error",
+)
+
+UPSERT = (
+    f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+    f"ON CONFLICT(job_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[1:])
+)
+
+
+def _row(record: Dict[str, Any]) -> Tuple:
+    """A job record flattened into the table's columns."""
+    config = record.get("config") or {}
+    progress = record.get("progress") or {}
+    result = record.get("result") or {}
+    return (
+        record["job_id"],
+        record.get("type", "train"),
+        record["state"],
+        config.get("model_name") or config.get("base_model"),
+        config.get("dataset"),
+        record["submitted_at"],
+        record.get("started_at"),
+        record.get("finished_at"),
+        record.get("attempts"),
+        progress.get("step"),
+        progress.get("total_steps"),
+        progress.get("loss"),
+        progress.get("tokens_per_sec"),
+        result.get("final_loss"),
+        result.get("runtime_sec"),
+        record.get("message"),
+        record.get("error"),
+    )
+
+
+def _contributions(row: str) -> List[str]:
+    """What one job adds to each of TOTAL_COUNTS, as SQL over the columns of ``row``."""
+    done = f"{row}.state = 'completed'"
+    terms = [
+        "1",
+        done,
+        f"{row}.state = 'failed'",
+        f"{row}.state IN ('queued', 'running')",
+    ]
+    for column in AVERAGED:
+        terms.append(f"CASE WHEN {done} THEN IFNULL({row}.{column}, 0) ELSE 0 END")
+        terms.append(f"{done} AND {row}.{column} IS NOT NULL")
+    return terms
+
+
+def _totals_change(row: str, sign: str) -> str:
+    """SQL adding (``sign`` "+") or removing ("-") trigger row ``row`` in job_totals."""
+    terms = ", ".join(f"{sign}({term})" for term in _contributions(row))
+    return "\n".join(
+        f"INSERT INTO job_totals (dim, key, {', '.join(TOTAL_COUNTS)}) "
+        f"VALUES ('{dim}', IFNULL({row}.{dim}, ''), {terms}) "
+        "ON CONFLICT (dim, key) DO UPDATE SET "
+        + ", ".join(f"{c} = {c} + excluded.{c}" for c in TOTAL_COUNTS)
+        + ";"
+        for dim in GROUP_COLUMNS
+    )
+
+
+# Triggers keeping job_totals in step with jobs
+TRIGGERS = {
+    "jobs_totals_insert": f"AFTER INSERT ON jobs BEGIN {_totals_change('NEW', '+')} END",
+    "jobs_totals_delete": f"AFTER DELETE ON jobs BEGIN {_totals_change('OLD', '-')} END",
+    "jobs_totals_update": (
+        f"AFTER UPDATE ON jobs BEGIN "
+        f"{_totals_change('OLD', '-')} {_totals_change('NEW', '+')} END"
+    ),
+}
+
+
+def _totals_from_jobs(dim: str) -> str:
+    """SQL recomputing one group column's totals from the whole jobs table."""
+    sums = ", ".join(f"SUM({term})" for term in _contributions("jobs"))
+    return (
+        f"INSERT INTO job_totals (dim, key, {', '.join(TOTAL_COUNTS)}) "
+        f"SELECT '{dim}', IFNULL({dim}, ''), {sums} FROM jobs GROUP BY IFNULL({dim}, '')"
+    )
+
+
+def encode_cursor(submitted_at: float, job_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{submitted_at!r}|{job_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """
+    Raises:
+        ValueError: If ``cursor`` was not returned by ``JobHistory.page``
+    """
+    try:
+        submitted_at, _, job_id = base64.urlsafe_b64decode(cursor).decode().partition("|")
+        return float(submitted_at), job_id
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+class JobHistory:
+    """SQLite mirror of job records, with paged and aggregated queries. Thread-safe."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # One connection per thread: the pump thread writes, request threads read
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._ready_lock:
+            if not self._ready:
+                self._create()
+                self._ready = True
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        # WAL: committed writes are fsynced at checkpoints rather than every
+        # commit; job.json stays the durable copy
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        return conn
+
+    def _create(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            # Persistent: every later connection to the file is in WAL mode too
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS jobs")
+                conn.execute("DROP TABLE IF EXISTS job_totals")
+            conn.executescript(SCHEMA + TOTALS_SCHEMA)
+            for column in FILTER_COLUMNS:
+                conn.execute(INDEX.format(column))
+            for name, body in TRIGGERS.items():
+                conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---- writes (coordinator only) ----
+
+    def upsert(self, record: Dict[str, Any]):
+        """Insert or update the row of one job record."""
+        conn = self._connect()
+        with conn:
+            conn.execute(UPSERT, _row(record))
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]):
+        """Replace every row with ``records`` in one transaction."""
+        conn = self._connect()
+        with conn:
+            # Explicitly, so the trigger DDL below is part of the transaction too
+            conn.execute("BEGIN")
+            # Per-row triggers would update the totals once per job and group
+            # column; load without them and total each column in one pass
+            for name in TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute("DELETE FROM jobs")
+            conn.execute("DELETE FROM job_totals")
+            conn.executemany(UPSERT, (_row(r) for r in records))
+            for dim in GROUP_COLUMNS:
+                conn.execute(_totals_from_jobs(dim))
+            for name, body in TRIGGERS.items():
+                conn.execute(f"CREATE TRIGGER {name} {body}")
+
+    # ---- reads ----
+
+    def _where(self, filters: Dict[str, Any], since: Optional[float], until: Optional[float]):
+        clauses, params = [], []
+        for column in FILTER_COLUMNS:
+            value = filters.get(column)
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("submitted_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("submitted_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        **filters: Any,
+    ) -> Dict[str, Any]:
+        """
+        Jobs newest first, ``limit`` at a time.
+
+        Args:
+            cursor: ``next_cursor`` of the previous page, or None for the first
+            limit: Rows per page
+            since: Only jobs submitted at or after this time (epoch seconds)
+            until: Only jobs submitted before this time
+            **filters: Exact matches on ``FILTER_COLUMNS``
+
+        Raises:
+            ValueError: If ``limit`` or ``cursor`` are invalid
+        """
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        clauses, params = self._where(filters, since, until)
+        if cursor:
+            clauses.append("(submitted_at, job_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM jobs {where} ORDER BY submitted_at DESC, job_id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        jobs = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = jobs[-1]
+            next_cursor = encode_cursor(last["submitted_at"], last["job_id"])
+        return {"jobs": jobs, "next_cursor": next_cursor}
+
+    def summary(
+        self,
+        group_by: str = "model",
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        **filters: Any,
+    ) -> Dict[str, Any]:
+        """
+        Job counts and averages per ``group_by`` value.
+
+        Throughput and loss are averaged over completed jobs only, each job
+        counting its last reported tokens/sec. Without filters this reads the
+        trigger-maintained totals; with them, the index on the first filter.
+
+        Raises:
+            ValueError: If ``group_by`` is not one of ``GROUP_COLUMNS``
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {GROUP_COLUMNS}")
+        clauses, params = self._where(filters, since, until)
+        if clauses:
+            groups = self._scan_summary(group_by, clauses, params)
+        else:
+            groups = self._totals_summary(group_by)
+        for group in groups:
+            for column in AVERAGED:
+                key = f"avg_{column}"
+                if group[key] is not None:
+                    group[key] = round(group[key], 4)
+        return {
+            "group_by": group_by,
+            "total": sum(g["jobs"] for g in groups),
+            "groups": groups,
+        }
+
+    def _totals_summary(self, group_by: str) -> List[Dict[str, Any]]:
+        averages = ", ".join(
+            f"{c}_sum / NULLIF({c}_n, 0) AS avg_{c}" for c in AVERAGED
+        )
+        rows = self._connect().execute(
+            f"""
+            SELECT NULLIF(key, '') AS key, jobs, completed, failed, active, {averages}
+            FROM job_totals
+            WHERE dim = ? AND jobs > 0
+            ORDER BY jobs DESC
+            """,
+            (group_by,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _scan_summary(self, group_by: str, clauses: List[str], params: List[Any]) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            f"""
+            SELECT {group_by} AS key,
+                   COUNT(*) AS jobs,
+                   SUM(state = 'completed') AS completed,
+                   SUM(state = 'failed') AS failed,
+                   SUM(state IN ('queued', 'running')) AS active,
+                   AVG(CASE WHEN state = 'completed' THEN tokens_per_sec END) AS avg_tokens_per_sec,
+                   AVG(CASE WHEN state = 'completed' THEN final_loss END) AS avg_final_loss,
+                   AVG(CASE WHEN state = 'completed' THEN runtime_sec END) AS avg_runtime_sec
+            FROM jobs WHERE {' AND '.join(clauses)}
+            GROUP BY {group_by}
+            ORDER BY jobs DESC
+            """,
+            params,
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+# Shared job history for the app
+job_history = JobHistory(settings.JOB_HISTORY_DB)
@@ -0,0 +1,431 @@
+"""
+Per-job logs, stored in rotating segments and read by byte offset.
+
+Inside the job worker, ``capture_output`` points file descriptors 1 and 2 at
+pipes, so everything the job prints (Python, C extensions and the processes
+it starts alike) lands in ``JobLogWriter`` together with ``logging`` records
+and the job's own events. Each record is one JSON line::
+
+    {"time": 1760000000.123, "level": "INFO", "source": "stdout", "message": "..."}
+
+The log is addressed by a byte offset that keeps growing across rotations:
+``<job_dir>/logs/`` holds segments named after the offset of their first byte,
+and the oldest are deleted once the job's logs exceed ``MAX_LOG_BYTES``. A
+reader seeks straight to the segment and position of the offset it was given,
+and ``tail_log`` reads backwards from the end, so each request costs time in
+proportion to what it returns, however long the job has been running.
+"""
+
+import bisect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+
+LOGS_DIR = "logs"
+SEGMENT_SUFFIX = ".jsonl"
+# A new segment is started once the current one reaches this size
+SEGMENT_BYTES = 16 * 1024 * 1024
+# Oldest segments are deleted beyond this much log per job
+MAX_LOG_BYTES = 256 * 1024 * 1024
+# Output without a newline is cut into records of at most this size
+MAX_LINE_BYTES = 64 * 1024
+
+# Bytes returned per read by default, and at most
+READ_LIMIT = 256 * 1024
+MAX_READ_LIMIT = 4 * 1024 * 1024
+# Bytes read per step while scanning backwards for tail
+TAIL_BLOCK = 64 * 1024
+# A filtered tail gives up after scanning this much without enough matches
+TAIL_SCAN_BYTES = 32 * 1024 * 1024
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+_LINE_BREAK = re.compile(rb"[\r\n]")
+
+
+def _segments(log_dir: Path) -> List[Tuple[int, Path]]:
+    """(first offset, path) of each segment, oldest first."""
+    if not log_dir.is_dir():
+        return []
+    return sorted(
+        (int(path.stem), path)
+        for path in log_dir.glob(f"*{SEGMENT_SUFFIX}")
+        if path.stem.isdigit()
+    )
+
+
+def _segment_name(base: int) -> str:
+    return f"{base:020d}{SEGMENT_SUFFIX}"
+
+
+class JobLogWriter:
+    """
+    Appends records to a job's log, rotating and pruning segments. Thread-safe.
+
+    Args:
+        job_dir: Per-job directory under the workspace
+        segment_bytes: Size at which a new segment is started
+        max_bytes: Total size above which the oldest segments are deleted
+    """
+
+    def __init__(
+        self,
+        job_dir: Path,
+        segment_bytes: int = SEGMENT_BYTES,
+        max_bytes: int = MAX_LOG_BYTES,
+    ):
+        self.dir = job_dir / LOGS_DIR
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # A retried job appends to the log of its earlier attempts
+        segments = _segments(self.dir)
+        self._base = segments[-1][0] if segments else 0
+        # Unbuffered, so every record is visible to readers as soon as it is written
+        self._file = open(self.dir / _segment_name(self._base), "a+b", buffering=0)
+        self._size = self._file.seek(0, os.SEEK_END)
+        if self._size and os.pread(self._file.fileno(), 1, self._size - 1) != b"\n":
+            # The previous attempt died mid-record; end it so the next one parses
+            self._size += self._file.write(b"\n")
+
+    def write(self, source: str, level: str, message: str, **fields: Any):
+        record = {
+            "time": round(time.time(), 3),
+            "level": level,
+            "source": source,
+            "message": message,
+            **fields,
+        }
+        line = json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._size and self._size + len(line) > self.segment_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _rotate(self):
+        self._file.close()
+        self._base += self._size
+        self._size = 0
+        self._file = open(self.dir / _segment_name(self._base), "ab", buffering=0)
+
+        segments = _segments(self.dir)
+        total = sum(path.stat().st_size for _, path in segments)
+        for _, path in segments[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+class _LogHandler(logging.Handler):
+    def __init__(self, log: JobLogWriter):
+        super().__init__()
+        self.log = log
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message += "\n" + logging.Formatter().formatException(record.exc_info)
+            self.log.write("logging", record.levelname, message, logger=record.name)
+        except Exception:
+            self.handleError(record)
+
+
+class _FdCapture:
+    """Sends whatever is written to a file descriptor into the log, line by line."""
+
+    def __init__(self, fd: int, source: str, level: str, log: JobLogWriter):
+        self.fd = fd
+        self._saved = os.dup(fd)
+        read_end, write_end = os.pipe()
+        os.dup2(write_end, fd)
+        os.close(write_end)
+        self._thread = threading.Thread(
+            target=self._pump,
+            args=(read_end, source, level, log),
+            name=f"log-{source}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _pump(read_end: int, source: str, level: str, log: JobLogWriter):
+        pending = b""
+        while True:
+            chunk = os.read(read_end, 65536)
+            if not chunk:
+                break
+            # Carriage returns count as line ends, so progress bars are kept
+            # as a series of updates rather than one endless line
+            *lines, pending = _LINE_BREAK.split(pending + chunk)
+            if len(pending) > MAX_LINE_BYTES:
+                lines.append(pending)
+                pending = b""
+            for line in lines:
+                if line.strip():
+                    log.write(source, level, line.decode("utf-8", "replace"))
+        if pending.strip():
+            log.write(source, level, pending.decode("utf-8", "replace"))
+        os.close(read_end)
+
+    def close(self):
+        # Restoring the descriptor closes the pipe's last write end we hold, so
+        # the pump sees EOF after draining (children still holding it may not exit)
+        os.dup2(self._saved, self.fd)
+        os.close(self._saved)
+        self._thread.join(timeout=5)
+
+
+class OutputCapture:
+    """Everything a job worker prints or logs, routed into its ``JobLogWriter``."""
+
+    def __init__(self, log: JobLogWriter):
+        self.log = log
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        self._captures = [
+            _FdCapture(1, "stdout", "INFO", log),
+            _FdCapture(2, "stderr", "WARNING", log),
+        ]
+        # Without a terminal these would buffer whole blocks before each write
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+
+        self._handler = _LogHandler(log)
+        root = logging.getLogger()
+        root.addHandler(self._handler)
+        if root.level > logging.INFO:
+            root.setLevel(logging.INFO)
+
+    def close(self):
+        """Flush and restore the worker's output, then close the log."""
+        logging.getLogger().removeHandler(self._handler)
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        for capture in self._captures:
+            capture.close()
+        self.log.close()
+
+
+def capture_output(job_dir: Path) -> OutputCapture:
+    """Start capturing this process's output into ``<job_dir>/logs``."""
+    return OutputCapture(JobLogWriter(job_dir))
+
+
+# ---- reading ----
+
+
+def _compile_filters(
+    level: Optional[str], grep: Optional[str]
+) -> Tuple[int, Optional[Pattern]]:
+    min_level = 0
+    if level:
+        if level.upper() not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        min_level = LEVELS[level.upper()]
+    try:
+        pattern = re.compile(grep) if grep else None
+    except re.error as e:
+        raise ValueError(f"Invalid grep pattern: {e}")
+    return min_level, pattern
+
+
+def _decode(line: bytes, offset: int) -> Dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        # Not written by JobLogWriter (or cut short by a crash); keep it as text
+        record = {
+            "time": None,
+            "level": "INFO",
+            "source": "raw",
+            "message": line.decode("utf-8", "replace"),
+        }
+    record["offset"] = offset
+    return record
+
+
+def _matches(record: Dict[str, Any], min_level: int, pattern: Optional[Pattern]) -> bool:
+    if LEVELS.get(record.get("level"), 0) < min_level:
+        return False
+    return pattern is None or pattern.search(str(record.get("message", ""))) is not None
+
+
+def _payload(offset: int, next_offset: int, end: int, truncated: bool, records):
+    return {
+        "offset": offset,
+        "next_offset": next_offset,
+        "end_offset": max(end, next_offset),
+        "truncated": truncated,
+        "records": records,
+    }
+
+
+def read_log(
+    job_dir: Path,
+    offset: int = 0,
+    limit: int = READ_LIMIT,
+    level: Optional[str] = None,
+    grep: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Complete records in up to ``limit`` bytes of log from ``offset`` on.
+
+    Filters are applied to the bytes read, so a filtered read may return few
+    records and should be repeated from ``next_offset`` until it reaches
+    ``end_offset``. ``truncated`` is set when ``offset`` was already rotated
+    away and reading started from the oldest byte still kept.
+
+    Raises:
+        ValueError: If ``level`` or ``grep`` is invalid
+    """
+    min_level, pattern = _compile_filters(level, grep)
+    limit = max(1, min(limit, MAX_READ_LIMIT))
+    segments = _segments(job_dir / LOGS_DIR)
+    if not segments:
+        return _payload(0, 0, 0, False, [])
+
+    bases = [base for base, _ in segments]
+    try:
+        end = bases[-1] + segments[-1][1].stat().st_size
+    except FileNotFoundError:
+        end = bases[-1]
+    truncated = offset < bases[0]
+    start = position = min(max(offset, bases[0]), end)
+
+    records = []
+    index = bisect.bisect_right(bases, position) - 1
+    while position - start < limit and index < len(segments):
+        base, path = segments[index]
+        try:
+            with open(path, "rb") as f:
+                f.seek(position - base)
+                data = f.read(limit - (position - start))
+                if position == start and b"\n" not in data:
+                    # The first record is longer than limit; return it whole
+                    # rather than nothing, or the reader could never advance
+                    data += f.readline()
+        except FileNotFoundError:
+            # Rotated away while we were reading; carry on from the next segment
+            truncated = True
+            index += 1
+            if index < len(segments):
+                position = max(position, bases[index])
+            continue
+
+        # Only whole records; a partial last line is returned by the next read
+        complete = data[: data.rfind(b"\n") + 1]
+        cursor = position
+        for line in complete.splitlines():
+            record = _decode(line, cursor)
+            cursor += len(line) + 1
+            if _matches(record, min_level, pattern):
+                records.append(record)
+        position += len(complete)
+        if index + 1 < len(segments) and position >= bases[index + 1]:
+            index += 1
+        else:
+            break
+    return _payload(start, position, end, truncated, records)
+
+
+def _aligned_size(path: Path) -> int:
+    """Size of ``path`` up to its last complete record."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        # A record longer than a block has no newline in the last one
+        while end > 0:
+            start = max(0, end - TAIL_BLOCK)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _lines_backwards(path: Path, base: int, length: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, line) for the records in a segment's first ``length`` bytes, newest first."""
+    with open(path, "rb") as f:
+        position = length
+        carry = b""  # end of a line whose start is in an earlier block
+        while position > 0:
+            step = min(TAIL_BLOCK, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + carry
+            parts = block[:-1].split(b"\n")
+            if position > 0:
+                carry = parts[0] + b"\n"
+                parts = parts[1:]
+            cursor = position + len(block)
+            for line in reversed(parts):
+                cursor -= len(line) + 1
+                yield base + cursor, line
+
+
+def tail_log(
+    job_dir: Path,
+    lines: int = 100,
+    level: Optional[str] = None,
+    grep: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    The last ``lines`` records matching the filters, oldest first.
+
+    Continue with ``read_log`` from ``next_offset`` to follow new output.
+    ``truncated`` is set when a filtered scan gave up before finding enough
+    matching records.
+
+    Raises:
+        ValueError: If ``level`` or ``grep`` is invalid
+    """
+    min_level, pattern = _compile_filters(level, grep)
+    segments = _segments(job_dir / LOGS_DIR)
+    if not segments or lines <= 0:
+        return _payload(0, 0, 0, False, [])
+
+    last_base, last_path = segments[-1]
+    try:
+        end = last_base + _aligned_size(last_path)
+    except FileNotFoundError:
+        end = last_base
+    matched: List[Dict[str, Any]] = []
+    offset = end
+    truncated = False
+    for base, path in reversed(segments):
+        length = end - base if base == last_base else None
+        try:
+            if length is None:
+                length = path.stat().st_size
+            for offset, line in _lines_backwards(path, base, length):
+                record = _decode(line, offset)
+                if _matches(record, min_level, pattern):
+                    matched.append(record)
+                    if len(matched) >= lines:
+                        break
+                if end - offset >= TAIL_SCAN_BYTES:
+                    truncated = True
+                    break
+        except FileNotFoundError:
+            break  # rotated away, and so is everything older
+        if len(matched) >= lines or truncated:
+            break
+    matched.reverse()
+    return _payload(offset, end, end, truncated, matched)
@@ -0,0 +1,580 @@
+"""
+Training job scheduler.
+
+Every job is a directory ``<WORKSPACE_DIR>/jobs/<job_id>/`` holding a
+``job.json`` record that is rewritten atomically on each state change, which
+makes the directory itself the durable queue. Jobs run in their own spawned
+worker processes, at most ``MAX_CONCURRENT_JOBS`` at a time, and report
+progress back over a multiprocessing queue that a pump thread drains into the
+job records and the event broker.
+
+On startup, queued jobs are re-enqueued in submission order and jobs that were
+running when the server died are re-queued (or failed once they have used up
+their attempts).
+"""
+
+import asyncio
+import copy
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; two servers there are not kept apart
+    fcntl = None
+
+from .config import settings
+from .events import FINAL_STATES, EventBroker, broker
+from .job_history import JobHistory, job_history
+
+# Job type -> "module:function" run inside the worker process
+JOB_RUNNERS = {
+    "train": "roland_ui_demo.studio.backend.core.training:run_training",
+    "export": "roland_ui_demo.studio.backend.core.export:run_export",
+}
+
+# Step updates are persisted to job.json at most this often (state changes always are)
+PERSIST_INTERVAL = 2.0
+# Every this many steps, a step update is also written to the job's log
+LOG_STEP_INTERVAL = 10
+# Seconds a finished job's event channel is kept before it is rebuilt from job.json
+CHANNEL_TTL = 300.0
+# Seconds between re-checks of a queued job the gate is holding back
+GATE_RECHECK_INTERVAL = 5.0
+
+# Message shown for a state when the transition does not carry its own
+STATE_MESSAGES = {
+    "queued": "Waiting for a free worker",
+    "completed": "Training completed",
+    "failed": "Training failed",
+    "cancelled": "Cancelled by user",
+}
+# Overrides of STATE_MESSAGES for job types other than training
+TYPE_STATE_MESSAGES = {
+    "export": {"completed": "Export completed", "failed": "Export failed"},
+}
+
+# Events whose latest payload is kept on the job record under the event name
+RECORDED_EVENTS = ("preprocess", "sampler", "checkpoint", "export")
+
+# Fields copied from "step" events onto the job record
+PROGRESS_FIELDS = (
+    "step",
+    "total_steps",
+    "epoch",
+    "loss",
+    "learning_rate",
+    "grad_norm",
+    "tokens_per_sec",
+)
+
+
+def new_job_id() -> str:
+    """Sortable, collision-free job id."""
+    return f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def write_json_atomic(path: Path, data: Dict[str, Any]):
+    """Write JSON via a temp file and rename so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _resolve_runner(job_type: str):
+    module_name, _, func_name = JOB_RUNNERS[job_type].partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _worker_main(job_id: str, job_type: str, config: Dict[str, Any], job_dir: str, events):
+    """Entry point of a job worker process."""
+    # Imported here so the server process never loads NumPy just for this
+    from .job_logs import capture_output
+    from .metrics_store import MetricsWriter
+
+    # Everything the job prints from here on goes to its log, not the server's console
+    output = capture_output(Path(job_dir))
+    output.log.write("worker", "INFO", f"Worker started (pid {os.getpid()})")
+    # Jobs restart from step 0 on every attempt, so start a fresh metrics log
+    metrics = MetricsWriter(Path(job_dir), reset=True)
+
+    def report(event_type: str, data: Dict[str, Any]):
+        if event_type == "step":
+            metrics.append(data)
+            if data.get("step", 0) % LOG_STEP_INTERVAL == 0:
+                output.log.write("worker", "INFO", _step_message(data), event=event_type)
+        else:
+            # Writes nothing once the log is closed, i.e. for the final state
+            output.log.write("worker", "INFO", event_type, event=event_type, data=data)
+        events.put((job_id, event_type, data))
+
+    try:
+        runner = _resolve_runner(job_type)
+        result = runner(job_id, config, report, Path(job_dir))
+    except BaseException as e:
+        metrics.close()
+        tb = traceback.format_exc()
+        output.log.write("worker", "ERROR", tb, event="state", data={"state": "failed"})
+        # Drain the captured output before the final state goes out, so a
+        # client that stops following the log on "failed" has all of it
+        output.close()
+        report("state", {"state": "failed", "error": str(e), "traceback": tb})
+        raise SystemExit(1)
+    metrics.close()
+    output.log.write(
+        "worker", "INFO", "state", event="state", data={"state": "completed", "result": result}
+    )
+    output.close()
+    report("state", {"state": "completed", "result": result})
+
+
+def _step_message(data: Dict[str, Any]) -> str:
+    parts = [f"step {data.get('step')}/{data.get('total_steps')}"]
+    for key, spec in (
+        ("loss", ".4f"),
+        ("learning_rate", ".3e"),
+        ("grad_norm", ".4f"),
+        ("tokens_per_sec", ",.0f"),
+    ):
+        if data.get(key) is not None:
+            parts.append(f"{key} {data[key]:{spec}}")
+    return " ".join(parts)
+
+
+class JobScheduler:
+    """Durable job queue with process-per-job workers and a concurrency limit."""
+
+    def __init__(
+        self,
+        jobs_dir: Path,
+        broker: EventBroker,
+        max_concurrent: int = 1,
+        max_attempts: int = 3,
+        history: Optional[JobHistory] = None,
+    ):
+        self.jobs_dir = jobs_dir
+        self.broker = broker
+        self.history = history
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_attempts = max_attempts
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: Deque[str] = deque()
+        self._running: Dict[str, multiprocessing.Process] = {}
+        self._last_persist: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = None
+        self._pump: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Optional check run before a queued job starts: returns why it must
+        # keep waiting (e.g. not enough free memory), None to start it, or a
+        # dict with a "reason" when the job can never run and should fail
+        self.gate: Optional[Callable[[Dict[str, Any]], Union[str, Dict[str, Any], None]]] = None
+        self._recheck_pending = False
+        self._dir_lock = None
+        self._observers: List[Callable[[str, str, Dict[str, Any]], None]] = []
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Load persisted jobs, recover interrupted ones and start dispatching."""
+        self._loop = asyncio.get_running_loop()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_jobs_dir()
+        self._events = self._ctx.Queue()
+        self._pump = threading.Thread(
+            target=self._pump_events, name="job-events", daemon=True
+        )
+        self._pump.start()
+        self._recover()
+        self._dispatch()
+
+    def stop(self):
+        """Stop workers. Interrupted jobs go back to the queue for the next start."""
+        with self._lock:
+            for job_id, proc in list(self._running.items()):
+                proc.terminate()
+                record = self._jobs[job_id]
+                record["state"] = "queued"
+                record["message"] = "Interrupted by server shutdown"
+                self._persist(record)
+            running = list(self._running.values())
+            self._running.clear()
+        for proc in running:
+            proc.join(timeout=5)
+        if self._events is not None:
+            self._events.put(None)
+        if self._pump is not None:
+            self._pump.join(timeout=5)
+        if self._dir_lock is not None:
+            self._dir_lock.close()  # closing releases the flock
+            self._dir_lock = None
+
+    def _lock_jobs_dir(self):
+        """
+        Hold an exclusive lock on the jobs directory while this scheduler runs.
+
+        Recovery kills the workers of jobs it finds "running", so a second
+        scheduler on the same directory would kill the first one's live jobs
+        and re-run them.
+
+        Raises:
+            RuntimeError: If another process is already running jobs from it
+        """
+        if fcntl is None:
+            return
+        lock = open(self.jobs_dir / ".scheduler.lock", "a+")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            raise RuntimeError(
+                f"Another server is already running the jobs in {self.jobs_dir}; "
+                "give this one its own workspace (UNSLOTH_STUDIO_WORKSPACE)"
+            )
+        self._dir_lock = lock
+
+    def _recover(self):
+        records = []
+        for path in self.jobs_dir.glob("*/job.json"):
+            try:
+                records.append(json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable job record {path}: {e}")
+        if self.history is not None:
+            # job.json files are the source of truth; re-sync in case the
+            # database is new, from an older schema or missed writes in a crash
+            try:
+                self.history.rebuild(records)
+            except sqlite3.Error as e:
+                print(f"Could not rebuild job history: {e}")
+
+        for record in sorted(records, key=lambda r: r["submitted_at"]):
+            self._jobs[record["job_id"]] = record
+            if record["state"] == "running":
+                self._kill_orphan(record)
+                if record.get("attempts", 0) >= self.max_attempts:
+                    self._set_state(
+                        record, "failed", error="Interrupted too many times"
+                    )
+                    continue
+                self._set_state(
+                    record, "queued", message="Re-queued after server restart"
+                )
+            if record["state"] == "queued":
+                self._queue.append(record["job_id"])
+
+    def _kill_orphan(self, record: Dict[str, Any]):
+        """Terminate a worker that outlived a crashed server, if it is still ours."""
+        pid, created = record.get("pid"), record.get("pid_create_time")
+        if not pid or not created:
+            return
+        try:
+            proc = psutil.Process(pid)
+            if abs(proc.create_time() - created) < 1e-3:
+                proc.terminate()
+                proc.wait(timeout=5)
+        except (psutil.Error, psutil.TimeoutExpired):
+            pass
+
+    # ---- public API ----
+
+    def submit(self, config: Dict[str, Any], job_type: str = "train") -> Dict[str, Any]:
+        """Persist a new job and queue it. Returns the job record."""
+        if job_type not in JOB_RUNNERS:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job_id = new_job_id()
+        record = {
+            "job_id": job_id,
+            "type": job_type,
+            "state": "queued",
+            "config": config,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "attempts": 0,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "message": STATE_MESSAGES["queued"],
+        }
+        (self.jobs_dir / job_id).mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._jobs[job_id] = record
+            self._persist(record)
+            self._queue.append(job_id)
+        self.broker.publish(job_id, "state", {"state": "queued"})
+        self._dispatch()
+        return record
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recently submitted job, if any."""
+        if not self._jobs:
+            return None
+        return max(self._jobs.values(), key=lambda r: r["submitted_at"])
+
+    def snapshot(self, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Deep copy of a job record (the latest one by default), safe to serialise."""
+        with self._lock:
+            record = self.latest() if job_id is None else self._jobs.get(job_id)
+            return copy.deepcopy(record)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return sorted(self._jobs.values(), key=lambda r: r["submitted_at"])
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        try:
+            return self._queue.index(job_id)
+        except ValueError:
+            return None
+
+    def observe(self, callback: Callable[[str, str, Dict[str, Any]], None]):
+        """
+        Call ``callback(job_id, event_type, data)`` on every state and step event.
+
+        It runs on whichever thread produced the event, with the scheduler
+        lock held, so it must only hand the event off (e.g. to an event loop).
+        """
+        self._observers.append(callback)
+
+    def cancel(
+        self, job_id: str, message: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or record["state"] in FINAL_STATES:
+                return record
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+            proc = self._running.get(job_id)
+            if proc is not None:
+                proc.terminate()
+            if message is None:
+                self._set_state(record, "cancelled")
+            else:
+                self._set_state(record, "cancelled", message=message)
+        return record
+
+    def channel_for(self, job_id: str):
+        """Event channel for a job, seeded from its record if it was evicted."""
+        channel = self.broker.get(job_id)
+        if channel is None:
+            record = self._jobs[job_id]
+            self.broker.publish(
+                job_id, "state", {"state": record["state"], **record["progress"]}
+            )
+            channel = self.broker.get(job_id)
+            if record["state"] in FINAL_STATES:
+                # May be called from coordinator threads, not just the loop
+                self._loop.call_soon_threadsafe(
+                    self._loop.call_later, CHANNEL_TTL, self.broker.discard, job_id
+                )
+        return channel
+
+    # ---- internals ----
+
+    def _persist(self, record: Dict[str, Any]):
+        write_json_atomic(self.jobs_dir / record["job_id"] / "job.json", record)
+        self._last_persist[record["job_id"]] = time.monotonic()
+        if self.history is not None:
+            try:
+                self.history.upsert(record)
+            except sqlite3.Error as e:  # job.json is written; only the index is stale
+                print(f"Could not update job history for {record['job_id']}: {e}")
+
+    def _set_state(self, record: Dict[str, Any], state: str, **fields):
+        """Update, persist and publish a state change. Caller holds the lock."""
+        record["state"] = state
+        messages = TYPE_STATE_MESSAGES.get(record.get("type"), {})
+        record["message"] = messages.get(state, STATE_MESSAGES.get(state, ""))
+        record.update(fields)
+        if state in FINAL_STATES:
+            record["finished_at"] = time.time()
+        self._persist(record)
+        event = {"state": state}
+        for key in ("message", "error", "result"):
+            if fields.get(key) is not None:
+                event[key] = fields[key]
+        self.broker.publish(record["job_id"], "state", event)
+        self._notify(record["job_id"], "state", event)
+        if state in FINAL_STATES and self._loop is not None:
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later, CHANNEL_TTL, self.broker.discard, record["job_id"]
+            )
+
+    def _notify(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        for callback in self._observers:
+            try:
+                callback(job_id, event_type, data)
+            except Exception as e:
+                print(f"Job observer failed on {event_type} for {job_id}: {e}")
+
+    def _dispatch(self):
+        with self._lock:
+            while self._queue and len(self._running) < self.max_concurrent:
+                record = self._jobs[self._queue[0]]
+                reason = self._check_gate(record)
+                if isinstance(reason, dict):
+                    self._queue.popleft()
+                    self._set_state(record, "failed", error=reason["reason"])
+                    continue
+                if reason is not None:
+                    # Jobs start in submission order, so the rest wait behind it
+                    self._hold(record, reason)
+                    return
+                self._launch(self._queue.popleft())
+
+    def _check_gate(self, record: Dict[str, Any]) -> Union[str, Dict[str, Any], None]:
+        if self.gate is None:
+            return None
+        try:
+            return self.gate(record)
+        except Exception as e:  # a broken check must not wedge the queue
+            print(f"Gate check failed for {record['job_id']}: {e}")
+            return None
+
+    def _hold(self, record: Dict[str, Any], reason: str):
+        """Keep a queued job waiting and look at it again shortly. Caller holds the lock."""
+        if record["message"] != reason:
+            record["message"] = reason
+            self._persist(record)
+            self.broker.publish(
+                record["job_id"], "state", {"state": "queued", "message": reason}
+            )
+        if self._loop is not None and not self._recheck_pending:
+            self._recheck_pending = True
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later, GATE_RECHECK_INTERVAL, self._recheck
+            )
+
+    def _recheck(self):
+        self._recheck_pending = False
+        self._dispatch()
+
+    def _launch(self, job_id: str):
+        record = self._jobs[job_id]
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(job_id, record["type"], record["config"], str(job_dir), self._events),
+            name=f"job-{job_id}",
+        )
+        proc.start()
+        self._running[job_id] = proc
+
+        try:
+            pid_create_time = psutil.Process(proc.pid).create_time()
+        except psutil.Error:
+            pid_create_time = None
+        record["attempts"] = record.get("attempts", 0) + 1
+        self._set_state(
+            record,
+            "running",
+            started_at=time.time(),
+            pid=proc.pid,
+            pid_create_time=pid_create_time,
+            message=f"Running (attempt {record['attempts']})",
+        )
+
+        # Join on a side thread, then post an exit marker behind the worker's
+        # own events so the pump always sees the final state first.
+        def watch():
+            proc.join()
+            self._events.put((job_id, "exit", {"exitcode": proc.exitcode}))
+
+        threading.Thread(target=watch, name=f"watch-{job_id}", daemon=True).start()
+
+    def _pump_events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            job_id, event_type, data = item
+            try:
+                self._handle_event(job_id, event_type, data)
+            except Exception as e:
+                print(f"Failed to handle {event_type} event for {job_id}: {e}")
+
+    def _handle_event(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return
+
+            if event_type == "exit":
+                if self._running.pop(job_id, None) is None:
+                    return
+                if record["state"] not in FINAL_STATES:
+                    self._set_state(
+                        record,
+                        "failed",
+                        error=f"Worker exited with code {data['exitcode']}",
+                    )
+                self._loop.call_soon_threadsafe(self._dispatch)
+                return
+
+            if event_type == "state":
+                if record["state"] in FINAL_STATES:
+                    return  # e.g. cancelled while the worker was finishing
+                state = data.pop("state")
+                self._set_state(record, state, **data)
+                return
+
+            if event_type in RECORDED_EVENTS:
+                record[event_type] = data
+                self._persist(record)
+
+            if event_type == "step":
+                record["progress"] = {
+                    k: data[k] for k in PROGRESS_FIELDS if k in data
+                }
+                if time.monotonic() - self._last_persist.get(job_id, 0) > PERSIST_INTERVAL:
+                    self._persist(record)
+                self._notify(job_id, event_type, data)
+
+        self.broker.publish(job_id, event_type, data)
+
+
+def status_payload(record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape a job record for /api/train/status."""
+    if record is None:
+        return {"status": "idle", "message": "No training in progress"}
+    return {
+        "status": record["state"],
+        "job_id": record["job_id"],
+        "message": record.get("message") or record.get("error") or "",
+        "job": record,
+    }
+
+
+# Shared scheduler for the app
+scheduler = JobScheduler(
+    settings.JOBS_DIR,
+    broker,
+    max_concurrent=settings.MAX_CONCURRENT_JOBS,
+    max_attempts=settings.MAX_JOB_ATTEMPTS,
+    history=job_history,
+)
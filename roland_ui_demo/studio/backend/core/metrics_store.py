@@ -0,0 +1,197 @@
+"""
+Per-job training metrics store.
+
+Each job gets ``<job_dir>/metrics/`` with one append-only, fixed-width file
+per column (``step.i8``, ``loss.f4``, ...). The worker process appends rows in
+small batches; readers memory-map the column files with NumPy and answer
+range queries with min/max/mean buckets, so a chart request costs the same
+whether the run has a thousand steps or a million.
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# (column, dtype). Files are named "<column>.<dtype code>" so the layout is self-describing.
+METRIC_COLUMNS = (
+    ("step", np.dtype("<i8")),
+    ("time", np.dtype("<f8")),
+    ("loss", np.dtype("<f4")),
+    ("learning_rate", np.dtype("<f4")),
+    ("grad_norm", np.dtype("<f4")),
+    ("tokens_per_sec", np.dtype("<f4")),
+)
+VALUE_COLUMNS = tuple(name for name, _ in METRIC_COLUMNS if name not in ("step", "time"))
+
+# Writer flushes after this many buffered rows or seconds, whichever comes first
+FLUSH_ROWS = 64
+FLUSH_SECONDS = 1.0
+
+# Default and maximum number of buckets returned by a query
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def _column_path(metrics_dir: Path, name: str, dtype: np.dtype) -> Path:
+    return metrics_dir / f"{name}.{dtype.kind}{dtype.itemsize}"
+
+
+class MetricsWriter:
+    """
+    Buffered appender used inside the job worker process.
+
+    Args:
+        job_dir: Per-job directory under the workspace
+        reset: Truncate existing columns, e.g. when a re-queued job starts over
+    """
+
+    def __init__(self, job_dir: Path, reset: bool = False):
+        self.metrics_dir = job_dir / "metrics"
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        mode = "wb" if reset else "ab"
+        self._files = {
+            name: open(_column_path(self.metrics_dir, name, dtype), mode)
+            for name, dtype in METRIC_COLUMNS
+        }
+        self._rows: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+
+    def append(self, row: Dict[str, Any]):
+        """Buffer one step. Missing metrics are stored as NaN."""
+        self._rows.append(row)
+        if (
+            len(self._rows) >= FLUSH_ROWS
+            or time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            now = time.time()
+            for name, dtype in METRIC_COLUMNS:
+                if name == "time":
+                    values = [row.get("time", now) for row in self._rows]
+                else:
+                    default = 0 if dtype.kind == "i" else np.nan
+                    values = [
+                        default if row.get(name) is None else row[name]
+                        for row in self._rows
+                    ]
+                self._files[name].write(np.asarray(values, dtype=dtype).tobytes())
+            # Step goes last so a reader never sees a step without its values
+            for name, _ in reversed(METRIC_COLUMNS):
+                self._files[name].flush()
+            self._rows.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+class MetricsReader:
+    """Memory-mapped, read-only view over a job's metric columns."""
+
+    def __init__(self, job_dir: Path):
+        self.metrics_dir = job_dir / "metrics"
+        self.columns: Dict[str, np.ndarray] = {}
+
+        lengths = []
+        paths = {}
+        for name, dtype in METRIC_COLUMNS:
+            path = _column_path(self.metrics_dir, name, dtype)
+            size = path.stat().st_size if path.exists() else 0
+            paths[name] = (path, dtype)
+            lengths.append(size // dtype.itemsize)
+        # A writer may be mid-flush; only expose rows present in every column
+        self.length = min(lengths) if lengths else 0
+
+        for name, (path, dtype) in paths.items():
+            if self.length:
+                self.columns[name] = np.memmap(
+                    path, dtype=dtype, mode="r", shape=(self.length,)
+                )
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def query(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        points: Optional[int] = None,
+        columns: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Downsample the steps in ``[start, end]`` into at most ``points`` buckets.
+
+        Args:
+            start: First step to include (default: first recorded)
+            end: Last step to include (default: last recorded)
+            points: Maximum number of buckets to return (default: DEFAULT_POINTS)
+            columns: Metric columns to return (default: all)
+
+        Returns:
+            ``{"steps": [...], "series": {column: {"min", "max", "mean"}}}``
+            where ``steps`` is the first step of each bucket.
+        """
+        columns = list(columns) if columns else list(VALUE_COLUMNS)
+        unknown = [c for c in columns if c not in VALUE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metric columns: {', '.join(unknown)}")
+        points = DEFAULT_POINTS if points is None else points
+        points = max(1, min(int(points), MAX_POINTS))
+
+        steps = self.columns["step"]
+        lo = 0 if start is None else int(np.searchsorted(steps, start, side="left"))
+        hi = self.length if end is None else int(np.searchsorted(steps, end, side="right"))
+        count = max(0, hi - lo)
+
+        result: Dict[str, Any] = {
+            "total_rows": self.length,
+            "rows": count,
+            "bucket_size": 1,
+            "steps": [],
+            "series": {},
+        }
+        if count == 0:
+            return result
+
+        bucket_size = -(-count // points)  # ceil division
+        edges = np.arange(lo, hi, bucket_size)
+        offsets = edges - lo
+        result["bucket_size"] = bucket_size
+        result["steps"] = steps[edges].tolist()
+
+        for name in columns:
+            values = np.asarray(self.columns[name][lo:hi], dtype=np.float64)
+            if bucket_size == 1:
+                raw = _to_list(values)
+                result["series"][name] = {"min": raw, "max": raw, "mean": raw}
+                continue
+            valid = ~np.isnan(values)
+            counts = np.add.reduceat(valid.astype(np.int64), offsets)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), offsets)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts
+            result["series"][name] = {
+                "min": _to_list(np.fmin.reduceat(values, offsets)),
+                "max": _to_list(np.fmax.reduceat(values, offsets)),
+                "mean": _to_list(means),
+            }
+        return result
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    """JSON-safe list: NaN becomes None."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def query_metrics(job_dir: Path, **kwargs) -> Dict[str, Any]:
+    """Open a job's metrics and run a single downsampling query."""
+    return MetricsReader(job_dir).query(**kwargs)
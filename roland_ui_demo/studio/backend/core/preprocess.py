@@ -0,0 +1,340 @@
+"""
+Dataset preprocessing with a content-addressed cache.
+
+Formatting, tokenization and (optionally) packing run with ``datasets.map``
+across several processes. The result is saved as Arrow files under
+``<WORKSPACE_DIR>/cache/datasets/<key>/``, where ``key`` hashes the dataset
+fingerprint, tokenizer, ``max_seq_length``, template and packing flag, so
+re-running the same config just memory-maps the cached files. The cache is
+size-bounded and evicts least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; concurrent builds then just race
+    fcntl = None
+
+# UI dataset names -> Hugging Face Hub ids
+DATASET_SOURCES = {
+    "alpaca": "yahma/alpaca-cleaned",
+    "dolly": "databricks/databricks-dolly-15k",
+}
+
+# Prompt templates, keyed by name. Fields missing from a row render as "".
+TEMPLATES = {
+    "alpaca": (
+        "Below is an instruction that describes a task, paired with an input that "
+        "provides further context. Write a response that appropriately completes "
+        "the request.\n\n### Instruction:\n{instruction}\n\n### Input:\n{input}\n\n"
+        "### Response:\n{output}"
+    ),
+    "dolly": (
+        "### Instruction:\n{instruction}\n\n### Context:\n{context}\n\n"
+        "### Response:\n{response}"
+    ),
+    "text": "{text}",
+}
+
+# Bumped whenever the preprocessing code changes what it writes
+PREPROCESS_VERSION = 1
+
+META_FILE = "meta.json"
+Reporter = Callable[[str, Dict[str, Any]], None]
+
+
+class _SafeDict(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def choose_template(column_names: List[str], requested: Optional[str] = None) -> str:
+    """Pick a template for a dataset from its columns unless one is requested."""
+    if requested:
+        if requested not in TEMPLATES:
+            raise ValueError(f"Unknown template: {requested}")
+        return requested
+    columns = set(column_names)
+    if {"instruction", "output"} <= columns:
+        return "alpaca"
+    if {"instruction", "response"} <= columns:
+        return "dolly"
+    if "text" in columns:
+        return "text"
+    raise ValueError(f"No template matches dataset columns {sorted(columns)}")
+
+
+def load_source_dataset(name: str):
+    """Load a dataset by UI name, Hub id or local file/directory."""
+    import datasets
+
+    path = Path(name).expanduser()
+    if path.is_dir() and (path / "dataset_info.json").exists():
+        return datasets.load_from_disk(str(path))
+    if path.is_file():
+        builder = {".jsonl": "json", ".json": "json", ".csv": "csv", ".parquet": "parquet"}
+        return datasets.load_dataset(
+            builder.get(path.suffix, "text"), data_files=str(path), split="train"
+        )
+    return datasets.load_dataset(DATASET_SOURCES.get(name, name), split="train")
+
+
+def cache_key(
+    fingerprint: str, tokenizer: str, max_seq_length: int, template: str, packing: bool
+) -> str:
+    """Content address of a preprocessed dataset."""
+    parts = {
+        "version": PREPROCESS_VERSION,
+        "dataset": fingerprint,
+        "tokenizer": tokenizer,
+        "max_seq_length": max_seq_length,
+        "template": hashlib.sha256(TEMPLATES[template].encode()).hexdigest(),
+        "packing": packing,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class DatasetCache:
+    """Size-bounded LRU directory of preprocessed Arrow datasets."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the entry's path and mark it as recently used, or None."""
+        path = self.path(key)
+        meta_path = path / META_FILE
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        meta["last_used"] = time.time()
+        meta["hits"] = meta.get("hits", 0) + 1
+        _write_meta(path, meta)
+        return path
+
+    @contextmanager
+    def lock(self, key: str):
+        """Serialise builds of the same key across processes."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f".{key}.lock", "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def store(self, key: str, dataset, meta: Dict[str, Any]) -> Path:
+        """Save ``dataset`` under ``key`` atomically, then enforce the size bound."""
+        tmp = self.root / f".tmp-{key}-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        dataset.save_to_disk(str(tmp))
+        meta = {**meta, "created": time.time(), "last_used": time.time(), "hits": 0}
+        meta["size_bytes"] = _dir_size(tmp)
+        _write_meta(tmp, meta)
+
+        path = self.path(key)
+        if path.exists():  # another process won the race
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+        self.evict(keep=key)
+        return path
+
+    def entries(self) -> List[Tuple[Path, Dict[str, Any]]]:
+        entries = []
+        if self.root.exists():
+            for meta_path in self.root.glob(f"*/{META_FILE}"):
+                try:
+                    entries.append((meta_path.parent, json.loads(meta_path.read_text())))
+                except (OSError, ValueError):
+                    continue
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Delete least recently used entries until the cache fits ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda e: e[1].get("last_used", 0))
+        total = sum(meta.get("size_bytes", 0) for _, meta in entries)
+        evicted = []
+        for path, meta in entries:
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= meta.get("size_bytes", 0)
+            evicted.append(path.name)
+        return evicted
+
+
+def _write_meta(path: Path, meta: Dict[str, Any]):
+    tmp = path / f".{META_FILE}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, path / META_FILE)
+
+
+def _format_and_tokenize(batch, tokenizer, template: str, max_seq_length: int):
+    columns = list(batch.keys())
+    rows = len(batch[columns[0]])
+    texts = [
+        TEMPLATES[template].format_map(_SafeDict({c: batch[c][i] or "" for c in columns}))
+        for i in range(rows)
+    ]
+    eos = tokenizer.eos_token or ""
+    encoded = tokenizer(
+        [text + eos for text in texts],
+        truncation=True,
+        max_length=max_seq_length,
+        add_special_tokens=True,
+    )
+    return {
+        "input_ids": encoded["input_ids"],
+        "length": [len(ids) for ids in encoded["input_ids"]],
+    }
+
+
+def _pack(batch, max_seq_length: int):
+    """
+    Greedily concatenate samples into rows of at most ``max_seq_length`` tokens.
+
+    ``position_ids`` restart at 0 for every sample, which is what variable-length
+    attention kernels use to keep packed samples from attending to each other.
+    """
+    input_ids, position_ids, lengths = [], [], []
+    cur_ids: List[int] = []
+    cur_pos: List[int] = []
+    for ids in batch["input_ids"]:
+        if cur_ids and len(cur_ids) + len(ids) > max_seq_length:
+            input_ids.append(cur_ids)
+            position_ids.append(cur_pos)
+            lengths.append(len(cur_ids))
+            cur_ids, cur_pos = [], []
+        cur_ids.extend(ids)
+        cur_pos.extend(range(len(ids)))
+    if cur_ids:
+        input_ids.append(cur_ids)
+        position_ids.append(cur_pos)
+        lengths.append(len(cur_ids))
+    return {"input_ids": input_ids, "position_ids": position_ids, "length": lengths}
+
+
+def prepare_dataset(
+    config: Dict[str, Any],
+    report: Optional[Reporter] = None,
+    num_proc: Optional[int] = None,
+    cache: Optional["DatasetCache"] = None,
+):
+    """
+    Format, tokenize and optionally pack the dataset named in ``config``.
+
+    Args:
+        config: TrainingConfig; uses ``dataset``, ``model_name``, ``max_seq_length``
+            and the optional ``template``, ``tokenizer`` and ``packing`` keys
+        report: Job reporter, sent a ``preprocess`` event when done
+        num_proc: Worker processes for ``datasets.map`` (default: settings)
+        cache: Cache to use (default: the workspace dataset cache)
+
+    Returns:
+        The preprocessed ``datasets.Dataset``, memory-mapped from the cache
+    """
+    import datasets
+
+    started = time.time()
+    cache = cache or dataset_cache
+    max_seq_length = int(config.get("max_seq_length", 2048))
+    tokenizer_name = config.get("tokenizer") or config["model_name"]
+    packing = bool(config.get("packing", False))
+
+    source = load_source_dataset(config["dataset"])
+    template = choose_template(source.column_names, config.get("template"))
+    key = cache_key(source._fingerprint, tokenizer_name, max_seq_length, template, packing)
+
+    path = cache.lookup(key)
+    cache_hit = path is not None
+    if not cache_hit:
+        with cache.lock(key):
+            path = cache.lookup(key)  # built by someone else while we waited
+            if path is None:
+                num_proc = num_proc or settings.PREPROCESS_WORKERS
+                num_proc = num_proc if num_proc > 1 and len(source) >= 1000 else None
+
+                if packing:
+                    # Pack from the (cached) unpacked tokenization of the same config
+                    tokenized = prepare_dataset(
+                        {**config, "packing": False}, num_proc=num_proc, cache=cache
+                    )
+                    processed = tokenized.map(
+                        _pack,
+                        batched=True,
+                        batch_size=1000,
+                        num_proc=num_proc,
+                        remove_columns=tokenized.column_names,
+                        fn_kwargs={"max_seq_length": max_seq_length},
+                        desc="Packing",
+                    )
+                else:
+                    from transformers import AutoTokenizer
+
+                    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                    processed = source.map(
+                        _format_and_tokenize,
+                        batched=True,
+                        num_proc=num_proc,
+                        remove_columns=source.column_names,
+                        fn_kwargs={
+                            "tokenizer": tokenizer,
+                            "template": template,
+                            "max_seq_length": max_seq_length,
+                        },
+                        desc="Tokenizing",
+                    )
+                path = cache.store(
+                    key,
+                    processed,
+                    {
+                        "dataset": config["dataset"],
+                        "fingerprint": source._fingerprint,
+                        "tokenizer": tokenizer_name,
+                        "max_seq_length": max_seq_length,
+                        "template": template,
+                        "packing": packing,
+                        "source_rows": len(source),
+                    },
+                )
+
+    dataset = datasets.load_from_disk(str(path))
+    if report is not None:
+        report(
+            "preprocess",
+            {
+                "cache_key": key,
+                "cache_hit": cache_hit,
+                "rows": len(dataset),
+                "template": template,
+                "seconds": round(time.time() - started, 2),
+            },
+        )
+    return dataset
+
+
+# Shared cache for the workspace
+dataset_cache = DatasetCache(settings.DATASET_CACHE_DIR, settings.DATASET_CACHE_MAX_BYTES)
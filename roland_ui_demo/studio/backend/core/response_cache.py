@@ -0,0 +1,183 @@
+"""
+Pre-encoded JSON responses with ETags.
+
+``ResponseCache`` keeps the encoded body of idempotent API responses (the
+model catalog, the latest telemetry snapshot, finished jobs) together with a
+content hash used as a strong ETag. A repeated request is a dict lookup plus a
+byte copy, and a client that already holds the body gets a 304.
+
+Entries are keyed by tuples whose first element names the kind of response
+(``("models", query)``, ``("job", job_id)``...). They are dropped explicitly
+with ``invalidate(kind)`` when their source changes, or tagged with a
+``version`` (such as the telemetry sample's timestamp) so a lookup with a
+newer version misses. Everything else is encoded with ``dumps``, which uses
+``orjson`` when it is installed.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder gives the same JSON
+    orjson = None
+
+# Encoded responses kept before the least recently used is dropped
+MAX_ENTRIES = 1024
+# Clients must revalidate, which is a cheap 304 when nothing changed
+CACHE_CONTROL = "no-cache"
+
+JSON_MEDIA_TYPE = "application/json"
+
+Key = Tuple[Hashable, ...]
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, byte-for-byte what ``JSONResponse`` would send."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with ``dumps``; the apps' default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return True if an If-None-Match header names ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class CachedBody:
+    """One encoded response body."""
+
+    __slots__ = ("body", "etag", "version", "status_code")
+
+    def __init__(self, body: bytes, version: Hashable = None, status_code: int = 200):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=10).hexdigest()}"'
+        self.version = version
+        self.status_code = status_code
+
+
+class ResponseCache:
+    """LRU of encoded JSON bodies, invalidated explicitly or by version."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, CachedBody]" = OrderedDict()
+        # Invalidation can come from the scheduler's and catalog's threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Key, version: Hashable = None) -> Optional[CachedBody]:
+        """The entry for ``key``, unless it is missing or from another version."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self, key: Key, content: Any, version: Hashable = None, status_code: int = 200
+    ) -> CachedBody:
+        """Encode ``content`` and store it under ``key``."""
+        entry = CachedBody(dumps(content), version, status_code)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, kind: Optional[str] = None, *key: Hashable):
+        """
+        Drop cached responses.
+
+        Args:
+            kind: Drop entries whose key starts with this; everything if None
+            key: Further key elements narrowing the match, e.g. a job ID
+        """
+        prefix = (kind, *key)
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+                return
+            for cached in [k for k in self._entries if k[: len(prefix)] == prefix]:
+                del self._entries[cached]
+
+    def respond(
+        self, request: Request, entry: CachedBody, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Send ``entry``, or a 304 if the client already has it."""
+        headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL, **(headers or {})}
+        if entry.status_code == 200 and etag_matches(
+            request.headers.get("if-none-match"), entry.etag
+        ):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(
+            entry.body,
+            status_code=entry.status_code,
+            media_type=JSON_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    def cached(
+        self,
+        request: Request,
+        key: Key,
+        build: Callable[[], Any],
+        version: Hashable = None,
+    ) -> Response:
+        """Respond from the cache, calling ``build()`` for the content on a miss."""
+        entry = self.get(key, version)
+        if entry is None:
+            entry = self.put(key, build(), version)
+        return self.respond(request, entry)
+
+    def metric_lines(self, namespace: str) -> List[str]:
+        """Prometheus lines for ``MetricsRegistry.add_collector``."""
+        ns = namespace
+        return [
+            f"# HELP {ns}_response_cache_entries Encoded responses held.",
+            f"# TYPE {ns}_response_cache_entries gauge",
+            f"{ns}_response_cache_entries {len(self._entries)}",
+            f"# HELP {ns}_response_cache_lookups_total Cache lookups, by result.",
+            f"# TYPE {ns}_response_cache_lookups_total counter",
+            f'{ns}_response_cache_lookups_total{{result="hit"}} {self.hits}',
+            f'{ns}_response_cache_lookups_total{{result="miss"}} {self.misses}',
+            f"# HELP {ns}_response_cache_not_modified_total Requests answered with 304.",
+            f"# TYPE {ns}_response_cache_not_modified_total counter",
+            f"{ns}_response_cache_not_modified_total {self.not_modified}",
+        ]
+
+
+# Shared cache for the app
+response_cache = ResponseCache()
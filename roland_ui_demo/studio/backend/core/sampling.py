@@ -0,0 +1,196 @@
+"""
+Length-aware batch samplers and collators.
+
+All samplers work on a precomputed ``lengths`` array (the ``length`` column
+written by preprocessing, read zero-copy from Arrow), so planning an epoch is
+a handful of NumPy sorts rather than a pass over the token data.
+
+- ``naive``: fixed-size batches in (shuffled) dataset order, padded to the
+  longest sample in each batch.
+- ``bucketed``: shuffle, then sort within large "megabatches" so each batch
+  holds samples of similar length; batch order is shuffled again.
+- ``packed``: first-fit-decreasing bin packing of samples into rows of
+  ``max_seq_length`` tokens. ``packed_collate`` emits per-sample
+  ``position_ids`` and ``cu_seqlens`` so variable-length attention keeps
+  packed samples from attending to each other.
+"""
+
+import bisect
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+BATCHING_MODES = ("naive", "bucketed", "packed")
+
+# Samples per sort window in bucketed mode, as a multiple of batch_size
+MEGABATCH_MULTIPLIER = 50
+
+# Label value ignored by the loss
+IGNORE_INDEX = -100
+
+
+def dataset_lengths(dataset) -> np.ndarray:
+    """Sample lengths of a preprocessed ``datasets.Dataset`` as an int32 array."""
+    column = dataset.data.column("length")
+    return np.asarray(column.to_numpy(), dtype=np.int32)
+
+
+def naive_batches(
+    lengths: np.ndarray, batch_size: int, shuffle: bool = True, seed: int = 0
+) -> List[np.ndarray]:
+    order = np.arange(len(lengths))
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def bucketed_batches(
+    lengths: np.ndarray,
+    batch_size: int,
+    shuffle: bool = True,
+    seed: int = 0,
+    megabatch_multiplier: int = MEGABATCH_MULTIPLIER,
+) -> List[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    order = np.arange(len(lengths))
+    if shuffle:
+        rng.shuffle(order)
+
+    window = batch_size * megabatch_multiplier
+    batches = []
+    for start in range(0, len(order), window):
+        mega = order[start : start + window]
+        # Longest first, stable so equal lengths keep their shuffled order
+        mega = mega[np.argsort(-lengths[mega], kind="stable")]
+        batches.extend(mega[i : i + batch_size] for i in range(0, len(mega), batch_size))
+
+    if shuffle:
+        batches = [batches[i] for i in rng.permutation(len(batches))]
+    return batches
+
+
+def pack_rows(lengths: np.ndarray, max_seq_length: int) -> List[List[int]]:
+    """
+    First-fit-decreasing bin packing of sample indices into rows.
+
+    Each returned row is a list of sample indices whose lengths sum to at most
+    ``max_seq_length``. Samples longer than a row get a row of their own.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    rows: List[List[int]] = []
+    # Sorted (remaining capacity, row index) pairs for best-fit lookup
+    free: List[tuple] = []
+    for idx in order.tolist():
+        length = int(lengths[idx])
+        pos = bisect.bisect_left(free, (length, -1))
+        if pos < len(free):
+            remaining, row = free.pop(pos)
+            rows[row].append(idx)
+            remaining -= length
+        else:
+            row = len(rows)
+            rows.append([idx])
+            remaining = max_seq_length - length
+        if remaining > 0:
+            bisect.insort(free, (remaining, row))
+    return rows
+
+
+def packed_batches(
+    lengths: np.ndarray,
+    max_seq_length: int,
+    rows_per_batch: int,
+    shuffle: bool = True,
+    seed: int = 0,
+) -> List[List[List[int]]]:
+    rows = pack_rows(lengths, max_seq_length)
+    if shuffle:
+        rows = [rows[i] for i in np.random.default_rng(seed).permutation(len(rows))]
+    return [rows[i : i + rows_per_batch] for i in range(0, len(rows), rows_per_batch)]
+
+
+def plan_batches(
+    lengths: np.ndarray,
+    mode: str,
+    batch_size: int,
+    max_seq_length: int,
+    shuffle: bool = True,
+    seed: int = 0,
+) -> list:
+    """Plan one epoch of batches for ``mode`` (see ``BATCHING_MODES``)."""
+    if mode == "naive":
+        return naive_batches(lengths, batch_size, shuffle, seed)
+    if mode == "bucketed":
+        return bucketed_batches(lengths, batch_size, shuffle, seed)
+    if mode == "packed":
+        return packed_batches(lengths, max_seq_length, batch_size, shuffle, seed)
+    raise ValueError(f"Unknown batching mode: {mode}")
+
+
+def padding_stats(
+    lengths: np.ndarray, batches: list, mode: str, max_seq_length: int
+) -> Dict[str, Any]:
+    """Real vs. padded token counts for a batch plan."""
+    real = int(lengths.sum())
+    if mode == "packed":
+        rows = sum(len(batch) for batch in batches)
+        padded = rows * max_seq_length
+    else:
+        padded = sum(int(lengths[batch].max()) * len(batch) for batch in batches)
+    return {
+        "mode": mode,
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "padding_ratio": round(1 - real / padded, 4) if padded else 0.0,
+        "efficiency": round(real / padded, 4) if padded else 1.0,
+    }
+
+
+def pad_collate(samples: Sequence[Sequence[int]], pad_id: int) -> Dict[str, np.ndarray]:
+    """Right-pad samples to the longest one in the batch."""
+    width = max(len(s) for s in samples)
+    input_ids = np.full((len(samples), width), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(samples), width), dtype=np.int64)
+    for i, sample in enumerate(samples):
+        input_ids[i, : len(sample)] = sample
+        attention_mask[i, : len(sample)] = 1
+    labels = np.where(attention_mask == 1, input_ids, IGNORE_INDEX)
+    return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+
+def packed_collate(
+    rows: Sequence[Sequence[Sequence[int]]], max_seq_length: int, pad_id: int
+) -> Dict[str, np.ndarray]:
+    """
+    Concatenate each row's samples into one ``max_seq_length`` sequence.
+
+    Returns ``position_ids`` that restart at every sample boundary and
+    ``cu_seqlens``, the cumulative sample offsets over the flattened batch, as
+    consumed by variable-length (flash) attention. Labels never cross a sample
+    boundary: the first token of each sample is not predicted from the previous one.
+    """
+    input_ids = np.full((len(rows), max_seq_length), pad_id, dtype=np.int64)
+    position_ids = np.zeros((len(rows), max_seq_length), dtype=np.int64)
+    labels = np.full((len(rows), max_seq_length), IGNORE_INDEX, dtype=np.int64)
+    cu_seqlens = [0]
+    for r, row in enumerate(rows):
+        offset = 0
+        for sample in row:
+            n = min(len(sample), max_seq_length - offset)
+            if n <= 0:
+                break
+            input_ids[r, offset : offset + n] = sample[:n]
+            position_ids[r, offset : offset + n] = np.arange(n)
+            labels[r, offset + 1 : offset + n] = sample[1:n]
+            cu_seqlens.append(r * max_seq_length + offset + n)
+            offset += n
+        # Padding tail counts as its own segment so offsets stay row-aligned
+        if offset < max_seq_length:
+            cu_seqlens.append((r + 1) * max_seq_length)
+    return {
+        "input_ids": input_ids,
+        "position_ids": position_ids,
+        "labels": labels,
+        "cu_seqlens": np.asarray(cu_seqlens, dtype=np.int32),
+    }
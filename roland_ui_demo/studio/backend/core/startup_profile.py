@@ -0,0 +1,103 @@
+"""
+Startup profiling for ``roland-ui-demo studio --profile-startup``.
+
+Starts the studio app in a fresh interpreter under ``python -X importtime``,
+with a throwaway workspace so no real jobs are recovered. It reports how long
+importing the app and running its startup took, resident memory after each
+step, which heavy dependencies got loaded, and the import time of each
+top-level package.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Any, Dict, List
+
+# Runs in the child interpreter; prints one JSON line with its measurements
+PROFILE_SCRIPT = """
+import asyncio, json, time
+
+started = time.perf_counter()
+from roland_ui_demo.studio.backend import main
+imported = time.perf_counter()
+
+import psutil
+
+process = psutil.Process()
+rss_imported = process.memory_info().rss
+
+async def run():
+    async with main.lifespan(main.app):
+        return time.perf_counter(), process.memory_info().rss
+
+ready, rss_ready = asyncio.run(run())
+
+from roland_ui_demo.studio.backend.core.warmup import loaded_heavy_modules
+
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": ready - imported,
+    "rss_imported_mb": rss_imported / 1e6,
+    "rss_ready_mb": rss_ready / 1e6,
+    "heavy_modules": loaded_heavy_modules(),
+}))
+"""
+
+# Packages shown in the per-package breakdown
+TOP_PACKAGES = 15
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Sum ``-X importtime`` self times per top-level package, slowest first."""
+    totals: Dict[str, int] = defaultdict(int)
+    counts: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:") :].split("|")
+        except ValueError:
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] += int(self_us)
+        counts[package] += 1
+    ranked = sorted(totals, key=totals.get, reverse=True)
+    return [
+        {"package": p, "seconds": round(totals[p] / 1e6, 4), "modules": counts[p]}
+        for p in ranked
+    ]
+
+
+def profile_startup() -> Dict[str, Any]:
+    """Measure a cold start of the studio app in a subprocess."""
+    with tempfile.TemporaryDirectory(prefix="studio-profile-") as workspace:
+        env = {**os.environ, "UNSLOTH_STUDIO_WORKSPACE": workspace}
+        env.pop("UNSLOTH_STUDIO_COORDINATOR", None)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROFILE_SCRIPT],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Profiling run failed:\n{proc.stderr[-2000:]}")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["packages"] = _parse_importtime(proc.stderr)
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print("Unsloth Studio startup profile")
+    print(f"  import app       {report['import_seconds']:8.3f}s")
+    print(f"  startup          {report['startup_seconds']:8.3f}s")
+    print(f"  RSS after import {report['rss_imported_mb']:8.1f} MB")
+    print(f"  RSS when ready   {report['rss_ready_mb']:8.1f} MB")
+    heavy = ", ".join(report["heavy_modules"]) or "none"
+    print(f"  heavy modules    {heavy}")
+    print()
+    print(f"  {'package':<28}{'import time':>12}{'modules':>9}")
+    for row in report["packages"][:TOP_PACKAGES]:
+        print(f"  {row['package']:<28}{row['seconds']:>11.3f}s{row['modules']:>9}")
@@ -0,0 +1,494 @@
+"""
+Hyperparameter sweeps with asynchronous successive halving (ASHA).
+
+A sweep expands a search space over TrainingConfig fields into trials. Each
+trial is an ordinary training job on the scheduler, and at most
+``max_concurrent`` of a sweep's trials are submitted at once. As trials report
+step losses, ``SuccessiveHalving`` compares each one at its rungs
+(``grace_period * reduction_factor**k`` steps) with every trial that reached
+the same rung before it, and stops those outside the best
+``1 / reduction_factor``. Rung losses are averaged over the last few steps so
+a single noisy step does not decide a trial's fate.
+
+There is no barrier between rungs: a slot freed by a stopped trial is filled
+by the next one straight away, and only the promising trials run to the end,
+so finding a good config takes a fraction of the steps of the full grid.
+
+Each sweep is persisted as ``<WORKSPACE_DIR>/sweeps/<sweep_id>.json`` and
+picks up where it left off after a restart, together with its trials' jobs.
+"""
+
+import copy
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from .config import settings
+from .events import FINAL_STATES
+from .jobs import JobScheduler, scheduler, write_json_atomic
+from .training import STEPS_PER_EPOCH
+
+# TrainingConfig fields a search space may cover
+SWEEP_FIELDS = ("learning_rate", "lora_r", "lora_alpha", "batch_size")
+INTEGER_FIELDS = ("lora_r", "lora_alpha", "batch_size")
+# Trials sampled when the space has ranges and no num_trials is given
+DEFAULT_TRIALS = 16
+MAX_TRIALS = 256
+# Keep the best 1/REDUCTION_FACTOR at each rung
+REDUCTION_FACTOR = 3
+# First rung, as a fraction of a trial's steps
+GRACE_FRACTION = 0.1
+# Steps averaged into the loss a trial is judged on
+SMOOTHING_STEPS = 5
+# Entries returned in a sweep's leaderboard
+LEADERBOARD_SIZE = 10
+
+# Trial states: "pending" until submitted, then its job's state, or
+# "pruned" once stopped early and "rejected" if admission control refused it
+ACTIVE_TRIAL_STATES = ("queued", "running")
+FINAL_TRIAL_STATES = FINAL_STATES + ("pruned", "rejected")
+
+
+def new_sweep_id() -> str:
+    return f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def _sample(field: str, spec: Dict[str, Any], rng: random.Random):
+    low, high = float(spec["min"]), float(spec["max"])
+    if low > high:
+        raise ValueError(f"{field}: min must not exceed max")
+    if spec.get("log"):
+        if low <= 0:
+            raise ValueError(f"{field}: log ranges must be positive")
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return int(round(value)) if field in INTEGER_FIELDS else float(f"{value:.3g}")
+
+
+def expand_space(
+    space: Dict[str, Any], num_trials: Optional[int] = None, seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Trial parameters for a search space.
+
+    Args:
+        space: Field -> list of values, or ``{"min", "max", "log"}`` range
+        num_trials: Trials to draw; the whole grid when the space only has
+            lists and this is None
+        seed: Seed for sampling, so a sweep can be reproduced
+
+    Raises:
+        ValueError: If the space is empty, names an unknown field or is too large
+    """
+    if not isinstance(space, dict) or not space:
+        raise ValueError("space must map TrainingConfig fields to values or ranges")
+    for field, spec in space.items():
+        if field not in SWEEP_FIELDS:
+            raise ValueError(f"Cannot sweep {field}; choose from {', '.join(SWEEP_FIELDS)}")
+        if isinstance(spec, list):
+            if not spec:
+                raise ValueError(f"{field}: list of values is empty")
+        elif not (isinstance(spec, dict) and "min" in spec and "max" in spec):
+            raise ValueError(f'{field}: expected a list or {{"min", "max", "log"}}')
+    if num_trials is not None and not 1 <= num_trials <= MAX_TRIALS:
+        raise ValueError(f"num_trials must be between 1 and {MAX_TRIALS}")
+
+    rng = random.Random(seed)
+    fields = list(space)
+    if all(isinstance(space[f], list) for f in fields):
+        grid = [dict(zip(fields, values)) for values in itertools.product(*space.values())]
+        if num_trials is None or num_trials >= len(grid):
+            if len(grid) > MAX_TRIALS:
+                raise ValueError(
+                    f"The grid has {len(grid)} trials; set num_trials to sample "
+                    f"at most {MAX_TRIALS}"
+                )
+            return grid
+        return rng.sample(grid, num_trials)
+
+    trials = []
+    for _ in range(num_trials or DEFAULT_TRIALS):
+        trials.append(
+            {
+                f: rng.choice(spec) if isinstance(spec, list) else _sample(f, spec, rng)
+                for f, spec in space.items()
+            }
+        )
+    return trials
+
+
+class SuccessiveHalving:
+    """
+    ASHA's stopping rule.
+
+    Args:
+        max_steps: Steps in a full trial; rungs lie below it
+        grace_period: Steps before the first rung
+        reduction_factor: Only the best ``1 / reduction_factor`` of the
+            trials seen at a rung continue past it
+    """
+
+    def __init__(
+        self,
+        max_steps: int,
+        grace_period: int,
+        reduction_factor: int = REDUCTION_FACTOR,
+    ):
+        self.reduction_factor = reduction_factor
+        self.rungs: List[int] = []
+        step = max(1, grace_period)
+        while step < max_steps:
+            self.rungs.append(step)
+            step *= reduction_factor
+        self._results: Dict[int, Dict[Hashable, float]] = {r: {} for r in self.rungs}
+
+    def record(self, trial: Hashable, rung: int, loss: float):
+        """Restore a result, e.g. from a persisted sweep."""
+        if rung in self._results:
+            self._results[rung][trial] = loss
+
+    def report(self, trial: Hashable, step: int, loss: float) -> Tuple[List[int], bool]:
+        """
+        Record ``trial``'s loss at every rung it has just reached.
+
+        Returns the rungs recorded and whether the trial should stop.
+        """
+        recorded = []
+        for rung in self.rungs:
+            if step < rung:
+                break
+            results = self._results[rung]
+            if trial in results:
+                continue
+            results[trial] = loss
+            recorded.append(rung)
+            ranked = sorted(results.values())
+            cutoff = ranked[math.ceil(len(ranked) / self.reduction_factor) - 1]
+            if loss > cutoff:
+                return recorded, True
+        return recorded, False
+
+
+def leaderboard(sweep: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Trials ranked by how far they got, then by loss."""
+    ranked = [t for t in sweep["trials"] if t["loss"] is not None]
+    ranked.sort(key=lambda t: (-t["step"], t["loss"]))
+    return [
+        {
+            "rank": rank,
+            "trial": t["trial"],
+            "job_id": t["job_id"],
+            "state": t["state"],
+            "params": t["params"],
+            "step": t["step"],
+            "loss": t["loss"],
+        }
+        for rank, t in enumerate(ranked[:LEADERBOARD_SIZE], start=1)
+    ]
+
+
+def sweep_payload(sweep: Dict[str, Any], trials: bool = True) -> Dict[str, Any]:
+    """Shape a sweep record for the API, with its leaderboard and compute used."""
+    steps_run = sum(t["step"] for t in sweep["trials"])
+    grid_steps = len(sweep["trials"]) * sweep["max_steps"]
+    board = leaderboard(sweep)
+    payload = {k: v for k, v in sweep.items() if k != "trials"}
+    payload.update(
+        {
+            "best": board[0] if board else None,
+            "steps_run": steps_run,
+            "grid_steps": grid_steps,
+            "compute_fraction": round(steps_run / grid_steps, 3) if grid_steps else 0.0,
+            "states": dict(Counter(t["state"] for t in sweep["trials"])),
+        }
+    )
+    if trials:
+        payload["leaderboard"] = board
+        payload["trials"] = sweep["trials"]
+    return payload
+
+
+class SweepManager:
+    """Runs sweeps as trial jobs on a ``JobScheduler``, stopping weak trials early."""
+
+    def __init__(self, sweeps_dir: Path, scheduler: JobScheduler):
+        self.sweeps_dir = sweeps_dir
+        self.scheduler = scheduler
+        # Optional check applied to each trial's config before it is submitted;
+        # returns the config to run or raises ValueError to refuse it
+        self.admit: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+        self._sweeps: Dict[str, Dict[str, Any]] = {}
+        self._halving: Dict[str, SuccessiveHalving] = {}
+        self._trial_of: Dict[str, Tuple[str, int]] = {}
+        self._recent: Dict[str, Deque[float]] = {}
+        self._lock = threading.RLock()
+        # Trial events are handled in order on one thread: pruning and
+        # advancing cancel and submit jobs, which fsyncs records, writes the
+        # history database and spawns workers
+        self._events: Optional[ThreadPoolExecutor] = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Load persisted sweeps and resume running ones. Call after the scheduler starts."""
+        self._events = ThreadPoolExecutor(1, thread_name_prefix="sweep-events")
+        self.sweeps_dir.mkdir(parents=True, exist_ok=True)
+        self.scheduler.observe(self._observe)
+        with self._lock:
+            for path in sorted(self.sweeps_dir.glob("*.json")):
+                try:
+                    sweep = json.loads(path.read_text())
+                except (OSError, ValueError) as e:
+                    print(f"Skipping unreadable sweep record {path}: {e}")
+                    continue
+                self._load(sweep)
+
+    def _load(self, sweep: Dict[str, Any]):
+        sweep_id = sweep["sweep_id"]
+        self._sweeps[sweep_id] = sweep
+        halving = SuccessiveHalving(
+            sweep["max_steps"], sweep["grace_period"], sweep["reduction_factor"]
+        )
+        self._halving[sweep_id] = halving
+        for trial in sweep["trials"]:
+            for rung, loss in trial["rungs"].items():
+                halving.record(trial["trial"], int(rung), loss)
+        if sweep["state"] != "running":
+            return
+
+        for trial in sweep["trials"]:
+            if trial["state"] not in ACTIVE_TRIAL_STATES:
+                continue
+            record = self.scheduler.get(trial["job_id"])
+            if record is None:
+                trial.update(state="failed", message="Job record missing")
+            elif record["state"] in FINAL_STATES:
+                self._finish_trial(trial, record["state"], record)
+            else:
+                trial["state"] = record["state"]
+                self._trial_of[trial["job_id"]] = (sweep_id, trial["trial"])
+        self._advance(sweep)
+
+    # ---- public API ----
+
+    def create(
+        self,
+        config: Dict[str, Any],
+        space: Dict[str, Any],
+        num_trials: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        grace_period: Optional[int] = None,
+        reduction_factor: int = REDUCTION_FACTOR,
+        seed: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Start a sweep. Returns its payload.
+
+        Args:
+            config: TrainingConfig shared by every trial
+            space: Search space, see ``expand_space``
+            num_trials: Trials to run; see ``expand_space``
+            max_concurrent: Trials submitted at once (the scheduler's limit by default)
+            grace_period: Steps before the first rung (a tenth of a trial by default)
+            reduction_factor: Keep the best 1/reduction_factor at each rung
+            seed: Sampling seed; random when None, and recorded on the sweep
+
+        Raises:
+            ValueError: If the space or settings are invalid
+        """
+        if not isinstance(config, dict):
+            raise ValueError("config must be a TrainingConfig object")
+        if reduction_factor < 2:
+            raise ValueError("reduction_factor must be at least 2")
+        seed = random.randrange(2**31) if seed is None else int(seed)
+        params = expand_space(space, num_trials, seed)
+        max_steps = max(1, int(config.get("num_epochs", 1)) * STEPS_PER_EPOCH)
+        grace_period = int(grace_period or max(1, round(max_steps * GRACE_FRACTION)))
+        if grace_period < 1:
+            raise ValueError("grace_period must be at least 1")
+        halving = SuccessiveHalving(max_steps, grace_period, reduction_factor)
+
+        sweep = {
+            "sweep_id": new_sweep_id(),
+            "state": "running",
+            "config": config,
+            "space": space,
+            "seed": seed,
+            "max_concurrent": max(1, int(max_concurrent or self.scheduler.max_concurrent)),
+            "max_steps": max_steps,
+            "grace_period": grace_period,
+            "reduction_factor": reduction_factor,
+            "rungs": halving.rungs,
+            "created_at": time.time(),
+            "finished_at": None,
+            "trials": [
+                {
+                    "trial": index,
+                    "params": trial_params,
+                    "job_id": None,
+                    "state": "pending",
+                    "step": 0,
+                    "loss": None,
+                    "rungs": {},
+                    "message": "",
+                }
+                for index, trial_params in enumerate(params)
+            ],
+        }
+        with self._lock:
+            self._sweeps[sweep["sweep_id"]] = sweep
+            self._halving[sweep["sweep_id"]] = halving
+            self._advance(sweep)
+            return copy.deepcopy(sweep_payload(sweep))
+
+    def get(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            sweep = self._sweeps.get(sweep_id)
+            return None if sweep is None else copy.deepcopy(sweep_payload(sweep))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Every sweep without its trials, newest first."""
+        with self._lock:
+            sweeps = sorted(self._sweeps.values(), key=lambda s: -s["created_at"])
+            return copy.deepcopy([sweep_payload(s, trials=False) for s in sweeps])
+
+    def cancel(self, sweep_id: str) -> Optional[Dict[str, Any]]:
+        """Stop a sweep and cancel its queued and running trials."""
+        with self._lock:
+            sweep = self._sweeps.get(sweep_id)
+            if sweep is None:
+                return None
+            if sweep["state"] == "running":
+                sweep.update(state="cancelled", finished_at=time.time())
+                for trial in sweep["trials"]:
+                    if trial["state"] in ACTIVE_TRIAL_STATES:
+                        self._release(trial)
+                        self.scheduler.cancel(
+                            trial["job_id"], message=f"Sweep {sweep_id} cancelled"
+                        )
+                    if trial["state"] not in FINAL_TRIAL_STATES:
+                        trial["state"] = "cancelled"
+                self._persist(sweep)
+            return copy.deepcopy(sweep_payload(sweep))
+
+    # ---- internals ----
+
+    def _persist(self, sweep: Dict[str, Any]):
+        write_json_atomic(self.sweeps_dir / f"{sweep['sweep_id']}.json", sweep)
+
+    def _observe(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        # Called with the scheduler's lock held; the work happens on our thread
+        if job_id in self._trial_of and self._events is not None:
+            self._events.submit(self._on_event, job_id, event_type, data)
+
+    def _on_event(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        try:
+            self._handle_event(job_id, event_type, data)
+        except Exception as e:  # the executor would drop it silently
+            print(f"Sweep failed to handle {event_type} for {job_id}: {e}")
+
+    def _handle_event(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        with self._lock:
+            found = self._trial_of.get(job_id)
+            if found is None:
+                return  # stopped by us while the event was in flight
+            sweep = self._sweeps[found[0]]
+            trial = sweep["trials"][found[1]]
+            if event_type == "step" and data.get("loss") is not None:
+                self._on_step(sweep, trial, data)
+            elif event_type == "state":
+                state = data["state"]
+                if state in ACTIVE_TRIAL_STATES:
+                    trial["state"] = state
+                elif state in FINAL_STATES:
+                    self._release(trial)
+                    self._finish_trial(trial, state, data)
+                    self._advance(sweep)
+
+    def _on_step(self, sweep: Dict[str, Any], trial: Dict[str, Any], data: Dict[str, Any]):
+        step = int(data["step"])
+        recent = self._recent.setdefault(trial["job_id"], deque(maxlen=SMOOTHING_STEPS))
+        if step < trial["step"]:
+            recent.clear()  # the job was restarted from step 0
+        recent.append(float(data["loss"]))
+        loss = round(sum(recent) / len(recent), 4)
+        trial.update(step=step, loss=loss)
+
+        halving = self._halving[sweep["sweep_id"]]
+        recorded, stop = halving.report(trial["trial"], step, loss)
+        for rung in recorded:
+            trial["rungs"][str(rung)] = loss
+        if stop:
+            rung = recorded[-1]
+            trial.update(
+                state="pruned",
+                message=(
+                    f"Stopped at step {step}: loss {loss} is outside the best "
+                    f"1/{sweep['reduction_factor']} at the {rung}-step rung"
+                ),
+            )
+            self._release(trial)
+            self.scheduler.cancel(
+                trial["job_id"],
+                message=f"Stopped early by sweep {sweep['sweep_id']}: {trial['message']}",
+            )
+            self._advance(sweep)
+        elif recorded:
+            self._persist(sweep)
+
+    def _finish_trial(self, trial: Dict[str, Any], state: str, data: Dict[str, Any]):
+        trial["state"] = state
+        trial["message"] = data.get("message") or data.get("error") or ""
+        result = data.get("result") or {}
+        if state == "completed" and result.get("total_steps"):
+            trial["step"] = result["total_steps"]
+
+    def _release(self, trial: Dict[str, Any]):
+        self._trial_of.pop(trial["job_id"], None)
+        self._recent.pop(trial["job_id"], None)
+
+    def _advance(self, sweep: Dict[str, Any]):
+        """Submit pending trials up to the sweep's limit; finish it when all are done."""
+        if sweep["state"] == "running":
+            active = sum(t["state"] in ACTIVE_TRIAL_STATES for t in sweep["trials"])
+            for trial in sweep["trials"]:
+                if active >= sweep["max_concurrent"]:
+                    break
+                if trial["state"] == "pending":
+                    self._submit(sweep, trial)
+                    active += trial["state"] in ACTIVE_TRIAL_STATES
+            if all(t["state"] in FINAL_TRIAL_STATES for t in sweep["trials"]):
+                sweep.update(state="completed", finished_at=time.time())
+        self._persist(sweep)
+
+    def _submit(self, sweep: Dict[str, Any], trial: Dict[str, Any]):
+        config = {
+            **sweep["config"],
+            **trial["params"],
+            "sweep_id": sweep["sweep_id"],
+            "trial": trial["trial"],
+        }
+        try:
+            if self.admit is not None:
+                config = self.admit(config)
+        except ValueError as e:
+            trial.update(state="rejected", message=str(e))
+            return
+        record = self.scheduler.submit(config)
+        trial.update(job_id=record["job_id"], state=record["state"])
+        self._trial_of[record["job_id"]] = (sweep["sweep_id"], trial["trial"])
+
+
+# Shared sweep manager for the app
+sweeps = SweepManager(settings.SWEEPS_DIR, scheduler)
@@ -0,0 +1,351 @@
+"""
+Background system telemetry.
+
+A daemon thread samples CPU, memory, this process and (when present) GPU
+metrics on a fixed interval into a fixed-size ring buffer. Request handlers
+only ever read the latest snapshot or slice the buffer, so polling the
+dashboard never touches psutil or the CUDA driver on the event loop. The app
+starts the sampler when it starts up; until the sampler thread's first GPU
+probe finishes, snapshots report ``gpu.available`` as None (not yet known).
+"""
+
+import bisect
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+# Seconds between samples
+SAMPLE_INTERVAL = 1.0
+# Number of samples kept (one hour at the default interval)
+HISTORY_SIZE = 3600
+
+# Bytes per GB in every *_gb figure; admission control plans in the same unit
+GB = 1e9
+
+
+def _open_nvml():
+    """Return the pynvml module if NVML can be initialised, else None."""
+    try:
+        import pynvml
+
+        pynvml.nvmlInit()
+        return pynvml
+    except Exception:
+        return None
+
+
+def _nvidia_smi(fields: List[str]) -> List[List[str]]:
+    """One row of ``fields`` per GPU, as reported by the nvidia-smi CLI."""
+    out = subprocess.run(
+        ["nvidia-smi", f"--query-gpu={','.join(fields)}", "--format=csv,noheader,nounits"],
+        capture_output=True,
+        text=True,
+        timeout=5,
+        check=True,
+    ).stdout
+    return [[v.strip() for v in line.split(",")] for line in out.strip().splitlines()]
+
+
+def _probe_gpus(nvml) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Static GPU description, and where it came from.
+
+    Tries NVML, then nvidia-smi, and only falls back to torch when something
+    else has already imported it: importing torch just for telemetry would
+    cost the server seconds of CPU and hundreds of MB of memory.
+    """
+    gpu_info: Dict[str, Any] = {"available": False, "devices": []}
+    devices = gpu_info["devices"]
+    source = None
+    if nvml is not None:
+        source = "nvml"
+        for i in range(nvml.nvmlDeviceGetCount()):
+            handle = nvml.nvmlDeviceGetHandleByIndex(i)
+            name = nvml.nvmlDeviceGetName(handle)
+            devices.append(
+                {
+                    "index": i,
+                    "name": name.decode() if isinstance(name, bytes) else name,
+                    "memory_total_gb": round(
+                        nvml.nvmlDeviceGetMemoryInfo(handle).total / GB, 2
+                    ),
+                }
+            )
+    elif shutil.which("nvidia-smi"):
+        source = "nvidia-smi"
+        try:
+            for index, name, total_mib in _nvidia_smi(["index", "name", "memory.total"]):
+                devices.append(
+                    {
+                        "index": int(index),
+                        "name": name,
+                        "memory_total_gb": round(float(total_mib) * 2**20 / GB, 2),
+                    }
+                )
+        except (OSError, ValueError, subprocess.SubprocessError):
+            devices.clear()
+    elif "torch" in sys.modules:
+        source = "torch"
+        torch = sys.modules["torch"]
+        if torch.cuda.is_available():
+            for i in range(torch.cuda.device_count()):
+                props = torch.cuda.get_device_properties(i)
+                devices.append(
+                    {
+                        "index": i,
+                        "name": props.name,
+                        "memory_total_gb": round(props.total_memory / GB, 2),
+                    }
+                )
+    gpu_info["available"] = bool(devices)
+    if devices:
+        # Only "nvml" and "nvidia-smi" see memory used by other processes
+        gpu_info["source"] = source
+    return gpu_info, source if devices else None
+
+
+class TelemetrySampler:
+    """Samples system metrics into a ring buffer on a background thread."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, capacity: int = HISTORY_SIZE):
+        self.interval = interval
+        self.capacity = capacity
+
+        # Ring buffer: parallel slots for timestamps and flat metric dicts
+        self._times: List[float] = [0.0] * capacity
+        self._metrics: List[Optional[Dict[str, float]]] = [None] * capacity
+        self._next = 0
+        self._count = 0
+
+        self._static: Dict[str, Any] = {}
+        # "available" is None until the first probe: unknown, not absent
+        self._gpu: Dict[str, Any] = {"available": None, "devices": []}
+        self._nvml = None
+        self._gpu_source: Optional[str] = None
+        self._process = psutil.Process(os.getpid())
+        self._latest: Optional[Dict[str, Any]] = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Start sampling. Safe to call more than once."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._static = {
+                "platform": platform.platform(),
+                "python_version": platform.python_version(),
+                "cpu_count": psutil.cpu_count(),
+            }
+            # Prime the cpu_percent counters and take a first, GPU-less sample
+            # so /api/system has something to return immediately.
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+            self._thread = threading.Thread(
+                target=self._run, name="telemetry-sampler", daemon=True
+            )
+        self._record(self._sample())
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        # NVML/nvidia-smi can be slow to answer, so probe them here rather than in start()
+        try:
+            self._nvml = _open_nvml()
+            self._gpu, self._gpu_source = _probe_gpus(self._nvml)
+        except Exception as e:
+            print(f"GPU probe failed: {e}")
+            self._gpu = {"available": False, "devices": []}
+        # The first sample, with the probe's result, goes out right away
+        interval = 0.0
+        while not self._stop.wait(interval):
+            interval = self.interval
+            try:
+                self._record(self._sample())
+            except Exception as e:  # never let one bad probe kill the sampler
+                print(f"Telemetry sample failed: {e}")
+
+    # ---- sampling ----
+
+    def _sample(self) -> Dict[str, float]:
+        memory = psutil.virtual_memory()
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            process_cpu = self._process.cpu_percent(interval=None)
+            threads = self._process.num_threads()
+
+        metrics = {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_total_gb": round(memory.total / GB, 2),
+            "memory_available_gb": round(memory.available / GB, 2),
+            "memory_percent": memory.percent,
+            "process_rss_gb": round(rss / GB, 3),
+            "process_cpu_percent": process_cpu,
+            "process_threads": threads,
+        }
+        if self._gpu_source is not None:
+            metrics.update(self._sample_gpus())
+        return metrics
+
+    def _sample_gpus(self) -> Dict[str, float]:
+        metrics: Dict[str, float] = {}
+        if self._gpu_source == "nvml":
+            for device in self._gpu["devices"]:
+                prefix = f"gpu{device['index']}_"
+                handle = self._nvml.nvmlDeviceGetHandleByIndex(device["index"])
+                mem = self._nvml.nvmlDeviceGetMemoryInfo(handle)
+                util = self._nvml.nvmlDeviceGetUtilizationRates(handle)
+                metrics[prefix + "memory_used_gb"] = round(mem.used / GB, 2)
+                metrics[prefix + "utilization_percent"] = float(util.gpu)
+            return metrics
+
+        if self._gpu_source == "nvidia-smi":
+            # One nvidia-smi call covers every device
+            for index, used_mib, util in _nvidia_smi(
+                ["index", "memory.used", "utilization.gpu"]
+            ):
+                prefix = f"gpu{index}_"
+                if used_mib.isdigit():
+                    metrics[prefix + "memory_used_gb"] = round(int(used_mib) * 2**20 / GB, 2)
+                if util.isdigit():  # "[N/A]" on some devices
+                    metrics[prefix + "utilization_percent"] = float(util)
+            return metrics
+
+        # Through torch we can only see this process's own allocations, and
+        # only once something else has initialised CUDA.
+        torch = sys.modules["torch"]
+        if torch.cuda.is_initialized():
+            for device in self._gpu["devices"]:
+                metrics[f"gpu{device['index']}_memory_used_gb"] = round(
+                    torch.cuda.memory_reserved(device["index"]) / GB, 2
+                )
+        return metrics
+
+    def _record(self, metrics: Dict[str, float]):
+        now = time.time()
+        snapshot = {
+            **self._static,
+            "timestamp": now,
+            "cpu_percent": metrics["cpu_percent"],
+            "memory": {
+                "total_gb": metrics["memory_total_gb"],
+                "available_gb": metrics["memory_available_gb"],
+                "percent_used": metrics["memory_percent"],
+            },
+            "process": {
+                "pid": self._process.pid,
+                "rss_gb": metrics["process_rss_gb"],
+                "cpu_percent": metrics["process_cpu_percent"],
+                "threads": metrics["process_threads"],
+            },
+            "gpu": self._gpu,
+        }
+        with self._lock:
+            self._times[self._next] = now
+            self._metrics[self._next] = metrics
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._latest = snapshot
+
+    # ---- queries ----
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """
+        Most recent snapshot, shaped like the original /api/system response.
+
+        None until ``start`` has been called.
+        """
+        return self._latest
+
+    def latest_metrics(self) -> Dict[str, float]:
+        """Flat metrics of the most recent sample (``gpu0_memory_used_gb``, ...)."""
+        with self._lock:
+            if not self._count:
+                return {}
+            return dict(self._metrics[(self._next - 1) % self.capacity])
+
+    def _ordered(self):
+        """Copy the ring out oldest-first. Holds the lock only for the copy."""
+        with self._lock:
+            count, start = self._count, (self._next - self._count) % self.capacity
+            if start + count <= self.capacity:
+                times = self._times[start : start + count]
+                metrics = self._metrics[start : start + count]
+            else:
+                times = self._times[start:] + self._times[: self._next]
+                metrics = self._metrics[start:] + self._metrics[: self._next]
+        return times, metrics
+
+    def history(self, window: float = 300.0, resolution: float = 5.0) -> Dict[str, Any]:
+        """
+        Mean-downsampled series covering the last ``window`` seconds.
+
+        Args:
+            window: How far back to look, in seconds
+            resolution: Bucket width in seconds (clamped to the sample interval)
+        """
+        resolution = max(resolution, self.interval)
+        times, metrics = self._ordered()
+
+        now = time.time()
+        first = bisect.bisect_left(times, now - window)
+        times, metrics = times[first:], metrics[first:]
+
+        bucket_times: List[float] = []
+        series: Dict[str, List[Optional[float]]] = {}
+        # Per-key counts: a metric can be missing from some samples (a GPU
+        # probe that failed once), and those must not pull its mean down
+        sums: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        bucket = None
+
+        def flush():
+            bucket_times.append(round(bucket * resolution, 3))
+            for key in series:
+                mean = round(sums[key] / counts[key], 3) if key in sums else None
+                series[key].append(mean)
+            for key in sums:
+                if key not in series:
+                    series[key] = [None] * (len(bucket_times) - 1)
+                    series[key].append(round(sums[key] / counts[key], 3))
+
+        for t, sample in zip(times, metrics):
+            b = int(t // resolution)
+            if bucket is not None and b != bucket:
+                flush()
+                sums, counts = {}, {}
+            bucket = b
+            for key, value in sample.items():
+                sums[key] = sums.get(key, 0.0) + value
+                counts[key] = counts.get(key, 0) + 1
+        if bucket is not None:
+            flush()
+
+        return {
+            "interval": self.interval,
+            "window": window,
+            "resolution": resolution,
+            "timestamps": bucket_times,
+            "series": series,
+        }
+
+
+# Shared sampler for the app
+sampler = TelemetrySampler()
@@ -0,0 +1,204 @@
+"""
+Training job runner.
+
+``run_training`` is executed inside a job worker process. It preprocesses the
+dataset through the shared cache and plans length-aware batches (reporting
+their padding efficiency), then runs a simulated fine-tuning loop that reports
+the same step, loss and throughput updates a real trainer would, so the UI,
+scheduler and event stream can be exercised without a GPU. The simulated loss
+curve responds to the learning rate, LoRA rank and alpha, which gives
+hyperparameter sweeps a real optimum to find. The loop also saves LoRA-shaped
+checkpoints through the asynchronous ``CheckpointWriter``.
+"""
+
+import math
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+# Simulated optimizer steps per epoch and wall-clock seconds per step
+STEPS_PER_EPOCH = 50
+STEP_SECONDS = 0.2
+
+# Shape of the simulated adapter: layers, hidden size and target modules
+SIM_LAYERS = 8
+SIM_HIDDEN = 1024
+SIM_TARGET_MODULES = ("q_proj", "v_proj")
+
+# Hyperparameters the simulated loss is best at
+SIM_BEST_LR = 2e-4
+SIM_BEST_ALPHA_RATIO = 1.0
+
+Reporter = Callable[[str, Dict[str, Any]], None]
+
+
+def simulated_loss(
+    config: Dict[str, Any], step: int, total_steps: int, rng: random.Random
+) -> float:
+    """
+    Loss of the simulated run at ``step``.
+
+    The floor rises as the learning rate or alpha/r move away from their best
+    values and falls slightly with rank; lower learning rates also converge
+    more slowly, so a trial that looks bad early is not always bad at the end.
+    """
+    lr = float(config.get("learning_rate", SIM_BEST_LR))
+    rank = max(1, int(config.get("lora_r", 16)))
+    alpha = float(config.get("lora_alpha", rank))
+    batch = max(1, int(config.get("batch_size", 4)))
+
+    floor = (
+        0.6
+        + 0.3 * math.log10(lr / SIM_BEST_LR) ** 2
+        + 0.08 * math.log2(alpha / rank / SIM_BEST_ALPHA_RATIO) ** 2
+        - 0.02 * math.log2(rank / 16)
+    )
+    horizon = total_steps / 4 * min(4.0, max(1.0, SIM_BEST_LR / lr) ** 0.5)
+    # Larger batches average out more of the gradient noise
+    noise = 0.03 * math.sqrt(4 / batch)
+    return floor + 1.8 * math.exp(-step / horizon) + rng.gauss(0, noise)
+
+
+def run_training(
+    job_id: str, config: Dict[str, Any], report: Reporter, job_dir: Path
+) -> Dict[str, Any]:
+    """
+    Run a training job.
+
+    Args:
+        job_id: Id of the job being run
+        config: TrainingConfig sent by the UI
+        report: Callback forwarding ``(event_type, data)`` to the API process
+        job_dir: Per-job directory under the workspace
+
+    Returns:
+        Summary stored on the job record when it completes
+    """
+    epochs = int(config.get("num_epochs", 1))
+    batch_size = int(config.get("batch_size", 4))
+    accumulation = max(1, int(config.get("gradient_accumulation_steps", 1)))
+    max_seq_length = int(config.get("max_seq_length", 2048))
+    peak_lr = float(config.get("learning_rate", 2e-4))
+    total_steps = max(1, epochs * STEPS_PER_EPOCH)
+    warmup_steps = max(1, total_steps // 20)
+    # An optimizer step covers ``accumulation`` micro-batches
+    tokens_per_step = batch_size * accumulation * max_seq_length
+
+    # Tokenize (or fetch from the preprocessing cache) before the first step
+    dataset_rows = None
+    if config.get("dataset") and config.get("preprocess", True):
+        from .preprocess import prepare_dataset
+        from .sampling import dataset_lengths, padding_stats, plan_batches
+
+        try:
+            dataset = prepare_dataset(config, report)
+        except Exception as e:
+            # Offline, or no tokenizer for this model: the simulated run does
+            # not need the tokens, so report it and carry on without them
+            report("preprocess", {"error": f"{type(e).__name__}: {e}"})
+        else:
+            dataset_rows = len(dataset)
+
+            # Rows packed during preprocessing are already full; otherwise bucket
+            mode = config.get("batching") or ("naive" if config.get("packing") else "bucketed")
+            lengths = dataset_lengths(dataset)
+            batches = plan_batches(lengths, mode, batch_size, max_seq_length)
+            stats = padding_stats(lengths, batches, mode, max_seq_length)
+            report("sampler", stats)
+            tokens_per_step = accumulation * stats["real_tokens"] / max(1, stats["batches"])
+
+    # Checkpoint every epoch by default; 0 disables checkpointing
+    checkpoint_every = int(config.get("checkpoint_every", STEPS_PER_EPOCH))
+    checkpoints = None
+    if checkpoint_every > 0:
+        from .checkpoints import KEEP_BEST, KEEP_LAST, CheckpointWriter
+
+        checkpoints = CheckpointWriter(
+            job_dir,
+            keep_last=int(config.get("keep_last", KEEP_LAST)),
+            keep_best=int(config.get("keep_best", KEEP_BEST)),
+            metric="eval_loss",
+            report=report,
+        )
+        adapter = _SimulatedAdapter(int(config.get("lora_r", 16)))
+
+    started = time.time()
+    rng = random.Random()
+    loss = float("nan")
+    checkpoint_pause = 0.0
+    for step in range(1, total_steps + 1):
+        step_start = time.perf_counter()
+        time.sleep(STEP_SECONDS)
+        elapsed = time.perf_counter() - step_start
+
+        loss = simulated_loss(config, step, total_steps, rng)
+        # Linear warmup, then linear decay
+        if step <= warmup_steps:
+            lr = peak_lr * step / warmup_steps
+        else:
+            lr = peak_lr * (total_steps - step) / max(1, total_steps - warmup_steps)
+        report(
+            "step",
+            {
+                "step": step,
+                "total_steps": total_steps,
+                "epoch": round(step / STEPS_PER_EPOCH, 3),
+                "loss": round(loss, 4),
+                "learning_rate": lr,
+                "grad_norm": round(abs(random.gauss(loss, 0.2)), 4),
+                "tokens_per_sec": round(tokens_per_step / elapsed, 1),
+            },
+        )
+
+        if checkpoints is not None and (
+            step % checkpoint_every == 0 or step == total_steps
+        ):
+            eval_loss = loss + abs(random.gauss(0.05, 0.02))
+            checkpoint_pause += checkpoints.save(
+                step, adapter.shards(step), {"eval_loss": round(eval_loss, 4)}
+            )
+
+    result = {
+        "dataset_rows": dataset_rows,
+        "total_steps": total_steps,
+        "final_loss": round(loss, 4),
+        "runtime_sec": round(time.time() - started, 2),
+    }
+    if checkpoints is not None:
+        checkpoints.close()
+        result["checkpoint_pause_sec"] = round(checkpoint_pause, 3)
+        if checkpoints.errors:
+            result["checkpoint_errors"] = checkpoints.errors
+    return result
+
+
+class _SimulatedAdapter:
+    """LoRA-shaped tensors standing in for a real adapter's state dict."""
+
+    def __init__(self, rank: int):
+        import numpy as np
+
+        self._np = np
+        self.rank = rank
+        # Trained alongside the adapter in real runs when new tokens are added;
+        # frozen here, so every checkpoint shares one copy of it on disk
+        self.embeddings = {
+            "base_model.model.embed_tokens.trainable_rows": np.random.default_rng(0)
+            .standard_normal((64, SIM_HIDDEN))
+            .astype(np.float32)
+        }
+
+    def shards(self, step: int) -> Dict[str, Dict[str, Any]]:
+        rng = self._np.random.default_rng(step)
+        adapter = {}
+        for layer in range(SIM_LAYERS):
+            for module in SIM_TARGET_MODULES:
+                prefix = f"base_model.model.layers.{layer}.self_attn.{module}"
+                adapter[f"{prefix}.lora_A.weight"] = rng.standard_normal(
+                    (self.rank, SIM_HIDDEN), dtype=self._np.float32
+                )
+                adapter[f"{prefix}.lora_B.weight"] = rng.standard_normal(
+                    (SIM_HIDDEN, self.rank), dtype=self._np.float32
+                )
+        return {"adapter_model": adapter, "embeddings": self.embeddings}
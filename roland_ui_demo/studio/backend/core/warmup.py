@@ -0,0 +1,63 @@
+"""
+Lazy loading of heavy dependencies.
+
+Nothing on the server's startup path imports torch, transformers, datasets,
+pandas, matplotlib or gradio: training and preprocessing import them inside
+job worker processes, and telemetry reads GPUs through NVML or nvidia-smi.
+An idle studio therefore starts in well under a second and stays small.
+
+Deployments that would rather pay those imports up front (say, to make the
+first dataset preview fast) can list modules in ``UNSLOTH_STUDIO_WARMUP`` or
+``--warmup``; they are imported on a background thread after startup so the
+server is accepting requests the whole time.
+"""
+
+import importlib
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Dependencies that must stay off the startup path
+HEAVY_MODULES = ("torch", "transformers", "datasets", "pandas", "matplotlib", "gradio")
+
+
+class WarmUp:
+    """Imports modules on a daemon thread, recording how long each one took."""
+
+    def __init__(self):
+        self.timings: Dict[str, Optional[float]] = {}
+        self.errors: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, modules: Iterable[str]):
+        modules = [m for m in modules if m]
+        if not modules or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(modules,), name="warmup", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, modules: List[str]):
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:  # a missing optional dependency is not fatal
+                self.errors[name] = str(e)
+                continue
+            self.timings[name] = round(time.perf_counter() - started, 3)
+
+    @property
+    def done(self) -> bool:
+        return self._thread is None or not self._thread.is_alive()
+
+
+def loaded_heavy_modules() -> List[str]:
+    """Heavy dependencies this process has imported so far."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+# Shared warm-up for the app
+warmup = WarmUp()
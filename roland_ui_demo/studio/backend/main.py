@@ -2,18 +2,82 @@
 Unsloth Studio - FastAPI backend that serves API routes and the React frontend.
 """
 
+import asyncio
+import json
+import os
 import webbrowser
 import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
 import uvicorn
 
-app = FastAPI(title="Unsloth Studio", version="0.1.0")
+from .core.admission import AdmissionRejected
+from .core.assets import AssetIndex
+from .core.batch import handle_batch
+from .core.blocking import blocking_pool, loop_monitor, run_blocking
+from .core.checkpoints import list_checkpoints
+from .core.config import settings
+from .core.coordinator import (
+    COORDINATOR_ENV,
+    METRICS_REPORT_INTERVAL,
+    Coordinator,
+    StudioClient,
+    connect,
+    service,
+)
+from .core.dataset_preview import dataset_preview
+from .core.instrumentation import CONTENT_TYPE, InstrumentationMiddleware, http_metrics
+from .core.events import FINAL_STATES
+from .core.inference import QueueFull, UnknownModel
+from .core.job_history import DEFAULT_PAGE_SIZE, job_history
+from .core.job_logs import READ_LIMIT, read_log, tail_log
+from .core.jobs import scheduler, status_payload
+from .core.model_catalog import catalog
+from .core.response_cache import FastJSONResponse, response_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings.setup_directories()
+    loop_monitor.start()
+    if settings.COORDINATOR_ADDRESS:
+        # One of several workers: jobs, events and telemetry live in the coordinator
+        app.state.studio = connect(settings.COORDINATOR_ADDRESS)
+        reporter = asyncio.create_task(_report_metrics(app.state.studio))
+        yield
+        reporter.cancel()
+        app.state.studio.close()
+    else:
+        service.start()
+        app.state.studio = StudioClient(service)
+        yield
+        service.stop()
+    loop_monitor.stop()
+
+
+async def _report_metrics(studio: StudioClient):
+    """Keep the coordinator's copy of this worker's request metrics current."""
+    worker = str(os.getpid())
+    while True:
+        await asyncio.sleep(METRICS_REPORT_INTERVAL)
+        try:
+            await studio.report_metrics(worker, http_metrics.render())
+        except (OSError, EOFError) as e:
+            print(f"Could not report metrics to the coordinator: {e}")
+
+
+app = FastAPI(
+    title="Unsloth Studio",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS
 app.add_middleware(
@@ -23,10 +87,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so it times everything including CORS
+app.add_middleware(InstrumentationMiddleware, registry=http_metrics)
+# Loop lag and blocking-pool usage are exported alongside the request metrics
+http_metrics.add_collector(loop_monitor.metric_lines)
+http_metrics.add_collector(blocking_pool.metric_lines)
+http_metrics.add_collector(response_cache.metric_lines)
 
 # Path to the pre-built React frontend
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend" / "build"
 
+# Frontend build loaded into memory once, with gzip/brotli variants
+frontend_assets = AssetIndex(FRONTEND_DIR)
+
+
+def get_studio(request: Request) -> StudioClient:
+    return request.app.state.studio
+
 
 # ============ API Routes ============
 
@@ -37,41 +114,35 @@ async def health_check():
 
 
 @app.get("/api/system")
-async def get_system_info():
-    import platform
-    import psutil
-
-    gpu_info = {"available": False, "devices": []}
-    try:
-        import torch
-
-        if torch.cuda.is_available():
-            gpu_info["available"] = True
-            for i in range(torch.cuda.device_count()):
-                props = torch.cuda.get_device_properties(i)
-                gpu_info["devices"].append(
-                    {
-                        "index": i,
-                        "name": props.name,
-                        "memory_total_gb": round(props.total_memory / 1e9, 2),
-                    }
-                )
-    except ImportError:
-        pass
-
-    memory = psutil.virtual_memory()
-
-    return {
-        "platform": platform.platform(),
-        "python_version": platform.python_version(),
-        "cpu_count": psutil.cpu_count(),
-        "memory": {
-            "total_gb": round(memory.total / 1e9, 2),
-            "available_gb": round(memory.available / 1e9, 2),
-            "percent_used": memory.percent,
-        },
-        "gpu": gpu_info,
-    }
+async def get_system_info(request: Request, studio: StudioClient = Depends(get_studio)):
+    snapshot = await studio.system()
+    # Encoded once per telemetry sample, however often the dashboard polls
+    return response_cache.cached(
+        request, ("system",), lambda: snapshot, version=snapshot["timestamp"]
+    )
+
+
+@app.get("/api/system/history")
+async def get_system_history(
+    window: float = 300.0,
+    resolution: float = 5.0,
+    studio: StudioClient = Depends(get_studio),
+):
+    return await studio.system_history(window, resolution)
+
+
+@app.get("/api/metrics")
+async def prometheus_metrics(studio: StudioClient = Depends(get_studio)):
+    """Request, event-loop, blocking-pool and generation metrics in the Prometheus text format."""
+    body = http_metrics.render()
+    if studio.remote:
+        # Each worker only counts what it served: answer with every worker's
+        # series, labelled worker="<pid>", so scrapes agree whoever answers
+        body = await studio.worker_metrics(str(os.getpid()), body)
+    # Generation batches live in the coordinator with several workers
+    lines = await studio.generation_metrics(http_metrics.namespace)
+    body += "".join(line + "\n" for line in lines)
+    return Response(body, media_type=CONTENT_TYPE)
 
 
 @app.post("/api/echo")
@@ -83,79 +154,466 @@ async def echo_message(data: dict):
     }
 
 
+@app.post("/api/batch")
+async def batch_requests(request: Request):
+    """Several API calls in one round trip, with a status and body for each."""
+    return await handle_batch(request)
+
+
 @app.get("/api/models")
-async def list_models():
-    return {
-        "models": [
-            {
-                "id": "unsloth/llama-3-8b-bnb-4bit",
-                "name": "Llama 3 8B (4-bit)",
-                "size": "4.5 GB",
-                "description": "Fast 4-bit quantized Llama 3",
-            },
-            {
-                "id": "unsloth/mistral-7b-bnb-4bit",
-                "name": "Mistral 7B (4-bit)",
-                "size": "3.8 GB",
-                "description": "Efficient Mistral model",
-            },
-            {
-                "id": "unsloth/gemma-7b-bnb-4bit",
-                "name": "Gemma 7B (4-bit)",
-                "size": "4.2 GB",
-                "description": "Google's Gemma model",
-            },
-        ]
-    }
+async def list_models(
+    request: Request,
+    q: Optional[str] = None,
+    source: Optional[str] = None,
+    quantization: Optional[str] = None,
+    architecture: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    offset: int = 0,
+    limit: int = 50,
+):
+    if catalog.stale():
+        await run_blocking(catalog.refresh)
+    return catalog.respond(
+        request,
+        q=q,
+        source=source,
+        quantization=quantization,
+        architecture=architecture,
+        sort=sort,
+        order=order,
+        offset=offset,
+        limit=limit,
+    )
+
+
+def _column_list(columns: Optional[str]) -> Optional[List[str]]:
+    return [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+
+
+async def _preview(method, name: str, **kwargs):
+    # Opening a dataset (and its first download) and scanning it both block
+    try:
+        return await run_blocking(method, name, **kwargs)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset {name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/datasets/{name:path}/rows")
+async def get_dataset_rows(
+    name: str, offset: int = 0, limit: int = 20, columns: Optional[str] = None
+):
+    """A page of a dataset's rows; ``columns`` is a comma-separated subset."""
+    return await _preview(
+        dataset_preview.rows, name, offset=offset, limit=limit, columns=_column_list(columns)
+    )
+
+
+@app.get("/api/datasets/{name:path}/sample")
+async def sample_dataset_rows(
+    name: str, n: int = 20, seed: Optional[int] = None, columns: Optional[str] = None
+):
+    """``n`` rows drawn at random; the same ``seed`` draws the same rows."""
+    return await _preview(
+        dataset_preview.sample, name, n=n, seed=seed, columns=_column_list(columns)
+    )
+
+
+@app.get("/api/datasets/{name:path}/search")
+async def search_dataset_rows(
+    name: str,
+    q: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    columns: Optional[str] = None,
+    start: int = 0,
+    limit: int = 20,
+):
+    """
+    Rows whose text contains ``q`` (or matches it as a regex), scanning from
+    row ``start``; pass the response's ``next_start`` to continue.
+    """
+    return await _preview(
+        dataset_preview.search,
+        name,
+        query=q,
+        regex=regex,
+        case_sensitive=case_sensitive,
+        columns=_column_list(columns),
+        start=start,
+        limit=limit,
+    )
+
+
+@app.get("/api/datasets/{name:path}/stats")
+async def get_dataset_stats(name: str, columns: Optional[str] = None):
+    """Per-column counts and value or length ranges, computed once per dataset."""
+    return await _preview(dataset_preview.stats, name, columns=_column_list(columns))
+
+
+@app.get("/api/datasets/{name:path}")
+async def get_dataset_info(name: str):
+    return await _preview(dataset_preview.info, name)
 
 
 @app.post("/api/train/start")
-async def start_training(config: dict):
+async def start_training(config: dict, studio: StudioClient = Depends(get_studio)):
+    try:
+        record, queue_position = await studio.submit(config)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=422, detail={"reason": e.reason, "admission": e.admission}
+        )
     return {
-        "status": "started",
-        "job_id": f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-        "message": "Training simulation started (this is a demo)",
+        "status": record["state"],
+        "job_id": record["job_id"],
+        "events_url": f"/api/train/{record['job_id']}/events",
+        "queue_position": queue_position,
+        "message": record["message"],
+        "admission": record["config"].get("admission"),
     }
 
 
 @app.get("/api/train/status")
-async def get_training_status():
-    return {"status": "idle", "message": "No training in progress"}
+async def get_training_status(
+    request: Request,
+    job_id: Optional[str] = None,
+    studio: StudioClient = Depends(get_studio),
+):
+    # Finished jobs never change, so their status is served without asking the scheduler
+    if job_id is not None:
+        entry = response_cache.get(("job", job_id))
+        if entry is not None:
+            return response_cache.respond(request, entry)
+    record = await studio.job(job_id)
+    if record is None and job_id is not None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    payload = status_payload(record)
+    if record is not None and record["state"] in FINAL_STATES:
+        entry = response_cache.put(("job", record["job_id"]), payload)
+        return response_cache.respond(request, entry)
+    return payload
+
+
+@app.get("/api/train/jobs")
+async def list_jobs(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    state: Optional[str] = None,
+    model: Optional[str] = None,
+    dataset: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """
+    Job history, newest first, a page at a time.
+
+    Pass the response's ``next_cursor`` back as ``cursor`` for the next page;
+    it is None on the last one.
+    """
+    try:
+        return await run_blocking(
+            job_history.page,
+            cursor,
+            limit,
+            since,
+            until,
+            state=state,
+            model=model,
+            dataset=dataset,
+            type=type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/train/jobs/summary")
+async def summarize_jobs(
+    group_by: str = "model",
+    state: Optional[str] = None,
+    model: Optional[str] = None,
+    dataset: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """Job counts, throughput, loss and runtime per model (or dataset, state, type)."""
+    try:
+        return await run_blocking(
+            job_history.summary,
+            group_by,
+            since,
+            until,
+            state=state,
+            model=model,
+            dataset=dataset,
+            type=type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/train/{job_id}/cancel")
+async def cancel_training(job_id: str, studio: StudioClient = Depends(get_studio)):
+    record = await studio.cancel(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return status_payload(record)
+
+
+@app.post("/api/export")
+async def start_export(config: dict, studio: StudioClient = Depends(get_studio)):
+    """
+    Merge a LoRA adapter into its base model and save it as safetensors or GGUF.
+
+    Runs as a job: follow it with the same status, events and logs routes as
+    training. The merged model is written under the job's ``export/`` directory.
+    """
+    try:
+        record, queue_position = await studio.export(config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": record["state"],
+        "job_id": record["job_id"],
+        "events_url": f"/api/train/{record['job_id']}/events",
+        "queue_position": queue_position,
+        "message": record["message"],
+    }
+
+
+@app.post("/api/sweeps")
+async def create_sweep(request: dict, studio: StudioClient = Depends(get_studio)):
+    """
+    Start a hyperparameter sweep.
+
+    The body is ``{"config", "space", "num_trials", "max_concurrent",
+    "grace_period", "reduction_factor", "seed"}``; ``space`` maps
+    learning_rate, lora_r, lora_alpha or batch_size to a list of values or a
+    ``{"min", "max", "log"}`` range.
+    """
+    try:
+        return await studio.create_sweep(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/sweeps")
+async def list_sweeps(studio: StudioClient = Depends(get_studio)):
+    return {"sweeps": await studio.list_sweeps()}
+
+
+@app.get("/api/sweeps/{sweep_id}")
+async def get_sweep(sweep_id: str, studio: StudioClient = Depends(get_studio)):
+    """A sweep's trials, leaderboard and the share of the full grid's steps it used."""
+    sweep = await studio.sweep(sweep_id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sweep {sweep_id}")
+    return sweep
+
+
+@app.post("/api/sweeps/{sweep_id}/cancel")
+async def cancel_sweep(sweep_id: str, studio: StudioClient = Depends(get_studio)):
+    sweep = await studio.cancel_sweep(sweep_id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sweep {sweep_id}")
+    return sweep
+
+
+def _query_metrics(job_dir: Path, **kwargs):
+    # Runs on the blocking pool: importing NumPy the first time and scanning
+    # memory-mapped step files both take long enough to stall the event loop.
+    # NumPy is only loaded once someone actually looks at a chart.
+    from .core.metrics_store import query_metrics
+
+    return query_metrics(job_dir, **kwargs)
+
+
+@app.get("/api/train/{job_id}/metrics")
+async def get_training_metrics(
+    job_id: str,
+    request: Request,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    points: Optional[int] = None,
+    columns: Optional[str] = None,
+    studio: StudioClient = Depends(get_studio),
+):
+    """Min/max/mean-bucketed metric curves for steps in [start, end]."""
+    # A finished job's metric files are closed, so each query's answer is final
+    key = ("metrics", job_id, str(request.url.query))
+    entry = response_cache.get(key)
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    record = await studio.job(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    try:
+        body = await run_blocking(
+            _query_metrics,
+            settings.JOBS_DIR / job_id,
+            start=start,
+            end=end,
+            points=points,
+            columns=columns.split(",") if columns else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if record["state"] in FINAL_STATES:
+        return response_cache.respond(request, response_cache.put(key, body))
+    return body
+
+
+@app.get("/api/train/{job_id}/checkpoints")
+async def get_training_checkpoints(
+    job_id: str, studio: StudioClient = Depends(get_studio)
+):
+    """Checkpoints kept by the job's retention policy, oldest first."""
+    if await studio.job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    checkpoints = await run_blocking(list_checkpoints, settings.JOBS_DIR / job_id)
+    return {"job_id": job_id, "checkpoints": checkpoints}
+
+
+@app.get("/api/train/{job_id}/logs")
+async def get_training_logs(
+    job_id: str,
+    offset: int = 0,
+    limit: int = READ_LIMIT,
+    tail: Optional[int] = None,
+    level: Optional[str] = None,
+    grep: Optional[str] = None,
+    studio: StudioClient = Depends(get_studio),
+):
+    """
+    The job's log records from byte ``offset`` on, or its last ``tail`` records.
+
+    Follow a running job by passing back ``next_offset`` each time; only new
+    output is read. ``level`` keeps records at or above that level and
+    ``grep`` those whose message matches the regular expression.
+    """
+    if await studio.job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    job_dir = settings.JOBS_DIR / job_id
+    try:
+        if tail is not None:
+            body = await run_blocking(tail_log, job_dir, tail, level=level, grep=grep)
+        else:
+            body = await run_blocking(
+                read_log, job_dir, offset, limit, level=level, grep=grep
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, **body}
+
+
+@app.get("/api/train/{job_id}/events")
+async def stream_training_events(
+    job_id: str,
+    request: Request,
+    last_event_id: int = 0,
+    studio: StudioClient = Depends(get_studio),
+):
+    """Server-Sent Events stream of step, loss, throughput and state changes."""
+    if await studio.job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    # EventSource sends Last-Event-ID itself when it reconnects
+    header = request.headers.get("last-event-id")
+    resume_from = int(header) if header and header.isdigit() else last_event_id
+    return StreamingResponse(
+        studio.stream(job_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/generate")
+async def generate(request: dict, studio: StudioClient = Depends(get_studio)):
+    """
+    Stream generated text as Server-Sent Events.
+
+    The body is ``{"prompt", "model", "max_tokens", "temperature", "top_k",
+    "seed"}``. The stream sends ``start`` (with the ``request_id`` to cancel
+    by), ``token`` events with new text, then ``done`` with the finish reason,
+    token usage, time to first token and decode speed. Closing the connection
+    cancels the request.
+    """
+    try:
+        started = await studio.start_generation(request)
+    except UnknownModel as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def frames():
+        yield f"event: start\ndata: {json.dumps(started)}\n\n".encode()
+        async for frame in studio.stream_generation(started["request_id"]):
+            yield frame
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/generate/{request_id}/cancel")
+async def cancel_generation(request_id: str, studio: StudioClient = Depends(get_studio)):
+    if not await studio.cancel_generation(request_id):
+        raise HTTPException(status_code=404, detail=f"Unknown generation {request_id}")
+    return {"request_id": request_id, "cancelled": True}
 
 
 # ============ Serve Frontend ============
 
-# Mount static assets if frontend build exists
-if (FRONTEND_DIR / "assets").exists():
-    app.mount("/assets", StaticFiles(directory=FRONTEND_DIR / "assets"), name="assets")
+
+@app.get("/assets/{asset_path:path}")
+async def serve_asset(asset_path: str, request: Request):
+    # Vite content-hashes everything under /assets, so it is safe to cache forever
+    asset = frontend_assets.get(f"assets/{asset_path}")
+    return frontend_assets.respond(asset, request, immutable=True)
 
 
 @app.get("/")
-async def serve_root():
-    return FileResponse(FRONTEND_DIR / "index.html")
+async def serve_root(request: Request):
+    return frontend_assets.respond(frontend_assets.index, request)
 
 
 @app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
+async def serve_frontend(full_path: str, request: Request):
     if full_path.startswith("api"):
         return {"error": "API endpoint not found"}
 
-    file_path = FRONTEND_DIR / full_path
-    if file_path.is_file():
-        return FileResponse(file_path)
-
-    return FileResponse(FRONTEND_DIR / "index.html")
+    asset = frontend_assets.get(full_path) or frontend_assets.index
+    return frontend_assets.respond(asset, request)
 
 
 # ============ Server Launcher ============
 
 
-def start_studio(host: str = "127.0.0.1", port: int = 8000):
-    """Start the Unsloth Studio server."""
+def start_studio(
+    host: str = "127.0.0.1", port: int = 8000, max_jobs: int = None, workers: int = 1
+):
+    """
+    Start the Unsloth Studio server.
+
+    With ``workers > 1`` this process becomes the coordinator that owns jobs,
+    events and telemetry, and uvicorn serves the app from that many worker
+    processes sharing the port.
+    """
     url = f"http://{host}:{port}"
 
+    if max_jobs:
+        settings.MAX_CONCURRENT_JOBS = scheduler.max_concurrent = max_jobs
+
     print(f"Starting Unsloth Studio at {url}")
     print(f"Serving frontend from: {FRONTEND_DIR}")
+    print(f"Workspace: {settings.WORKSPACE_DIR}")
 
     # Open browser after a short delay
     def open_browser():
@@ -166,4 +624,18 @@ def start_studio(host: str = "127.0.0.1", port: int = 8000):
 
     threading.Thread(target=open_browser, daemon=True).start()
 
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port, log_level="info")
+        return
+
+    settings.setup_directories()
+    coordinator = Coordinator(service)
+    # Read by the workers' settings when uvicorn spawns them
+    os.environ[COORDINATOR_ENV] = coordinator.start()
+    print(f"Serving with {workers} workers")
+    try:
+        uvicorn.run(
+            f"{__name__}:app", host=host, port=port, workers=workers, log_level="info"
+        )
+    finally:
+        coordinator.stop()